@@ -1,3 +1,5 @@
+from typing import Tuple
+
 from rest_framework import status
 
 from core.boilerplate.response_template import Resp
@@ -7,6 +9,9 @@ from database.methods import SynchronousMethods
 from admin_app import logger
 
 class RequestLogUtils:
+    """
+    Browse the request logs.
+    """
 
     VALID_METHODS = (
         "GET",
@@ -17,9 +22,8 @@ class RequestLogUtils:
     )
 
     @classmethod
-    def get(cls, page:int=1)->Resp:
+    def to_resp(cls, results: list = None, page: int = 1) -> Resp:
         resp = Resp()
-        results = SynchronousMethods.find(collection=DatabaseCollections.request_logs, page=page)
 
         resp.message = f"{len(results)} results retrieved."
         resp.data = {
@@ -30,9 +34,12 @@ class RequestLogUtils:
 
         logger.info(resp.message)
         return resp
-    
+
     @classmethod
-    def find_by_path(cls, method:str="get", path:str=None, page:int=1)->Resp:
+    def path_filter(cls, method: str = "get", path: str = None) -> Tuple[Resp, dict]:
+        """
+        Build the filter for `find_by_path`; returns an error `Resp` instead if the arguments are invalid.
+        """
         resp = Resp()
 
         if not path:
@@ -42,7 +49,7 @@ class RequestLogUtils:
             resp.status_code = status.HTTP_400_BAD_REQUEST
 
             logger.warning(resp.to_text())
-            return resp
+            return resp, None
         
         if not method.upper() in cls.VALID_METHODS:
             resp.error = "Invalid Method"
@@ -54,7 +61,7 @@ class RequestLogUtils:
             resp.status_code = status.HTTP_400_BAD_REQUEST
 
             logger.warning(resp.to_text())
-            return resp
+            return resp, None
         
         filter_dict = {
             "$and": [
@@ -68,21 +75,13 @@ class RequestLogUtils:
                 }
             ]
         }
+        return None, filter_dict
 
-        results = SynchronousMethods.find(filter_dict=filter_dict, collection=DatabaseCollections.request_logs, page=page)
-
-        resp.message = f"{len(results)} results retrieved."
-        resp.data = {
-            "page": page,
-            "results": results
-        }
-        resp.status_code = status.HTTP_200_OK
-
-        logger.info(resp.message)
-        return resp
-    
     @classmethod
-    def find_by_text(cls, term:str=None, page:int=1)->Resp:
+    def text_filter(cls, term: str = None) -> Tuple[Resp, dict]:
+        """
+        Build the filter for `find_by_text`; returns an error `Resp` instead if the arguments are invalid.
+        """
         resp = Resp()
 
         if not term:
@@ -92,24 +91,34 @@ class RequestLogUtils:
             resp.status_code = status.HTTP_400_BAD_REQUEST
 
             logger.warning(resp.to_text())
-            return resp
+            return resp, None
         
         filter_dict = {
             '$text': {
                 '$search': term
                 }
             }
-        
-        results = SynchronousMethods.find(filter_dict=filter_dict, collection=DatabaseCollections.request_logs, page=page)
+        return None, filter_dict
 
-        resp.message = f"{len(results)} results retrieved."
-        resp.data = {
-            "page": page,
-            "results": results
-        }
-        resp.status_code = status.HTTP_200_OK
-
-        logger.info(resp.message)
-        return resp
+    @classmethod
+    def get(cls, page:int=1)->Resp:
+        results = SynchronousMethods.find(collection=DatabaseCollections.request_logs, page=page)
+        return cls.to_resp(results=results, page=page)
+    
+    @classmethod
+    def find_by_path(cls, method:str="get", path:str=None, page:int=1)->Resp:
+        error, filter_dict = cls.path_filter(method=method, path=path)
+        if error:
+            return error
 
+        results = SynchronousMethods.find(filter_dict=filter_dict, collection=DatabaseCollections.request_logs, page=page)
+        return cls.to_resp(results=results, page=page)
+    
+    @classmethod
+    def find_by_text(cls, term:str=None, page:int=1)->Resp:
+        error, filter_dict = cls.text_filter(term=term)
+        if error:
+            return error
 
+        results = SynchronousMethods.find(filter_dict=filter_dict, collection=DatabaseCollections.request_logs, page=page)
+        return cls.to_resp(results=results, page=page)
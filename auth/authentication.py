@@ -7,7 +7,10 @@ from django.utils import timezone
 
 from rest_framework.authentication import BaseAuthentication
 from rest_framework import HTTP_HEADER_ENCODING, exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
 
+from auth.identity import ResolvedIdentity, VerifiedTokenCache
 
 from user_app.models import User, UserToken, UserTokenUsage
 from user_app.helpers import UserTokenUsageHelpers
@@ -59,7 +62,39 @@ class TokenAuthentication(BaseAuthentication):
             raise exceptions.AuthenticationFailed(msg)
         return self.authenticate_credentials(raw_token)
 
+    def authenticate_selector_token(self, token):
+        """
+        Authenticate a `v2.<token id>.<secret>` token: one lookup by primary key, at most one hash check.
+        """
+        model = self.get_model()
+        token_id, secret = UserTokenUtils.split_selector(token)
+        if not token_id or not secret:
+            logger.error('Incorrect token format.')
+            raise exceptions.AuthenticationFailed('Incorrect token format.')
+
+        NOW: datetime = timezone.now()
+        token_obj = model.objects.filter(
+            Q(pk=token_id)
+            & Q(expires_at__gte=NOW)
+        ).select_related('user').first()
+        if not token_obj:
+            logger.error('Token object not found or is expired.')
+            raise exceptions.AuthenticationFailed('Token object not found or is expired.')
+
+        if VerifiedTokenCache.get(raw_token=token) != f"{token_obj.id}":
+            if not check_password(secret, token_obj.token):
+                raise exceptions.AuthenticationFailed(
+                    'Token does not exist or is expired.')
+            VerifiedTokenCache.set(raw_token=token, token_id=token_obj.id, expires_at=token_obj.expires_at)
+
+        UserTokenUsageHelpers.record(token_id=token_obj.id, created=NOW)
+        return token_obj.user, token_obj
+
     def authenticate_credentials(self, token):
+        if UserTokenUtils.is_selector_token(token):
+            return self.authenticate_selector_token(token)
+
+        ## Tokens issued before the selector format: find the user, then hash-check each of their tokens.
         model = self.get_model()
         user_part, token_part = UserTokenUtils.split_parts(token)
         if not user_part or not token_part:
@@ -72,6 +107,19 @@ class TokenAuthentication(BaseAuthentication):
             raise exceptions.AuthenticationFailed('User ID not found.')
 
         NOW: datetime = timezone.now()
+
+        ## (prithoo): A token verified before only needs a primary-key lookup, not another round of hashing.
+        cached_token_id = VerifiedTokenCache.get(raw_token=token)
+        if cached_token_id:
+            token_obj = model.objects.filter(
+                Q(pk=cached_token_id)
+                & Q(user__id=user_id)
+                & Q(expires_at__gte=NOW)
+            ).select_related('user').first()
+            if token_obj:
+                UserTokenUsageHelpers.record(token_id=token_obj.id, created=NOW)
+                return token_obj.user, token_obj
+
         user_tokens = model.objects.filter(
             Q(user__id=user_id)
             & Q(expires_at__gte=NOW)
@@ -82,8 +130,35 @@ class TokenAuthentication(BaseAuthentication):
 
         for token_obj in user_tokens:
             if check_password(token_part, token_obj.token):
-                UserTokenUsageHelpers.create(data = {"token": f"{token_obj.id}", "created": NOW})
+                VerifiedTokenCache.set(raw_token=token, token_id=token_obj.id, expires_at=token_obj.expires_at)
+                UserTokenUsageHelpers.record(token_id=token_obj.id, created=NOW)
                 return token_obj.user, token_obj
 
         raise exceptions.AuthenticationFailed(
             'Token does not exist or is expired.')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    `JWTAuthentication` that reuses the request's `ResolvedIdentity`, so the token is decoded and the
+    user loaded once per request no matter how many middlewares looked at it first.
+    """
+
+    def authenticate(self, request: HttpRequest):
+        identity = ResolvedIdentity.for_request(request)
+        if identity.raw_token is None:
+            ## Malformed or non-JWT headers are left to the stock checks (and to other authentication classes).
+            return super().authenticate(request)
+        if identity.error:
+            raise identity.error
+
+        user = identity.user
+        if not user:
+            raise exceptions.AuthenticationFailed('User not found', code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise exceptions.AuthenticationFailed('User is inactive', code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            ## (prithoo): Rare enough that the stock check (with its own lookup) is good enough.
+            return super().authenticate(request)
+
+        return user, identity.validated_token
@@ -0,0 +1,221 @@
+from collections import OrderedDict
+from datetime import datetime
+from hashlib import sha256
+from hmac import new as hmac_new
+from threading import Lock
+from time import monotonic
+from typing import Any, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpRequest
+from django.utils import timezone
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from user_app.models import User
+
+from auth import logger
+
+
+class UserSnapshotCache:
+    """
+    Process-local, short-lived LRU of user rows keyed by `(user_id, token jti)`.
+
+    Only the column values are cached; every hit builds a fresh `User` instance so requests never
+    share (and mutate) the same object. Entries live for `TTL` seconds at most and are evicted on
+    every save/delete of the user in this process, see `user_app.signals`.
+    """
+
+    MAX_SIZE: int = 1024
+    TTL: float = 30.0
+
+    _entries: "OrderedDict[Tuple[str, str], Tuple[float, Tuple[str], Tuple[Any]]]" = OrderedDict()
+    _lock: Lock = Lock()
+
+    @classmethod
+    def get(cls, user_id: str = None, jti: str = None) -> User:
+        """
+        Return the user with `user_id`, from the cache if possible; `None` if the user does not exist.
+        """
+        key = (f"{user_id}", f"{jti}")
+        now = monotonic()
+
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry and entry[0] > now:
+                cls._entries.move_to_end(key)
+                return User.from_db(DEFAULT_DB_ALIAS, entry[1], entry[2])
+            if entry:
+                del cls._entries[key]
+
+        user = User.objects.filter(pk=user_id).first()
+        if not user:
+            return None
+
+        field_names = tuple(field.attname for field in User._meta.concrete_fields)
+        values = tuple(getattr(user, name) for name in field_names)
+        with cls._lock:
+            cls._entries[key] = (now + cls.TTL, field_names, values)
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > cls.MAX_SIZE:
+                cls._entries.popitem(last=False)
+
+        return user
+
+    @classmethod
+    def evict(cls, user_id: str = None) -> None:
+        user_id = f"{user_id}"
+        with cls._lock:
+            for key in [key for key in cls._entries if key[0] == user_id]:
+                del cls._entries[key]
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._entries.clear()
+
+
+class ResolvedIdentity:
+    """
+    The JWT identity of a request, resolved at most once per request.
+
+    The first consumer (the IP checker, the request logger or `CachedJWTAuthentication`) decodes and
+    validates the bearer token; the result is stored on the underlying `HttpRequest` and every later
+    consumer reuses it. The user row itself comes from `UserSnapshotCache`.
+    """
+
+    ATTRIBUTE: str = "_resolved_identity"
+
+    def __init__(self, raw_token: bytes = None) -> None:
+        self.raw_token = raw_token
+        self.validated_token = None
+        self.error: Exception = None
+        self._user: User = None
+        self._user_resolved: bool = False
+
+        if raw_token is None:
+            return
+
+        try:
+            self.validated_token = JWTAuthentication().get_validated_token(raw_token)
+        except InvalidToken as ex:
+            self.error = ex
+
+    @classmethod
+    def for_request(cls, request: HttpRequest = None) -> "ResolvedIdentity":
+        ## (prithoo): DRF wraps the request, the identity must live on the Django request the middlewares saw.
+        request = getattr(request, "_request", request)
+        identity = getattr(request, cls.ATTRIBUTE, None)
+        if identity is not None:
+            return identity
+
+        authentication = JWTAuthentication()
+        header = authentication.get_header(request)
+        try:
+            raw_token = authentication.get_raw_token(header) if header else None
+        except Exception as ex:
+            logger.info(f"{ex}")
+            raw_token = None
+
+        identity = cls(raw_token=raw_token)
+        setattr(request, cls.ATTRIBUTE, identity)
+        return identity
+
+    @property
+    def user_id(self) -> str:
+        if self.validated_token is None:
+            return None
+        return self.validated_token.get(api_settings.USER_ID_CLAIM)
+
+    @property
+    def jti(self) -> str:
+        if self.validated_token is None:
+            return None
+        return self.validated_token.get(api_settings.JTI_CLAIM)
+
+    @property
+    def user(self) -> User:
+        if not self._user_resolved:
+            self._user = UserSnapshotCache.get(user_id=self.user_id, jti=self.jti) if self.user_id else None
+            self._user_resolved = True
+        return self._user
+
+
+class VerifiedTokenCache:
+    """
+    Redis cache of permanent tokens that already passed `check_password`, so that repeated calls with
+    the same token skip the (deliberately slow) hash verification.
+
+    Keys are an HMAC of the raw token, never the token itself, and point at the `UserToken` id. Entries
+    expire with the token (capped at `TIMEOUT`) and are dropped by the `UserToken` save/delete signals;
+    a per-token set of keys makes that possible. Redis being unavailable only costs the hashing.
+    """
+
+    PREFIX: str = "auth:verified-token"
+    TIMEOUT: int = 60 * 60
+
+    @classmethod
+    def get_connection(cls):
+        return getattr(settings, "REDIS_CONN", None)
+
+    @classmethod
+    def key(cls, raw_token: str = None) -> str:
+        digest = hmac_new(settings.SECRET_KEY.encode("utf-8"), raw_token.encode("utf-8"), sha256).hexdigest()
+        return f"{cls.PREFIX}:{digest}"
+
+    @classmethod
+    def index_key(cls, token_id: str = None) -> str:
+        return f"{cls.PREFIX}:token:{token_id}"
+
+    @classmethod
+    def get(cls, raw_token: str = None) -> str:
+        """
+        Return the id of the `UserToken` `raw_token` was verified against, `None` if it is not cached.
+        """
+        conn = cls.get_connection()
+        if not conn:
+            return None
+
+        try:
+            token_id = conn.get(cls.key(raw_token))
+        except Exception as ex:
+            logger.warning(f"Verified token cache read failed: {ex}")
+            return None
+
+        return token_id.decode("utf-8") if token_id else None
+
+    @classmethod
+    def set(cls, raw_token: str = None, token_id: str = None, expires_at: datetime = None) -> None:
+        conn = cls.get_connection()
+        if not conn:
+            return
+
+        timeout = cls.TIMEOUT
+        if expires_at:
+            timeout = min(timeout, int((expires_at - timezone.now()).total_seconds()))
+        if timeout <= 0:
+            return
+
+        try:
+            pipe = conn.pipeline(transaction=True)
+            pipe.set(cls.key(raw_token), f"{token_id}", ex=timeout)
+            pipe.sadd(cls.index_key(token_id), cls.key(raw_token))
+            pipe.expire(cls.index_key(token_id), cls.TIMEOUT)
+            pipe.execute()
+        except Exception as ex:
+            logger.warning(f"Verified token cache write failed: {ex}")
+
+    @classmethod
+    def invalidate(cls, token_id: str = None) -> None:
+        conn = cls.get_connection()
+        if not conn:
+            return
+
+        try:
+            keys = conn.smembers(cls.index_key(token_id))
+            conn.delete(cls.index_key(token_id), *keys)
+        except Exception as ex:
+            logger.error(f"Verified token cache invalidation failed for token {token_id}: {ex}")
@@ -1,8 +1,11 @@
+from django.http import StreamingHttpResponse
+
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from classifieds_app.constants import ClassifiedsConstants
 from classifieds_app.helpers import ClassifiedsCategoryHelper, ClassifiedsAdvertisementHelper, ClassifiedsAdvertisementImageHelper
 
 
@@ -62,19 +65,30 @@ class ClassifiedsAdvertisementSearchAPIView(APIView):
     def get(self, request: Request) -> Response:
         query = request.query_params.get('query', None)
         page_no = int(request.query_params.get('page_no', 1))
+        cursor = request.query_params.get('cursor', None)
+        mode = request.query_params.get('mode', ClassifiedsConstants.SEARCH_MODE_TRIGRAM)
 
         resp = ClassifiedsAdvertisementHelper.search(
-            query=query, return_obj=False, page_no=page_no)
+            query=query, return_obj=False, page_no=page_no, cursor=cursor, mode=mode)
 
         return resp.to_response()
 
     def post(self, request: Request) -> Response:
         page_no = int(request.data.get('page_no', 1))
-        resp = ClassifiedsAdvertisementHelper.list(page_no=page_no)
+        cursor = request.data.get('cursor', None)
+        resp = ClassifiedsAdvertisementHelper.list(page_no=page_no, cursor=cursor)
 
         return resp.to_response()
 
 
+class ClassifiedsAdvertisementExportAPIView(APIView):
+    permission_classes = (IsAuthenticated | IsAdminUser,)
+
+    def get(self, request: Request) -> StreamingHttpResponse:
+        return StreamingHttpResponse(
+            ClassifiedsAdvertisementHelper.export(), content_type="application/json")
+
+
 class ClassifiedsAdvertisementAPIView(APIView):
     permission_classes = (IsAuthenticated | IsAdminUser | AllowAny,)
 
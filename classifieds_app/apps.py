@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ClassifiedsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'classifieds_app'
+
+    def ready(self) -> None:
+        import classifieds_app.signals
@@ -2,4 +2,16 @@ class ClassifiedsConstants:
 
     ONE_COMMENT_WEIGHT = 0.1
     ONE_LIKE_WEIGHT = 0.05
-    ONE_SAVE_WEIGHT = 0.15
\ No newline at end of file
+    ONE_SAVE_WEIGHT = 0.15
+
+    ## Full-text search
+    SEARCH_CONFIG = "english"
+    SEARCH_MODE_TRIGRAM = "trigram"
+    SEARCH_MODE_INDEX = "index"
+    SEARCH_MODES = (SEARCH_MODE_TRIGRAM, SEARCH_MODE_INDEX)
+
+    ## Caching
+    CATEGORY_CACHE_TIMEOUT = 60 * 60  # 1 hour
+
+    ## Export
+    EXPORT_CHUNK_SIZE = 500
@@ -0,0 +1,49 @@
+from django_cron import CronJobBase, Schedule
+
+from django.db import transaction
+from django.utils import timezone
+
+from classifieds_app.models import AdvertisementScoreFlush, ClassifiedsAdvertisement
+from classifieds_app.utils import AdvertisementScoreUtils
+
+from classifieds_app import logger
+
+
+class FlushAdvertisementScores(CronJobBase):
+    """
+    Apply the advertisement score deltas buffered by the like/comment/save signals.
+    """
+    RUN_EVERY_MINS = 1  # every 1 minute
+    FLUSH_MARKER_DAYS = 1
+
+    schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
+    code = 'flush_advertisement_scores'  # a unique code
+
+    def do(self):
+        batch_id, deltas = AdvertisementScoreUtils.take_pending()
+        if not deltas:
+            return
+
+        ## (prithoo): Remainders of deleted advertisements (e.g. cascade-deleted comments) are dropped, not carried.
+        existing = {
+            f"{pk}" for pk in ClassifiedsAdvertisement.objects.filter(pk__in=list(deltas)).values_list('pk', flat=True)
+        }
+        whole, remainders = {}, {}
+        for advertisement_id, delta in deltas.items():
+            if advertisement_id in existing:
+                whole[advertisement_id], remainders[advertisement_id] = AdvertisementScoreUtils.split(delta=delta)
+
+        updated = 0
+        with transaction.atomic():
+            _, created = AdvertisementScoreFlush.objects.get_or_create(batch_id=batch_id)
+            if created:
+                updated = ClassifiedsAdvertisement.apply_score_deltas(deltas=whole)
+            else:
+                logger.warning(f"Score batch {batch_id} was already applied, only settling it.")
+        AdvertisementScoreUtils.settle(remainders=remainders)
+
+        AdvertisementScoreFlush.objects.filter(
+            created__lt=timezone.now() - timezone.timedelta(days=self.FLUSH_MARKER_DAYS)).delete()
+        logger.info(
+            f"Flushed score deltas for {len(deltas)} advertisement(s) ({len(deltas) - len(existing)} deleted); "
+            f"{updated} row(s) updated.")
@@ -1,13 +1,17 @@
 from base64 import b64encode, b64decode
+from typing import Iterator
 
 from django.conf import settings as django_settings
 from django.core.paginator import Paginator
-from django.db.models import QuerySet, Q
-from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import F, FloatField, QuerySet, Q
+from django.db.models.functions import Cast
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 
 from core.boilerplate.response_template import Resp
 from core.constants import StringConstants
+from classifieds_app.constants import ClassifiedsConstants
 from classifieds_app.models import ClassifiedsAdvertisement, ClassifiedsCategory, ClassifiedsAdvertisementImage, \
     ClassifiedsAdvertisementComment, UserAdvertisementLike, UserSavedAdvertisement
 from classifieds_app.serializers import ClassifiedsAdvertisementCommentInputSerializer, ClassifiedsAdvertisementCommentOutputSerializer, \
@@ -15,6 +19,7 @@ from classifieds_app.serializers import ClassifiedsAdvertisementCommentInputSeri
     ClassifiedsAdvertisementImageDisplaySerializer, ClassifiedsAdvertisementImageInputSerializer, ClassifiedsAdvertisementImageOutputSerializer, \
     ClassifiedsCategoryIOSerializer, UserAdvertisementLikeInputSerializer, UserAdvertisementLikeOutputSerializer, UserSavedAdvertisementInputSerializer, \
     UserSavedAdvertisementOutputSerializer
+from classifieds_app.utils import ClassifiedsCategoryCache, CursorPaginationUtils
 from database.custom_orm_functions.weighted_trigram_similarity import WeightedTrigramSimilarity
 from user_app.models import User
 
@@ -35,8 +40,13 @@ class ClassifiedsCategoryHelper:
 
         if not query or query == StringConstants.BLANK:
             resp.message = f"No search query provided. Returning all categories."
-            resp.data = objs if return_obj else ClassifiedsCategoryIOSerializer(
-                objs, many=True).data
+            if return_obj:
+                resp.data = objs
+            else:
+                version, resp.data = ClassifiedsCategoryCache.get("all")
+                if resp.data is None:
+                    resp.data = ClassifiedsCategoryIOSerializer(objs, many=True).data
+                    ClassifiedsCategoryCache.set(version, resp.data, "all")
             resp.status_code = status.HTTP_200_OK
 
             logger.info(resp.to_text())
@@ -90,34 +100,51 @@ class ClassifiedsCategoryHelper:
             return resp
 
         if category_id and not name and not category_id == StringConstants.BLANK:
+            lookup = ("pk", category_id)
+        elif name and not category_id and not name == StringConstants.BLANK:
+            lookup = ("name", name)
+        else:
+            resp.error = f"INVALID INPUT"
+            resp.message = f"Either category ID or NAME must be provided, not both."
+            resp.status_code = status.HTTP_400_BAD_REQUEST
+
+            logger.warning(resp.to_text())
+            return resp
+
+        version, cached = (None, None) if return_obj else ClassifiedsCategoryCache.get(*lookup)
+        if cached is not None:
+            resp.message = f"Category '{cached.get('name')}' found successfully."
+            resp.data = cached
+            resp.status_code = status.HTTP_200_OK
+
+            logger.info(resp.to_text())
+            return resp
+
+        if category_id:
             obj = ClassifiedsCategory.objects.filter(pk=category_id).first()
-            if not obj.exists():
+            if not obj:
                 resp.error = f"INVALID CATEGORY ID"
                 resp.message = f"Category with ID {category_id} does not exist."
                 resp.status_code = status.HTTP_404_NOT_FOUND
 
                 logger.warning(resp.to_text())
                 return resp
-        elif name and not category_id and not name == StringConstants.BLANK:
+        else:
             obj = ClassifiedsCategory.objects.filter(name__iexact=name).first()
-            if not obj.exists():
+            if not obj:
                 resp.error = f"INVALID CATEGORY NAME"
                 resp.message = f"Category with name {name} does not exist."
                 resp.status_code = status.HTTP_404_NOT_FOUND
 
                 logger.warning(resp.to_text())
                 return resp
-        else:
-            resp.error = f"INVALID INPUT"
-            resp.message = f"Either category ID or NAME must be provided, not both."
-            resp.status_code = status.HTTP_400_BAD_REQUEST
-
-            logger.warning(resp.to_text())
-            return resp
 
         resp.message = f"Category '{obj.name}' found successfully."
-        resp.data = obj if return_obj else ClassifiedsCategoryIOSerializer(
-            obj).data
+        if return_obj:
+            resp.data = obj
+        else:
+            resp.data = ClassifiedsCategoryIOSerializer(obj).data
+            ClassifiedsCategoryCache.set(version, resp.data, *lookup)
         resp.status_code = status.HTTP_200_OK
 
         logger.info(resp.to_text())
@@ -127,6 +154,16 @@ class ClassifiedsCategoryHelper:
     def list(cls, return_obj: bool = False, page_no: int = 1, *args, **kwargs) -> Resp:
         resp = Resp()
 
+        page_no = ClassifiedsCategoryCache.page_number(page_no)
+        version, cached = (None, None) if return_obj else ClassifiedsCategoryCache.get("list", page_no)
+        if cached is not None:
+            resp.message = f"Categories found successfully."
+            resp.data = cached
+            resp.status_code = status.HTTP_200_OK
+
+            logger.info(resp.to_text())
+            return resp
+
         categories = ClassifiedsCategory.objects.all().order_by('name')
         if not categories:
             resp.error = f"NO CATEGORIES FOUND"
@@ -140,8 +177,11 @@ class ClassifiedsCategoryHelper:
         page = paginator.get_page(page_no)
 
         resp.message = f"Categories found successfully."
-        resp.data = page if return_obj else ClassifiedsCategoryIOSerializer(
-            page, many=True).data
+        if return_obj:
+            resp.data = page
+        else:
+            resp.data = ClassifiedsCategoryIOSerializer(page, many=True).data
+            ClassifiedsCategoryCache.set(version, resp.data, "list", page.number)
         resp.status_code = status.HTTP_200_OK
 
         logger.info(resp.to_text())
@@ -267,6 +307,14 @@ class ClassifiedsAdvertisementHelper:
         'price',
         'category',
     )
+    LIST_CURSOR_FIELDS = (
+        'created',
+        'id',
+    )
+    SEARCH_CURSOR_FIELDS = (
+        'similarity',
+        'id',
+    )
 
     @classmethod
     def get_one(cls, user: User = None, pk: str = None, return_obj: bool = False, *args, **kwargs) -> Resp:
@@ -281,8 +329,14 @@ class ClassifiedsAdvertisementHelper:
             logger.warning(resp.to_text())
             return resp
 
-        obj = ClassifiedsAdvertisement.objects.filter(pk=pk).first()
-        if (not obj.creator == user) and (not user in obj.moderators.all()) and (not user.is_superuser) and (not obj.is_active):
+        objs = ClassifiedsAdvertisement.objects.filter(pk=pk)
+        if not return_obj:
+            objs = ClassifiedsAdvertisementDisplaySerializer.prefetch(objs)
+        obj = objs.first()
+        ## (prithoo): Inactive advertisements are only visible to their creator, moderators and superusers.
+        if obj and not obj.is_active and not (
+            user and (obj.creator_id == user.pk or user.is_superuser or user in obj.moderators.all())
+        ):
             obj = None
 
         if not obj:
@@ -302,12 +356,68 @@ class ClassifiedsAdvertisementHelper:
         return resp
 
     @classmethod
-    def list(cls, return_obj: bool = False, page_no: int = 1, *args, **kwargs) -> Resp:
+    def paginate_by_cursor(cls, objs: QuerySet[ClassifiedsAdvertisement] = None, fields: tuple = None, cursor: str = None, return_obj: bool = False, *args, **kwargs) -> Resp:
+        """
+        Keyset-paginate `objs` on `fields` (descending); `cursor` is the `next_cursor` of the previous page
+        or a blank string for the first page.
+        """
+        resp = Resp()
+
+        if not return_obj:
+            objs = ClassifiedsAdvertisementDisplaySerializer.prefetch(objs)
+
+        try:
+            page, next_cursor = CursorPaginationUtils.paginate(
+                objs=objs, fields=fields, cursor=cursor, page_size=django_settings.MAX_ITEMS_PER_PAGE)
+        except CursorPaginationUtils.InvalidCursor as ex:
+            resp.error = f"INVALID CURSOR"
+            resp.message = f"{ex}"
+            resp.status_code = status.HTTP_400_BAD_REQUEST
+
+            logger.warning(resp.to_text())
+            return resp
+
+        if not page and not cursor:
+            resp.error = f"NO ADVERTISEMENTS FOUND"
+            resp.message = f"No advertisements available."
+            resp.status_code = status.HTTP_404_NOT_FOUND
+
+            logger.warning(resp.to_text())
+            return resp
+
+        resp.data = {
+            "cursor": cursor,
+            "next_cursor": next_cursor,
+            "results": page if return_obj else ClassifiedsAdvertisementDisplaySerializer.represent_many(
+                page)
+        }
+        resp.status_code = status.HTTP_200_OK
+        return resp
+
+    @classmethod
+    def list(cls, return_obj: bool = False, page_no: int = 1, cursor: str = None, *args, **kwargs) -> Resp:
+        """
+        List active advertisements, newest first.
+
+        Passing a `cursor` (blank for the first page) switches to keyset pagination on `(created, id)`
+        and `page_no` is ignored.
+        """
         resp = Resp()
         objs: QuerySet[ClassifiedsAdvertisement] = ClassifiedsAdvertisement.objects.filter(
             is_active=True).order_by('-created')
 
-        if not objs:
+        if cursor is not None:
+            resp = cls.paginate_by_cursor(
+                objs=objs, fields=cls.LIST_CURSOR_FIELDS, cursor=cursor, return_obj=return_obj)
+            if resp.error:
+                return resp
+
+            resp.message = f"Advertisements found successfully."
+            logger.info(resp.to_text())
+            return resp
+
+        ## (prithoo): `exists()` rather than truthiness, so the whole table is not loaded just to check it.
+        if not objs.exists():
             resp.error = f"NO ADVERTISEMENTS FOUND"
             resp.message = f"No advertisements available."
             resp.status_code = status.HTTP_404_NOT_FOUND
@@ -315,21 +425,41 @@ class ClassifiedsAdvertisementHelper:
             logger.warning(resp.to_text())
             return resp
 
+        if not return_obj:
+            objs = ClassifiedsAdvertisementDisplaySerializer.prefetch(objs)
+
         paginator = Paginator(objs, django_settings.MAX_ITEMS_PER_PAGE)
         page = paginator.get_page(page_no)
 
         resp.message = f"Advertisements found successfully."
-        resp.data = page if return_obj else ClassifiedsAdvertisementDisplaySerializer(
-            page, many=True).data
+        resp.data = page if return_obj else ClassifiedsAdvertisementDisplaySerializer.represent_many(
+            page)
         resp.status_code = status.HTTP_200_OK
 
         logger.info(resp.to_text())
         return resp
 
     @classmethod
-    def search(cls, query: str = None, return_obj: bool = False, page_no: int = 1, *args, **kwargs) -> Resp:
+    def search(cls, query: str = None, return_obj: bool = False, page_no: int = 1, cursor: str = None, mode: str = ClassifiedsConstants.SEARCH_MODE_TRIGRAM, *args, **kwargs) -> Resp:
+        """
+        Search active advertisements by trigram similarity.
+
+        With `mode` set to `ClassifiedsConstants.SEARCH_MODE_INDEX` the ranking is computed from the
+        precomputed `search_vector`/`search_document` columns only, both of which are GIN-indexed.
+
+        Passing a `cursor` (blank for the first page) switches to keyset pagination on `(similarity, id)`
+        and `page_no` is ignored.
+        """
         resp = Resp()
 
+        if mode not in ClassifiedsConstants.SEARCH_MODES:
+            resp.error = f"INVALID INPUT"
+            resp.message = f"Search mode must be one of {ClassifiedsConstants.SEARCH_MODES}."
+            resp.status_code = status.HTTP_400_BAD_REQUEST
+
+            logger.warning(resp.to_text())
+            return resp
+
         if not isinstance(query, str):
             resp.error = f"INVALID INPUT"
             resp.message = f"Search query must be a string."
@@ -340,40 +470,103 @@ class ClassifiedsAdvertisementHelper:
 
         query = query.lstrip().rstrip().lower() if query else None
         if not query or query == StringConstants.BLANK:
-            resp.message = f"No search query provided. Returning all advertisements."
+            ## (prithoo): Same pages as the listing; full dumps go through `export` instead.
+            resp = cls.list(return_obj=return_obj, page_no=page_no, cursor=cursor)
+            if not resp.error:
+                resp.message = f"No search query provided. Returning all advertisements."
+            return resp
+
+        if mode == ClassifiedsConstants.SEARCH_MODE_INDEX:
+            objs = cls.search_index(query=query)
+        else:
             objs = ClassifiedsAdvertisement.objects.filter(
-                is_active=True).order_by('-created')
-            resp.data = objs if return_obj else ClassifiedsAdvertisementOutputSerializer(
-                objs, many=True).data
-            resp.status_code = status.HTTP_200_OK
+                Q(is_active=True)
+                & Q(
+                    Q(title__trigram_similar=query)
+                    | Q(description__trigram_similar=query)
+                    | Q(category__name__trigram_similar=query)
+                )
+            ).distinct().annotate(
+                similarity=Cast(
+                    WeightedTrigramSimilarity('title', query, 1.5)
+                    + WeightedTrigramSimilarity('description', query, 1.2)
+                    + WeightedTrigramSimilarity('category__name', query, 1.0),
+                    output_field=FloatField()
+                )
+            ).order_by('-similarity')
+
+        if cursor is not None:
+            resp = cls.paginate_by_cursor(
+                objs=objs, fields=cls.SEARCH_CURSOR_FIELDS, cursor=cursor, return_obj=return_obj)
+            if resp.error:
+                return resp
 
+            resp.message = f"Advertisements found successfully matching the query '{query}'."
             logger.info(resp.to_text())
             return resp
 
-        objs = ClassifiedsAdvertisement.objects.filter(
-            Q(is_active=True)
-            & Q(
-                Q(title__trigram_similar=query)
-                | Q(description__trigram_similar=query)
-                | Q(category__name__trigram_similar=query)
-            )
-        ).distinct().annotate(
-            similarity=WeightedTrigramSimilarity('title', query, 1.5)
-            + WeightedTrigramSimilarity('description', query, 1.2)
-            + WeightedTrigramSimilarity('category__name', query, 1.0)
-        ).order_by('-similarity')
+        if not return_obj:
+            objs = ClassifiedsAdvertisementDisplaySerializer.prefetch(objs)
 
         paginated = Paginator(objs, django_settings.MAX_ITEMS_PER_PAGE)
         page = paginated.get_page(page_no)
 
         resp.message = f"Advertisements found successfully matching the query '{query}'."
-        resp.data = page if return_obj else ClassifiedsAdvertisementDisplaySerializer(
-            page, many=True).data
+        resp.data = page if return_obj else ClassifiedsAdvertisementDisplaySerializer.represent_many(
+            page)
         resp.status_code = status.HTTP_200_OK
 
         logger.info(resp.to_text())
         return resp
 
+    @classmethod
+    def export(cls, chunk_size: int = None, *args, **kwargs) -> Iterator[bytes]:
+        """
+        Yield every active advertisement as one JSON array, chunk by chunk, for a `StreamingHttpResponse`.
+
+        Rows are read in keyset-paginated chunks of `chunk_size`, so memory stays flat and no database
+        cursor is held open while the client reads.
+        """
+        chunk_size = chunk_size or ClassifiedsConstants.EXPORT_CHUNK_SIZE
+        objs = ClassifiedsAdvertisementDisplaySerializer.prefetch(
+            ClassifiedsAdvertisement.objects.filter(is_active=True))
+        renderer = JSONRenderer()
+        cursor, separator = None, b"["
+
+        while True:
+            page, cursor = CursorPaginationUtils.paginate(
+                objs=objs, fields=cls.LIST_CURSOR_FIELDS, cursor=cursor, page_size=chunk_size)
+            for row in ClassifiedsAdvertisementDisplaySerializer.represent_many(page):
+                yield separator + renderer.render(row)
+                separator = b","
+            if not cursor:
+                break
+
+        yield b"]" if separator == b"," else b"[]"
+
+    @classmethod
+    def search_index(cls, query: str = None, *args, **kwargs) -> QuerySet[ClassifiedsAdvertisement]:
+        """
+        Match and rank active advertisements against the precomputed search columns; no joins and
+        no per-row similarity over the raw text columns.
+        """
+        search_query = SearchQuery(
+            query, config=ClassifiedsConstants.SEARCH_CONFIG, search_type="websearch")
+
+        return ClassifiedsAdvertisement.objects.filter(
+            Q(is_active=True)
+            & Q(
+                Q(search_vector=search_query)
+                | Q(search_document__trigram_similar=query)
+            )
+        ).annotate(
+            ## (prithoo): Both functions return `real`; as double precision the value survives the cursor round trip exactly.
+            similarity=Cast(
+                SearchRank(F('search_vector'), search_query) + TrigramSimilarity('search_document', query),
+                output_field=FloatField()
+            )
+        ).order_by('-similarity')
+
     @classmethod
     def create(cls, user: User = None, data: dict = None, return_obj: bool = False, *args, **kwargs) -> Resp:
         resp = Resp()
@@ -550,7 +743,10 @@ class ClassifiedsAdvertisementImageHelper:
             logger.warning(resp.to_text())
             return resp
 
-        obj = ClassifiedsAdvertisementImage.objects.filter(pk=pk).first()
+        objs = ClassifiedsAdvertisementImage.objects.filter(pk=pk)
+        if not return_obj:
+            objs = ClassifiedsAdvertisementImageDisplaySerializer.prefetch(objs)
+        obj = objs.first()
         if not obj:
             resp.error = f"NOT FOUND"
             resp.message = f"Image with ID {pk} does not exist."
@@ -572,6 +768,8 @@ class ClassifiedsAdvertisementImageHelper:
         resp = Resp()
         objs = ClassifiedsAdvertisementImage.objects.filter(
             advertisement__id=advertisement_id).order_by('sequence_number')
+        if not return_obj:
+            objs = ClassifiedsAdvertisementImageDisplaySerializer.prefetch(objs)
 
         if not objs:
             resp.error = f"NO IMAGES FOUND"
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from classifieds_app.models import ClassifiedsAdvertisement
+
+
+class Command(BaseCommand):
+    help = "Backfill `search_vector` and `search_document` for existing advertisements."
+
+    DEFAULT_BATCH_SIZE: int = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=self.DEFAULT_BATCH_SIZE, help='Rows updated per UPDATE statement'
+        )
+        parser.add_argument(
+            '--missing-only', action='store_true', help='Only index rows that have never been indexed'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        objs = ClassifiedsAdvertisement.objects.all()
+        if options['missing_only']:
+            objs = objs.filter(search_vector__isnull=True)
+
+        pks = objs.order_by('pk').values_list('pk', flat=True)
+
+        updated = 0
+        last_pk = None
+        while True:
+            batch = pks.filter(pk__gt=last_pk) if last_pk else pks
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+
+            updated += ClassifiedsAdvertisement.refresh_search_index(
+                objs=ClassifiedsAdvertisement.objects.filter(pk__in=batch))
+            last_pk = batch[-1]
+            self.stdout.write(f"Indexed {updated} advertisement(s).")
+
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt for {updated} advertisement(s)."))
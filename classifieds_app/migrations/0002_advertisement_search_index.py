@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:09
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classifieds_app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        migrations.AddField(
+            model_name='classifiedsadvertisement',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False, help_text='Lower-cased title, description and category for trigram matching', null=True),
+        ),
+        migrations.AddField(
+            model_name='classifiedsadvertisement',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, help_text='Weighted full-text index of the title, description and category', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='classifiedsadvertisement',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='classifieds_ad_search_vec_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='classifiedsadvertisement',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='classifieds_ad_search_doc_trgm', opclasses=('gin_trgm_ops',)),
+        ),
+    ]
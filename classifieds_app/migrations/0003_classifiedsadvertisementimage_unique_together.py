@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classifieds_app', '0002_advertisement_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='classifiedsadvertisementimage',
+            unique_together={('advertisement', 'sequence_number')},
+        ),
+    ]
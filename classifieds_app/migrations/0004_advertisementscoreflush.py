@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:43
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classifieds_app', '0003_classifiedsadvertisementimage_unique_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdvertisementScoreFlush',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('batch_id', models.CharField(max_length=64, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Advertisement Score Flush',
+                'verbose_name_plural': 'Advertisement Score Flushes',
+                'indexes': [models.Index(fields=['created'], name='classifieds_created_6fba51_idx')],
+            },
+        ),
+    ]
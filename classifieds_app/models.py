@@ -1,13 +1,44 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connection, models, transaction
+from django.db.models import OuterRef, QuerySet, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Concat, Lower
 
+from classifieds_app.constants import ClassifiedsConstants
+from classifieds_app.utils import ClassifiedsCategoryCache
 from core.boilerplate.model_template import TemplateModel
 from user_app.models import User
 
 
+class ClassifiedsCategoryQuerySet(QuerySet):
+    """
+    Invalidates the category cache on the bulk write paths that bypass `save()`/`delete()`
+    (queryset `update`/`delete`, `bulk_create`, admin bulk actions); `bulk_update` goes through `update`.
+    Invalidation waits for the commit, otherwise a concurrent read could cache the rows still being written.
+    """
+
+    def update(self, **kwargs):
+        updated = super().update(**kwargs)
+        transaction.on_commit(ClassifiedsCategoryCache.invalidate)
+        return updated
+
+    def delete(self):
+        deleted = super().delete()
+        transaction.on_commit(ClassifiedsCategoryCache.invalidate)
+        return deleted
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        transaction.on_commit(ClassifiedsCategoryCache.invalidate)
+        return created
+
+
 class ClassifiedsCategory(TemplateModel):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
 
+    objects = ClassifiedsCategoryQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -15,7 +46,25 @@ class ClassifiedsCategory(TemplateModel):
         if not self.name:
             raise ValueError("Category name cannot be empty.")
         self.name = self.name.lstrip().rstrip().lower()
+
+        renamed = False
+        if not self._state.adding:
+            previous = ClassifiedsCategory.objects.filter(
+                pk=self.pk).values_list('name', flat=True).first()
+            renamed = previous is not None and previous != self.name
+
         super().save(*args, **kwargs)
+        transaction.on_commit(ClassifiedsCategoryCache.invalidate)
+
+        ## The category name is part of every advertisement's search index.
+        if renamed:
+            ClassifiedsAdvertisement.refresh_search_index(
+                objs=ClassifiedsAdvertisement.objects.filter(category=self))
+
+    def delete(self, *args, **kwargs):
+        deleted = super().delete(*args, **kwargs)
+        transaction.on_commit(ClassifiedsCategoryCache.invalidate)
+        return deleted
 
     class Meta:
         verbose_name = "Classifieds Category"
@@ -39,10 +88,105 @@ class ClassifiedsAdvertisement(TemplateModel):
         ClassifiedsCategory, on_delete=models.CASCADE, related_name='advertisements')
     score = models.IntegerField(default=0)
     is_active = models.BooleanField(default=True)
+    search_vector = SearchVectorField(
+        blank=True, null=True, editable=False, help_text="Weighted full-text index of the title, description and category")
+    search_document = models.TextField(
+        blank=True, null=True, editable=False, help_text="Lower-cased title, description and category for trigram matching")
+
+    SEARCH_INDEX_FIELDS = (
+        'title',
+        'description',
+        'category',
+    )
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._search_index_values = instance.get_search_index_values()
+        return instance
+
+    def get_search_index_values(self) -> dict:
+        """
+        The loaded values of the indexed columns, deferred ones are left out.
+
+        Read from `__dict__`: `getattr` on a deferred field loads it, and loading goes through `from_db` again.
+        """
+        attnames = (self._meta.get_field(name).attname for name in self.SEARCH_INDEX_FIELDS)
+        return {attname: self.__dict__[attname] for attname in attnames if attname in self.__dict__}
+
+    def save(self, *args, **kwargs):
+        ## (prithoo): Only re-index when an indexed column changed since the row was loaded (or on insert);
+        ## a column that was deferred at load time and has been assigned since counts as changed.
+        current = self.get_search_index_values()
+        loaded = getattr(self, '_search_index_values', None)
+        changed = self._state.adding or loaded is None or current != loaded
+        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not set(update_fields) & set(self.SEARCH_INDEX_FIELDS):
+            return
+        if changed:
+            ClassifiedsAdvertisement.refresh_search_index(
+                objs=ClassifiedsAdvertisement.objects.filter(pk=self.pk))
+        self._search_index_values = current
+
+    @classmethod
+    def refresh_search_index(cls, objs: QuerySet = None) -> int:
+        """
+        Recompute `search_vector` and `search_document` for `objs` in a single UPDATE statement.
+        """
+        if objs is None:
+            objs = cls.objects.all()
+
+        category_name = Subquery(
+            ClassifiedsCategory.objects.filter(pk=OuterRef('category_id')).values('name')[:1])
+
+        return objs.update(
+            search_vector=(
+                SearchVector('title', weight='A', config=ClassifiedsConstants.SEARCH_CONFIG)
+                + SearchVector('description', weight='B', config=ClassifiedsConstants.SEARCH_CONFIG)
+                + SearchVector(category_name, weight='C', config=ClassifiedsConstants.SEARCH_CONFIG)
+            ),
+            search_document=Lower(Concat(
+                Cast('title', output_field=models.TextField()),
+                Value(' ', output_field=models.TextField()),
+                Coalesce('description', Value('', output_field=models.TextField())),
+                Value(' ', output_field=models.TextField()),
+                Coalesce(category_name, Value(''), output_field=models.TextField()),
+                output_field=models.TextField()
+            ))
+        )
+
+    @classmethod
+    def apply_score_deltas(cls, deltas: dict = None, batch_size: int = 500) -> int:
+        """
+        Add `{advertisement_id: delta}` to the stored scores with `UPDATE ... FROM (VALUES ...)` statements.
+
+        The increment is evaluated by the database (like an `F()` expression) so concurrent updates are
+        never lost, and neither `updated` nor any other column is rewritten.
+        """
+        rows = [(f"{pk}", int(delta)) for pk, delta in (deltas or {}).items() if int(delta)]
+        table = connection.ops.quote_name(cls._meta.db_table)
+        score = connection.ops.quote_name(cls._meta.get_field('score').column)
+        pk = connection.ops.quote_name(cls._meta.pk.column)
+
+        updated = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            for i in range(0, len(rows), batch_size):
+                batch = rows[i:i + batch_size]
+                values = ", ".join(["(%s::uuid, %s::integer)"] * len(batch))
+                cursor.execute(
+                    f"UPDATE {table} SET {score} = {table}.{score} + deltas.delta "
+                    f"FROM (VALUES {values}) AS deltas (id, delta) WHERE {table}.{pk} = deltas.id",
+                    [param for row in batch for param in row]
+                )
+                updated += cursor.rowcount
+
+        return updated
+
     class Meta:
         verbose_name = "Classifieds Advertisement"
         verbose_name_plural = "Classifieds Advertisements"
@@ -51,6 +195,9 @@ class ClassifiedsAdvertisement(TemplateModel):
             models.Index(fields=('id',)),
             models.Index(fields=('title',)),
             models.Index(fields=('category', 'creator',)),
+            GinIndex(fields=('search_vector',), name='classifieds_ad_search_vec_gin'),
+            GinIndex(fields=('search_document',), name='classifieds_ad_search_doc_trgm',
+                     opclasses=('gin_trgm_ops',)),
         )
 
 
@@ -134,3 +281,18 @@ class UserSavedAdvertisement(TemplateModel):
             models.Index(fields=('id',)),
             models.Index(fields=('advertisement',)),
         )
+
+
+class AdvertisementScoreFlush(TemplateModel):
+    """
+    Marks a batch of buffered score deltas as applied; written in the same transaction as the scores,
+    so a flush retried after a crash never applies the same batch twice.
+    """
+    batch_id = models.CharField(max_length=64, unique=True)
+
+    class Meta:
+        verbose_name = "Advertisement Score Flush"
+        verbose_name_plural = "Advertisement Score Flushes"
+        indexes = (
+            models.Index(fields=('created',)),
+        )
@@ -2,9 +2,15 @@ from rest_framework.serializers import ModelSerializer
 from drf_base64.fields import Base64ImageField
 from classifieds_app.models import ClassifiedsCategory, ClassifiedsAdvertisement, ClassifiedsAdvertisementImage, ClassifiedsAdvertisementComment, \
     UserAdvertisementLike, UserSavedAdvertisement
+from core.boilerplate.serializer_template import FastRepresentationMixin, PrefetchPlanMixin
 from user_app.serializers import ShowUserSerializer
 
 
+## Columns the nested category/user serializers render; used to trim the prefetch plans below.
+CATEGORY_ONLY = tuple(f"category__{field}" for field in ("id", "created", "updated", "name", "description"))
+CREATOR_ONLY = tuple(f"creator__{field}" for field in ShowUserSerializer.Meta.fields)
+
+
 class ClassifiedsCategoryIOSerializer(ModelSerializer):
 
     class Meta:
@@ -16,26 +22,39 @@ class ClassifiedsAdvertisementInputSerializer(ModelSerializer):
 
     class Meta:
         model = ClassifiedsAdvertisement
-        fields = "__all__"
+        exclude = ("search_vector", "search_document",)
 
 
-class ClassifiedsAdvertisementOutputSerializer(ModelSerializer):
+class ClassifiedsAdvertisementOutputSerializer(PrefetchPlanMixin, ModelSerializer):
 
     category = ClassifiedsCategoryIOSerializer(read_only=True)
     creator = ShowUserSerializer(read_only=True)
     moderators = ShowUserSerializer(many=True, read_only=True)
 
+    SELECT_RELATED = ('category', 'creator',)
+    PREFETCH_RELATED = ('moderators',)
+    PREFETCH_ONLY = {'moderators': ShowUserSerializer.Meta.fields}
+    ONLY = ('id', 'created', 'updated', 'title', 'description', 'creator', 'price', 'category', 'score',
+            'is_active',) + CATEGORY_ONLY + CREATOR_ONLY
+
     class Meta:
         model = ClassifiedsAdvertisement
-        fields = "__all__"
+        exclude = ("search_vector", "search_document",)
 
 
-class ClassifiedsAdvertisementDisplaySerializer(ModelSerializer):
+class ClassifiedsAdvertisementDisplaySerializer(FastRepresentationMixin, PrefetchPlanMixin, ModelSerializer):
 
     category = ClassifiedsCategoryIOSerializer(read_only=True)
     creator = ShowUserSerializer(read_only=True)
     moderators = ShowUserSerializer(many=True, read_only=True)
 
+    SELECT_RELATED = ('category', 'creator',)
+    PREFETCH_RELATED = ('moderators',)
+    PREFETCH_ONLY = {'moderators': ShowUserSerializer.Meta.fields}
+    ## `created` is not rendered but is the keyset for cursor pagination.
+    ONLY = ('id', 'created', 'title', 'description', 'creator', 'price', 'category', 'score',
+            'is_active',) + CATEGORY_ONLY + CREATOR_ONLY
+
     class Meta:
         model = ClassifiedsAdvertisement
         fields = (
@@ -67,10 +86,15 @@ class ClassifiedsAdvertisementImageOutputSerializer(ModelSerializer):
         fields = "__all__"
 
 
-class ClassifiedsAdvertisementImageDisplaySerializer(ModelSerializer):
+class ClassifiedsAdvertisementImageDisplaySerializer(PrefetchPlanMixin, ModelSerializer):
     image = Base64ImageField(required=False, allow_null=True)
     advertisement = ClassifiedsAdvertisementDisplaySerializer(read_only=True)
 
+    SELECT_RELATED = ('advertisement__category', 'advertisement__creator',)
+    PREFETCH_RELATED = ('advertisement__moderators',)
+    ONLY = ('id', 'created', 'updated', 'title', 'alt_text', 'advertisement', 'image', 'sequence_number',) + tuple(
+        f"advertisement__{field}" for field in ClassifiedsAdvertisementDisplaySerializer.ONLY)
+
     class Meta:
         model = ClassifiedsAdvertisementImage
         fields = "__all__"
@@ -1,22 +1,36 @@
+from django.db.models import F
 from django.db.models.signals import post_save, pre_save, pre_delete, post_delete
 
-from classifieds_app.models import ClassifiedsAdvertisementComment, ClassifiedsAdvertisementImage, UserAdvertisementLike, UserSavedAdvertisement
+from classifieds_app.models import ClassifiedsAdvertisement, ClassifiedsAdvertisementComment, ClassifiedsAdvertisementImage, UserAdvertisementLike, UserSavedAdvertisement
 from classifieds_app.constants import ClassifiedsConstants
+from classifieds_app.utils import AdvertisementScoreUtils
 
 from classifieds_app import logger
 
 
+def add_to_score(advertisement_id: str = None, delta: float = 0) -> None:
+    """
+    Queue a score change for the flusher; if it cannot be buffered, apply its whole part in place atomically.
+
+    `score` is an integer column, the fractional remainder is held until Redis is back.
+    """
+    if not AdvertisementScoreUtils.record(advertisement_id=advertisement_id, delta=delta):
+        whole = AdvertisementScoreUtils.hold(advertisement_id=advertisement_id, delta=delta)
+        if whole:
+            ClassifiedsAdvertisement.objects.filter(
+                pk=advertisement_id).update(score=F('score') + whole)
+
+
 class ClassifiedsAdvertisementCommentSignals:
     MODEL = ClassifiedsAdvertisementComment
 
     @classmethod
     def created(cls, sender, instance: ClassifiedsAdvertisementComment, created, *args, **kwargs):
         if created:
-            advertisement = instance.advertisement
-            advertisement.score += ClassifiedsConstants.ONE_COMMENT_WEIGHT
-            advertisement.save()
+            add_to_score(advertisement_id=instance.advertisement_id,
+                         delta=ClassifiedsConstants.ONE_COMMENT_WEIGHT)
             logger.info(
-                f"New comment for advertisement {advertisement.id} by {instance.user.email}.")
+                f"New comment for advertisement {instance.advertisement_id} by {instance.user.email}.")
 
     @classmethod
     def updated(cls, sender, instance: ClassifiedsAdvertisementComment, created, *args, **kwargs):
@@ -26,9 +40,8 @@ class ClassifiedsAdvertisementCommentSignals:
 
     @classmethod
     def deleted(cls, sender, instance: ClassifiedsAdvertisementComment, *args, **kwargs):
-        advertisement = instance.advertisement
-        advertisement.score -= ClassifiedsConstants.ONE_COMMENT_WEIGHT
-        advertisement.save()
+        add_to_score(advertisement_id=instance.advertisement_id,
+                     delta=-ClassifiedsConstants.ONE_COMMENT_WEIGHT)
 
 
 post_save.connect(receiver=ClassifiedsAdvertisementCommentSignals.created,
@@ -59,9 +72,8 @@ class UserAdvertisementLikeSignals:
     @classmethod
     def created(cls, sender, instance: UserAdvertisementLike, created, *args, **kwargs):
         if created:
-            advertisement = instance.advertisement
-            advertisement.score += ClassifiedsConstants.ONE_LIKE_WEIGHT
-            advertisement.save()
+            add_to_score(advertisement_id=instance.advertisement_id,
+                         delta=ClassifiedsConstants.ONE_LIKE_WEIGHT)
 
 
 post_save.connect(receiver=UserAdvertisementLikeSignals.created,
@@ -75,10 +87,9 @@ class UserSavedAdvertisementSignals:
     def created(cls, sender, instance: UserSavedAdvertisement, created, *args, **kwargs):
         if created:
             logger.info(
-                f"Advertisement {instance.advertisement.id} saved by user {instance.user.email}.")
-            advertisement = instance.advertisement
-            advertisement.score += ClassifiedsConstants.ONE_SAVE_WEIGHT
-            advertisement.save()
+                f"Advertisement {instance.advertisement_id} saved by user {instance.user.email}.")
+            add_to_score(advertisement_id=instance.advertisement_id,
+                         delta=ClassifiedsConstants.ONE_SAVE_WEIGHT)
 
 
 post_save.connect(receiver=UserSavedAdvertisementSignals.created,
@@ -1,3 +1,350 @@
-from django.test import TestCase
+from datetime import datetime, timezone
+from decimal import Decimal
+from json import loads
+from unittest.mock import patch
+from uuid import uuid4
 
-# Create your tests here.
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase
+
+from rest_framework.renderers import JSONRenderer
+
+from classifieds_app.constants import ClassifiedsConstants
+from classifieds_app.helpers import ClassifiedsAdvertisementHelper
+from classifieds_app.cron import FlushAdvertisementScores
+from classifieds_app.models import AdvertisementScoreFlush, ClassifiedsAdvertisement, ClassifiedsCategory
+from classifieds_app.serializers import ClassifiedsAdvertisementDisplaySerializer
+from classifieds_app.utils import AdvertisementScoreUtils, ClassifiedsCategoryCache, CursorPaginationUtils
+from user_app.models import User
+
+
+class CursorPaginationUtilsTestCase(SimpleTestCase):
+
+    def test_encode_decode_round_trip(self):
+        created = datetime(2025, 8, 2, 18, 42, 7, 123456, tzinfo=timezone.utc)
+        pk = uuid4()
+        cursor = CursorPaginationUtils.encode((created, pk))
+
+        self.assertNotIn("=", cursor)
+        values = CursorPaginationUtils.decode(cursor=cursor, size=2)
+        self.assertEqual(datetime.fromisoformat(values[0]), created)
+        self.assertEqual(values[1], str(pk))
+
+    def test_decode_keeps_float_precision(self):
+        similarity = 1.2345678901234567
+        values = CursorPaginationUtils.decode(
+            cursor=CursorPaginationUtils.encode((similarity, "abc")))
+        self.assertEqual(values[0], similarity)
+
+    def test_decode_rejects_invalid_cursor(self):
+        with self.assertRaises(CursorPaginationUtils.InvalidCursor):
+            CursorPaginationUtils.decode(cursor="not-a-cursor")
+
+        with self.assertRaises(CursorPaginationUtils.InvalidCursor):
+            CursorPaginationUtils.decode(
+                cursor=CursorPaginationUtils.encode((1,)), size=2)
+
+    def test_after_builds_row_comparison(self):
+        query = CursorPaginationUtils.after(fields=("created", "id"), values=["x", "y"])
+        expected = Q(created__lt="x") | (Q(id__lt="y") & Q(created="x"))
+        self.assertEqual(query, expected)
+
+
+class AdvertisementScoreUtilsTestCase(SimpleTestCase):
+
+    def test_split_carries_fractional_remainder(self):
+        whole, remainder = AdvertisementScoreUtils.split(delta=0.1 + 0.2 + 0.9)
+        self.assertEqual(whole, 1)
+        self.assertEqual(remainder, 0.2)
+
+    def test_split_negative_delta(self):
+        whole, remainder = AdvertisementScoreUtils.split(delta=-1.25)
+        self.assertEqual(whole, -1)
+        self.assertEqual(remainder, -0.25)
+
+    def test_split_below_one(self):
+        self.assertEqual(AdvertisementScoreUtils.split(delta=0.05), (0, 0.05))
+
+    def test_hold_accumulates_fractional_deltas(self):
+        advertisement_id = f"{uuid4()}"
+        applied = sum(AdvertisementScoreUtils.hold(advertisement_id=advertisement_id, delta=0.1) for _ in range(25))
+        self.assertEqual(applied, 2)
+        self.assertEqual(AdvertisementScoreUtils._held.pop(advertisement_id), 0.5)
+
+
+class FlushAdvertisementScoresTestCase(SimpleTestCase):
+
+    def run_flush(self, created: bool = True, existing: list = None):
+        deltas = {"a": 1.25, "b": -0.1}
+        with patch.object(AdvertisementScoreUtils, "take_pending", return_value=("batch", deltas)), \
+                patch.object(AdvertisementScoreUtils, "settle") as settle, \
+                patch.object(ClassifiedsAdvertisement.objects, "filter") as filter_, \
+                patch.object(AdvertisementScoreFlush.objects, "get_or_create", return_value=(None, created)), \
+                patch.object(AdvertisementScoreFlush.objects, "filter"), \
+                patch.object(ClassifiedsAdvertisement, "apply_score_deltas", return_value=1) as apply, \
+                patch("classifieds_app.cron.transaction.atomic"):
+            filter_.return_value.values_list.return_value = existing if existing is not None else ["a"]
+            FlushAdvertisementScores().do()
+        return apply, settle
+
+    def test_drops_deleted_advertisements(self):
+        apply, settle = self.run_flush()
+        apply.assert_called_once_with(deltas={"a": 1})
+        settle.assert_called_once_with(remainders={"a": 0.25})
+
+    def test_applied_batch_is_only_settled(self):
+        apply, settle = self.run_flush(created=False)
+        apply.assert_not_called()
+        settle.assert_called_once_with(remainders={"a": 0.25})
+
+
+class ClassifiedsCategoryCacheTestCase(SimpleTestCase):
+
+    def test_page_number_is_normalised(self):
+        self.assertEqual(ClassifiedsCategoryCache.page_number("3"), 3)
+        self.assertEqual(ClassifiedsCategoryCache.page_number(-2), 1)
+        self.assertEqual(ClassifiedsCategoryCache.page_number("last"), 1)
+        self.assertEqual(ClassifiedsCategoryCache.page_number(None), 1)
+
+
+class ClassifiedsCategoryInvalidationTestCase(TestCase):
+
+    def setUp(self):
+        patcher = patch.object(ClassifiedsCategoryCache, "invalidate")
+        self.invalidate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_save_invalidates_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            category = ClassifiedsCategory.objects.create(name="Bikes")
+            category.delete()
+            self.invalidate.assert_not_called()
+
+        self.assertEqual(len(callbacks), 2)
+        self.assertEqual(self.invalidate.call_count, 2)
+
+    def test_queryset_writes_invalidate_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            ClassifiedsCategory.objects.bulk_create([ClassifiedsCategory(name="bikes"), ClassifiedsCategory(name="cars")])
+            ClassifiedsCategory.objects.filter(name="bikes").update(description="")
+            ClassifiedsCategory.objects.filter(name="cars").delete()
+            self.invalidate.assert_not_called()
+
+        self.assertEqual(len(callbacks), 3)
+        self.assertEqual(self.invalidate.call_count, 3)
+
+    def test_rolled_back_write_does_not_invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                ClassifiedsCategory.objects.create(name="Bikes")
+                raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        self.invalidate.assert_not_called()
+
+
+class ClassifiedsAdvertisementSearchCursorTestCase(SimpleTestCase):
+
+    def test_similarity_is_double_precision(self):
+        ## (prithoo): `ts_rank` and `similarity` are `real`; compared against the decoded cursor (a Python float) they never tie.
+        sql, _ = ClassifiedsAdvertisementHelper.search_index(query="red bike").query.sql_with_params()
+        self.assertIn("::double precision", sql)
+
+
+class ClassifiedsAdvertisementSearchPaginationTestCase(TestCase):
+
+    def setUp(self) -> None:
+        creator = User.objects.create_user(
+            username="test.creator.001", email="test.creator.001@email.com", password="R4nd0mPa$$word")
+        category = ClassifiedsCategory.objects.create(name="Bikes", description="Test category.")
+        ## (prithoo): Identical rows, so every similarity ties and the page boundary falls inside the tie.
+        for _ in range(settings.MAX_ITEMS_PER_PAGE + 5):
+            ClassifiedsAdvertisement.objects.create(
+                title="Red bike", description="A red bike", creator=creator, price=1, category=category)
+
+    def collect(self, mode: str = None) -> list:
+        seen, cursor = [], ""
+        while cursor is not None:
+            resp = ClassifiedsAdvertisementHelper.search(query="red bike", cursor=cursor, mode=mode, return_obj=True)
+            self.assertIsNone(resp.error)
+            seen += [obj.pk for obj in resp.data["results"]]
+            cursor = resp.data["next_cursor"]
+        return seen
+
+    def test_tied_similarities_across_pages(self):
+        expected = set(ClassifiedsAdvertisement.objects.values_list("pk", flat=True))
+        for mode in ClassifiedsConstants.SEARCH_MODES:
+            seen = self.collect(mode=mode)
+            self.assertEqual(len(seen), len(expected))
+            self.assertEqual(set(seen), expected)
+
+
+class ClassifiedsAdvertisementSearchIndexTestCase(SimpleTestCase):
+
+    def get_loaded(self) -> ClassifiedsAdvertisement:
+        fields = [field.attname for field in ClassifiedsAdvertisement._meta.concrete_fields]
+        values = {name: None for name in fields}
+        values.update({"id": uuid4(), "title": "Bike", "description": "Red", "category_id": uuid4(), "price": Decimal("1")})
+        return ClassifiedsAdvertisement.from_db("default", fields, [values[name] for name in fields])
+
+    def test_unchanged_save_skips_refresh(self):
+        advertisement = self.get_loaded()
+        with patch("django.db.models.Model.save"), \
+                patch.object(ClassifiedsAdvertisement, "refresh_search_index") as refresh:
+            advertisement.price = Decimal("2")
+            advertisement.save()
+        refresh.assert_not_called()
+
+    def test_changed_title_refreshes_once(self):
+        advertisement = self.get_loaded()
+        with patch("django.db.models.Model.save"), \
+                patch.object(ClassifiedsAdvertisement, "refresh_search_index") as refresh:
+            advertisement.title = "Blue bike"
+            advertisement.save()
+            advertisement.save()
+        refresh.assert_called_once()
+
+    def get_deferred(self) -> ClassifiedsAdvertisement:
+        ## (prithoo): What `.only("id")` (and the delete collector) load; touching a deferred field would query.
+        return ClassifiedsAdvertisement.from_db("default", ["id"], [uuid4()])
+
+    def test_deferred_load_does_not_query(self):
+        advertisement = self.get_deferred()
+        self.assertEqual(advertisement.get_search_index_values(), {})
+        self.assertIn("title", advertisement.get_deferred_fields())
+
+    def test_deferred_field_assigned_after_load_refreshes(self):
+        advertisement = self.get_deferred()
+        with patch("django.db.models.Model.save"), \
+                patch.object(ClassifiedsAdvertisement, "refresh_search_index") as refresh:
+            advertisement.save()
+            refresh.assert_not_called()
+
+            advertisement.title = "Bike"
+            advertisement.save()
+        refresh.assert_called_once()
+
+
+class ClassifiedsAdvertisementDeletionTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.creator = User.objects.create_user(
+            username="test.creator.001", email="test.creator.001@email.com", password="R4nd0mPa$$word")
+        self.category = ClassifiedsCategory.objects.create(name="Test Category", description="Test category.")
+        self.advertisement = ClassifiedsAdvertisement.objects.create(
+            title="Bike", description="Red", creator=self.creator, price=1, category=self.category)
+
+    def test_only_id(self):
+        advertisement = ClassifiedsAdvertisement.objects.only("id").get(pk=self.advertisement.pk)
+        self.assertEqual(advertisement.title, "Bike")
+
+    def test_delete_category_with_advertisements(self):
+        self.category.delete()
+        self.assertFalse(ClassifiedsAdvertisement.objects.filter(pk=self.advertisement.pk).exists())
+
+    def test_delete_user_with_advertisements(self):
+        User.objects.filter(pk=self.creator.pk).delete()
+        self.assertFalse(ClassifiedsAdvertisement.objects.filter(pk=self.advertisement.pk).exists())
+
+
+class ClassifiedsAdvertisementDisplaySerializerTestCase(SimpleTestCase):
+
+    def build_advertisements(self, count: int = 3):
+        joined = datetime(2025, 8, 2, 18, 42, 7, 123456, tzinfo=timezone.utc)
+        creator = User(username="test.creator.001", email="test.creator.001@email.com", date_joined=joined)
+        category = ClassifiedsCategory(name="Test Category", description=None, created=joined, updated=joined)
+
+        objs = []
+        for i in range(count):
+            obj = ClassifiedsAdvertisement(
+                title=f"Advertisement {i}", description=f"Description \u00e9 {i}", creator=creator,
+                price=Decimal(f"{i}.5"), category=category, score=i, is_active=bool(i % 2))
+            ## (prithoo): Stands in for `prefetch_related('moderators')`, so no database is needed.
+            obj._prefetched_objects_cache = {"moderators": [
+                User(username=f"test.moderator.{i:03}", email=None, date_joined=joined)
+            ] * i}
+            objs.append(obj)
+
+        return objs
+
+    def test_represent_many_matches_serializer_output(self):
+        objs = self.build_advertisements()
+        expected = JSONRenderer().render(ClassifiedsAdvertisementDisplaySerializer(objs, many=True).data)
+        actual = JSONRenderer().render(ClassifiedsAdvertisementDisplaySerializer.represent_many(objs))
+        self.assertEqual(actual, expected)
+
+    def test_represent_matches_serializer_output(self):
+        obj = self.build_advertisements(count=1)[0]
+        obj.category = None
+        self.assertEqual(
+            ClassifiedsAdvertisementDisplaySerializer.represent(obj), ClassifiedsAdvertisementDisplaySerializer(obj).data)
+
+
+class ClassifiedsAdvertisementGetOneTestCase(SimpleTestCase):
+
+    def get_one(self, obj=None, user=None):
+        with patch.object(ClassifiedsAdvertisement.objects, "filter") as filter_, \
+                patch.object(ClassifiedsAdvertisementDisplaySerializer, "prefetch", side_effect=lambda objs: objs):
+            filter_.return_value.first.return_value = obj
+            return ClassifiedsAdvertisementHelper.get_one(user=user, pk=f"{uuid4()}")
+
+    def test_missing_advertisement_is_404(self):
+        self.assertEqual(self.get_one(obj=None, user=User(pk=uuid4())).status_code, 404)
+
+    def test_inactive_advertisement_hidden_from_anonymous(self):
+        advertisement = ClassifiedsAdvertisement(pk=uuid4(), title="Bike", is_active=False, creator_id=uuid4())
+        self.assertEqual(self.get_one(obj=advertisement, user=None).status_code, 404)
+
+
+class ClassifiedsAdvertisementExportTestCase(SimpleTestCase):
+
+    def test_export_streams_every_chunk_as_one_array(self):
+        objs = ClassifiedsAdvertisementDisplaySerializerTestCase().build_advertisements(count=3)
+        pages = [(objs[:2], "next"), (objs[2:], None)]
+
+        with patch.object(CursorPaginationUtils, "paginate", side_effect=pages) as paginate:
+            body = b"".join(ClassifiedsAdvertisementHelper.export(chunk_size=2))
+
+        self.assertEqual(paginate.call_count, 2)
+        self.assertEqual(paginate.call_args.kwargs["cursor"], "next")
+        self.assertEqual(
+            loads(body), loads(JSONRenderer().render(ClassifiedsAdvertisementDisplaySerializer(objs, many=True).data)))
+
+    def test_export_empty_catalogue(self):
+        with patch.object(CursorPaginationUtils, "paginate", return_value=([], None)):
+            self.assertEqual(b"".join(ClassifiedsAdvertisementHelper.export()), b"[]")
+
+
+class ClassifiedsAdvertisementQueryCountTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.creator = User.objects.create_user(
+            username="test.creator.001", email="test.creator.001@email.com", password="R4nd0mPa$$word")
+        moderators = [
+            User.objects.create_user(
+                username=f"test.moderator.{i:03}", email=f"test.moderator.{i:03}@email.com", password="R4nd0mPa$$word")
+            for i in range(3)
+        ]
+        category = ClassifiedsCategory.objects.create(name="Test Category", description="Test category.")
+
+        for i in range(settings.MAX_ITEMS_PER_PAGE):
+            advertisement = ClassifiedsAdvertisement.objects.create(
+                title=f"Advertisement {i}", description=f"Description {i}", creator=self.creator,
+                price=i, category=category, is_active=True)
+            advertisement.moderators.set(moderators)
+
+    def test_list_query_count_is_constant(self):
+        ## exists + count + page + moderators prefetch, regardless of the page size.
+        with self.assertNumQueries(4):
+            resp = ClassifiedsAdvertisementHelper.list(page_no=1)
+        self.assertIsNone(resp.error)
+        self.assertEqual(len(resp.data), settings.MAX_ITEMS_PER_PAGE)
+
+    def test_cursor_list_query_count_is_constant(self):
+        ## page + moderators prefetch.
+        with self.assertNumQueries(2):
+            resp = ClassifiedsAdvertisementHelper.list(cursor="")
+        self.assertIsNone(resp.error)
+        self.assertEqual(len(resp.data["results"][0]["moderators"]), 3)
@@ -0,0 +1,294 @@
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from datetime import datetime
+from decimal import Decimal
+from json import dumps, loads
+from threading import Lock
+from typing import Any, Dict, List, Tuple
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, Q, QuerySet
+
+from classifieds_app.constants import ClassifiedsConstants
+
+from classifieds_app import logger
+
+
+class CursorPaginationUtils:
+    """
+    Utilities for keyset (cursor) pagination over querysets.
+
+    The cursor is an opaque, url-safe string encoding the ordering values of the last row of the
+    previous page; the next page is fetched with a `WHERE (a, b) < (x, y)` style filter instead of an
+    `OFFSET`, so deep pages cost the same as the first one and no `COUNT(*)` is issued.
+
+    Only descending orderings are supported, which is all the listing endpoints need.
+    """
+
+    class InvalidCursor(ValueError):
+        pass
+
+    @classmethod
+    def _to_json_value(cls, value: Any) -> Any:
+        ## (prithoo): `DjangoJSONEncoder` truncates datetimes to milliseconds, which would make the cursor skip rows.
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, (UUID, Decimal)):
+            return f"{value}"
+        return value
+
+    @classmethod
+    def encode(cls, values: Tuple) -> str:
+        raw = dumps([cls._to_json_value(value) for value in values], separators=(",", ":"))
+        return urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @classmethod
+    def decode(cls, cursor: str = None, size: int = None) -> List[Any]:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = loads(urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        except Exception as ex:
+            logger.warning(f"Unable to decode cursor '{cursor}': {ex}")
+            raise cls.InvalidCursor(f"Cursor '{cursor}' is invalid.")
+
+        if not isinstance(values, list) or (size and len(values) != size):
+            raise cls.InvalidCursor(f"Cursor '{cursor}' is invalid.")
+
+        return values
+
+    @classmethod
+    def after(cls, fields: Tuple[str], values: List[Any]) -> Q:
+        """
+        Build the filter selecting rows strictly after `values` for a descending ordering on `fields`.
+        """
+        query = Q()
+        for i, field in enumerate(fields):
+            condition = Q(**{f"{field}__lt": values[i]})
+            for j in range(i):
+                condition &= Q(**{fields[j]: values[j]})
+            query |= condition
+
+        return query
+
+    @classmethod
+    def paginate(cls, objs: QuerySet, fields: Tuple[str], cursor: str = None, page_size: int = None) -> Tuple[List[Model], str]:
+        """
+        Return one page of `objs` ordered by `fields` (descending) and the cursor for the next page.
+
+        `cursor` is the value returned by the previous call; a blank cursor returns the first page.
+        The next cursor is `None` on the last page.
+        """
+        objs = objs.order_by(*[f"-{field}" for field in fields])
+        if cursor:
+            objs = objs.filter(cls.after(fields=fields, values=cls.decode(cursor=cursor, size=len(fields))))
+
+        ## Fetch one extra row to find out whether there is a next page without counting.
+        rows = list(objs[:page_size + 1])
+        if len(rows) <= page_size:
+            return rows, None
+
+        rows = rows[:page_size]
+        return rows, cls.encode(tuple(getattr(rows[-1], field) for field in fields))
+
+
+class ClassifiedsCategoryCache:
+    """
+    Read-through Redis cache for serialized category payloads.
+
+    Every key embeds a version number; any write to the category table bumps the version, which
+    atomically invalidates every cached entry, stale versions simply expire via their TTL.
+    Redis being unavailable is never fatal, callers fall back to the database.
+    """
+
+    PREFIX: str = "classifieds:category"
+    VERSION_KEY: str = f"{PREFIX}:version"
+    TIMEOUT: int = ClassifiedsConstants.CATEGORY_CACHE_TIMEOUT
+
+    @classmethod
+    def get_connection(cls):
+        return getattr(settings, "REDIS_CONN", None)
+
+    @classmethod
+    def key(cls, version: int, *parts) -> str:
+        return ":".join([cls.PREFIX, f"v{version}"] + [f"{part}".lower() for part in parts])
+
+    @classmethod
+    def get(cls, *parts) -> Tuple[int, Any]:
+        """
+        Return the current cache version and the cached payload for `parts` (`None` on a miss).
+
+        The version must be handed back to `set`, so that a payload read from the database before a
+        concurrent write is stored under the old, already invalidated, version.
+        """
+        conn = cls.get_connection()
+        if not conn:
+            return None, None
+
+        try:
+            version = int(conn.get(cls.VERSION_KEY) or 0)
+            cached = conn.get(cls.key(version, *parts))
+        except Exception as ex:
+            logger.warning(f"Category cache read failed: {ex}")
+            return None, None
+
+        return version, loads(cached) if cached is not None else None
+
+    @classmethod
+    def set(cls, version: int = None, value: Any = None, *parts) -> None:
+        conn = cls.get_connection()
+        if not conn or version is None:
+            return
+
+        try:
+            conn.set(cls.key(version, *parts), dumps(value, cls=DjangoJSONEncoder), ex=cls.TIMEOUT)
+        except Exception as ex:
+            logger.warning(f"Category cache write failed: {ex}")
+
+    @classmethod
+    def invalidate(cls) -> None:
+        conn = cls.get_connection()
+        if not conn:
+            return
+
+        try:
+            conn.incr(cls.VERSION_KEY)
+        except Exception as ex:
+            logger.error(f"Category cache invalidation failed: {ex}")
+
+    @classmethod
+    def page_number(cls, page_no: Any = None) -> int:
+        """
+        Normalise a requested page number the way `Paginator.get_page` does for the lower bound.
+
+        Pages past the end are clamped to the last page by the paginator; callers cache those under
+        `page.number`, so the number of keys stays bounded by the number of real pages.
+        """
+        try:
+            page_no = int(page_no)
+        except (TypeError, ValueError):
+            return 1
+        return max(page_no, 1)
+
+
+class AdvertisementScoreUtils:
+    """
+    Buffers advertisement score deltas in a Redis hash so that likes, comments and saves never
+    rewrite the advertisement row inline; `FlushAdvertisementScores` applies them in bulk.
+
+    `score` is an integer column while the weights are fractional, so only the whole part of each
+    accumulated delta is flushed and the remainder is carried over to the next flush.
+    """
+
+    PENDING_KEY: str = "classifieds:advertisement:score:pending"
+    PROCESSING_KEY: str = "classifieds:advertisement:score:processing"
+    PROCESSING_ID_KEY: str = "classifieds:advertisement:score:processing:id"
+    PRECISION: int = 6
+
+    ## (prithoo): Remainders of deltas that could not be buffered while Redis was down, see `hold`.
+    _held: Dict[str, float] = {}
+    _held_lock: Lock = Lock()
+
+    @classmethod
+    def get_connection(cls):
+        return getattr(settings, "REDIS_CONN", None)
+
+    @classmethod
+    def record(cls, advertisement_id: str = None, delta: float = 0) -> bool:
+        """
+        Add `delta` to the pending score of an advertisement; returns `False` if it could not be buffered.
+        """
+        conn = cls.get_connection()
+        if not conn:
+            return False
+
+        try:
+            conn.hincrbyfloat(cls.PENDING_KEY, f"{advertisement_id}", delta)
+        except Exception as ex:
+            logger.warning(f"Unable to buffer score delta for advertisement {advertisement_id}: {ex}")
+            return False
+
+        if cls._held:
+            cls.release_held(conn=conn)
+        return True
+
+    @classmethod
+    def hold(cls, advertisement_id: str = None, delta: float = 0) -> int:
+        """
+        Keep a delta that could not be buffered in this process and return the whole part to apply now.
+
+        The fractional remainder stays here until Redis is reachable again, see `release_held`.
+        """
+        advertisement_id = f"{advertisement_id}"
+        with cls._held_lock:
+            whole, remainder = cls.split(delta=cls._held.get(advertisement_id, 0) + delta)
+            if remainder:
+                cls._held[advertisement_id] = remainder
+            else:
+                cls._held.pop(advertisement_id, None)
+        return whole
+
+    @classmethod
+    def release_held(cls, conn = None) -> None:
+        with cls._held_lock:
+            held, cls._held = cls._held, {}
+        try:
+            pipe = conn.pipeline(transaction=True)
+            for advertisement_id, remainder in held.items():
+                pipe.hincrbyfloat(cls.PENDING_KEY, advertisement_id, remainder)
+            pipe.execute()
+        except Exception as ex:
+            logger.warning(f"Unable to buffer {len(held)} held score remainder(s): {ex}")
+            with cls._held_lock:
+                for advertisement_id, remainder in held.items():
+                    cls._held[advertisement_id] = cls._held.get(advertisement_id, 0) + remainder
+
+    @classmethod
+    def take_pending(cls) -> Tuple[str, dict]:
+        """
+        Atomically move the pending deltas aside and return `(batch_id, {advertisement_id: delta})`.
+
+        Deltas left behind by a flush that failed half-way are returned first, with the batch id they
+        were taken under, so the flusher can tell whether they were already applied.
+        """
+        conn = cls.get_connection()
+        if not conn:
+            return None, {}
+
+        if not conn.exists(cls.PROCESSING_KEY):
+            try:
+                conn.rename(cls.PENDING_KEY, cls.PROCESSING_KEY)
+            except Exception:
+                ## (prithoo): `RENAME` fails when the source key does not exist, i.e. there is nothing to flush.
+                return None, {}
+
+        conn.set(cls.PROCESSING_ID_KEY, uuid4().hex, nx=True)
+        batch_id = conn.get(cls.PROCESSING_ID_KEY).decode("utf-8")
+        return batch_id, {
+            key.decode("utf-8"): float(value) for key, value in conn.hgetall(cls.PROCESSING_KEY).items()
+        }
+
+    @classmethod
+    def split(cls, delta: float = 0) -> Tuple[int, float]:
+        """
+        Split a delta into the whole part to be applied now and the remainder to be carried over.
+        """
+        delta = round(delta, cls.PRECISION)
+        whole = int(delta)
+        return whole, round(delta - whole, cls.PRECISION)
+
+    @classmethod
+    def settle(cls, remainders: dict = None) -> None:
+        """
+        Carry the remainders over into the pending hash and drop the processed snapshot, atomically.
+        """
+        conn = cls.get_connection()
+        if not conn:
+            return
+
+        pipe = conn.pipeline(transaction=True)
+        for advertisement_id, remainder in (remainders or {}).items():
+            if remainder:
+                pipe.hincrbyfloat(cls.PENDING_KEY, advertisement_id, remainder)
+        pipe.delete(cls.PROCESSING_KEY, cls.PROCESSING_ID_KEY)
+        pipe.execute()
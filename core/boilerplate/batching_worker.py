@@ -0,0 +1,139 @@
+from atexit import register
+from os import getpid
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+from time import monotonic
+from typing import Any, Dict, List, Tuple
+
+from core import logger
+
+
+class BatchingWorker:
+    """
+    Template for the in-process background writers, see `RequestLogShipper` and `UserTokenUsageRecorder`.
+
+    `put` drops an item into a bounded queue and returns immediately; a daemon thread drains it and hands
+    `flush` a batch whenever `BATCH_SIZE` items are waiting or `FLUSH_INTERVAL` seconds have passed. When
+    the queue is full the item is dropped (and counted) instead of blocking the caller. Whatever is still
+    queued is flushed when the process exits.
+
+    Every subclass gets its own queue, thread, lock and `counters`; subclasses implement `flush` and name
+    their counters in `COUNTERS`, `ACCEPTED` being the one `put` increments.
+    """
+
+    NAME: str = "batching-worker"
+    LABEL: str = "Batching worker"
+    COUNTERS: Tuple[str, ...] = ("accepted", "dropped")
+    ACCEPTED: str = "accepted"
+
+    MAX_QUEUE_SIZE: int = 10_000
+    BATCH_SIZE: int = 200
+    FLUSH_INTERVAL: float = 1.0
+    STOP_TIMEOUT: float = 5.0
+
+    _queue: Queue = None
+    _worker: Thread = None
+    _pid: int = None
+    _lock: Lock = None
+    _counters_lock: Lock = None
+    _stop = object()
+
+    counters: Dict[str, int] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._queue, cls._worker, cls._pid = None, None, None
+        cls._lock, cls._counters_lock = Lock(), Lock()
+        cls.counters = dict.fromkeys(cls.COUNTERS, 0)
+        register(cls.stop)
+
+    @classmethod
+    def count(cls, name: str = None, amount: int = 1) -> int:
+        """
+        Add `amount` to the counter `name` and return its new value; counters are updated from both the
+        request threads and the worker.
+        """
+        with cls._counters_lock:
+            cls.counters[name] = cls.counters.get(name, 0) + amount
+            return cls.counters[name]
+
+    @classmethod
+    def _ensure_worker(cls) -> None:
+        ## (prithoo): A forked child inherits the queue but not the thread, so each process starts its own.
+        if cls._pid == getpid() and cls._worker and cls._worker.is_alive():
+            return
+
+        with cls._lock:
+            if cls._pid == getpid() and cls._worker and cls._worker.is_alive():
+                return
+            cls._queue = Queue(maxsize=cls.MAX_QUEUE_SIZE)
+            cls._pid = getpid()
+            cls._worker = Thread(target=cls._run, args=(cls._queue,), name=cls.NAME, daemon=True)
+            cls._worker.start()
+
+    @classmethod
+    def put(cls, item: Any = None) -> bool:
+        """
+        Queue `item` for the next batch; returns `False` if it had to be dropped.
+        """
+        cls._ensure_worker()
+        try:
+            cls._queue.put_nowait(item)
+        except Full:
+            dropped = cls.count("dropped")
+            if dropped % 1000 == 1:
+                logger.warning(f"{cls.LABEL} queue full, {dropped} item(s) dropped so far.")
+            return False
+
+        cls.count(cls.ACCEPTED)
+        return True
+
+    @classmethod
+    def flush(cls, batch: List[Any] = None) -> None:
+        raise NotImplementedError
+
+    @classmethod
+    def _run(cls, queue: Queue = None) -> None:
+        batch, deadline, stopping = [], None, False
+
+        while not stopping:
+            timeout = None if deadline is None else max(deadline - monotonic(), 0)
+            try:
+                item = queue.get(timeout=timeout)
+                if item is cls._stop:
+                    stopping = True
+                else:
+                    batch.append(item)
+                    deadline = deadline or monotonic() + cls.FLUSH_INTERVAL
+            except Empty:
+                pass
+
+            if batch and (stopping or len(batch) >= cls.BATCH_SIZE or monotonic() >= deadline):
+                try:
+                    cls.flush(batch=batch)
+                except Exception as ex:
+                    logger.exception(f"{cls.LABEL} failed to flush {len(batch)} item(s): {ex}")
+                batch, deadline = [], None
+
+    @classmethod
+    def stop(cls) -> None:
+        """
+        Flush whatever is queued and stop the worker of this process.
+        """
+        worker = cls._worker
+        if not worker or not worker.is_alive() or cls._pid != getpid():
+            return
+
+        try:
+            cls._queue.put(cls._stop, timeout=cls.STOP_TIMEOUT)
+        except Full:
+            logger.warning(f"{cls.LABEL} queue still full on shutdown, pending items are lost.")
+            return
+        worker.join(timeout=cls.STOP_TIMEOUT)
+        logger.info(f"{cls.LABEL} stopped: {cls.stats()}")
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        with cls._counters_lock:
+            counters = dict(cls.counters)
+        return {**counters, "queued": cls._queue.qsize() if cls._queue else 0}
@@ -0,0 +1,116 @@
+from typing import Any, Dict, Iterable, List, Tuple
+
+from django.db.models import Prefetch, QuerySet
+from django.db.models.manager import BaseManager
+
+from rest_framework.fields import Field, SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+class PrefetchPlanMixin:
+    """
+    Declares how a queryset has to be loaded for the serializer to render it without extra queries.
+
+    Helpers pass their querysets through `prefetch()` before serializing them:
+        SELECT_RELATED: forward relations joined into the main query.
+        PREFETCH_RELATED: many-valued relations loaded with one extra query each.
+        PREFETCH_ONLY: columns to load for a (direct) prefetched relation.
+        ONLY: columns to load for the main model and its `SELECT_RELATED` relations.
+    """
+    SELECT_RELATED: Tuple[str] = ()
+    PREFETCH_RELATED: Tuple[str] = ()
+    PREFETCH_ONLY: Dict[str, Tuple[str]] = {}
+    ONLY: Tuple[str] = ()
+
+    @classmethod
+    def prefetch(cls, queryset: QuerySet = None) -> QuerySet:
+        if cls.SELECT_RELATED:
+            queryset = queryset.select_related(*cls.SELECT_RELATED)
+
+        for lookup in cls.PREFETCH_RELATED:
+            if lookup in cls.PREFETCH_ONLY:
+                related_model = queryset.model._meta.get_field(lookup).related_model
+                lookup = Prefetch(
+                    lookup, queryset=related_model.objects.only(*cls.PREFETCH_ONLY[lookup]))
+            queryset = queryset.prefetch_related(lookup)
+
+        if cls.ONLY:
+            queryset = queryset.only(*cls.ONLY)
+
+        return queryset
+
+
+class FastRepresentationMixin:
+    """
+    Read-only fast path for rendering many rows with a `ModelSerializer`.
+
+    The serializer's readable fields are walked once and compiled into a flat plan of
+    `(name, attribute, field, nested plan)` entries; rows are then rendered by iterating the plan,
+    skipping DRF's per-row field lookups, `SkipField` handling and nested serializer dispatch.
+    The output is the same as `Serializer(instances, many=True).data`, minus the `ReturnList` wrapper.
+    """
+    _fast_plans: Dict[type, tuple] = {}
+
+    @classmethod
+    def _compile(cls, serializer: BaseSerializer) -> tuple:
+        plan = []
+        for field in serializer._readable_fields:
+            many = isinstance(field, ListSerializer)
+            nested = field.child if many else field
+            ## (prithoo): Plain attributes are read with `getattr`; anything with its own lookup keeps DRF's.
+            attribute = field.source_attrs[0] if (
+                len(field.source_attrs) == 1 and type(field).get_attribute is Field.get_attribute) else None
+            plan.append((
+                field.field_name,
+                attribute,
+                field,
+                many,
+                cls._compile(nested) if isinstance(nested, BaseSerializer) else None,
+            ))
+
+        return tuple(plan)
+
+    @classmethod
+    def _render(cls, plan: tuple, instance: Any) -> dict:
+        ret = {}
+        for name, attribute, field, many, nested in plan:
+            try:
+                value = getattr(instance, attribute) if attribute is not None else field.get_attribute(instance)
+            except (KeyError, AttributeError):
+                ## (prithoo): Missing values (e.g. an unset relation) go through DRF's default/skip handling.
+                try:
+                    value = field.get_attribute(instance)
+                except SkipField:
+                    continue
+            except SkipField:
+                continue
+
+            if (value.pk if isinstance(value, PKOnlyObject) else value) is None:
+                ret[name] = None
+            elif nested is None:
+                ret[name] = field.to_representation(value)
+            elif many:
+                ret[name] = [
+                    cls._render(nested, item) for item in (value.all() if isinstance(value, BaseManager) else value)
+                ]
+            else:
+                ret[name] = cls._render(nested, value)
+
+        return ret
+
+    @classmethod
+    def get_fast_plan(cls) -> tuple:
+        plan = FastRepresentationMixin._fast_plans.get(cls)
+        if plan is None:
+            plan = FastRepresentationMixin._fast_plans[cls] = cls._compile(cls())
+        return plan
+
+    @classmethod
+    def represent(cls, instance: Any = None) -> dict:
+        return cls._render(cls.get_fast_plan(), instance)
+
+    @classmethod
+    def represent_many(cls, instances: Iterable[Any] = None) -> List[dict]:
+        plan = cls.get_fast_plan()
+        return [cls._render(plan, instance) for instance in instances]
@@ -1,10 +1,12 @@
+CLASSIFIEDS_APP_CRON = [
+    'classifieds_app.cron.FlushAdvertisementScores',
+]
 JOB_HANDLER_APP_CRON = [
     'job_handler_app.cron.MonitorEnqueuedJob',
     'job_handler_app.cron.DeleteOldJobRecords',
 ]
 MIDDLEWARE_APP_CRON = [
-    'middleware_app.cron.DeleteOldUserIPAddresses',
-    'middleware_app.cron.DeleteOldUserMACAdresses',
+    'middleware_app.cron.EnforceMongoRetention',
 ]
 USER_APP_CRON = [
     'user_app.cron.DeleteInactiveUsers',
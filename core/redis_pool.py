@@ -0,0 +1,62 @@
+from os import getpid
+from threading import Lock
+
+import redis
+
+from django.conf import settings
+
+
+class RedisPool:
+    """
+    One Redis client (and connection pool) per process, created on first use.
+
+    Nothing connects at import time; a process that never touches Redis never opens a socket. The
+    client is rebuilt when the process id changes, so a forked worker never shares sockets with its
+    parent; gunicorn also calls `reset` in its `post_fork` hook.
+    """
+
+    MAX_CONNECTIONS: int = 50
+    HEALTH_CHECK_INTERVAL: int = 30
+
+    _client: redis.Redis = None
+    _pid: int = None
+    _lock: Lock = Lock()
+
+    @classmethod
+    def get_connection(cls) -> redis.Redis:
+        client = cls._client
+        if client is not None and cls._pid == getpid():
+            return client
+
+        with cls._lock:
+            if cls._client is None or cls._pid != getpid():
+                pool = redis.ConnectionPool.from_url(
+                    settings.REDIS_URL,
+                    max_connections=cls.MAX_CONNECTIONS,
+                    health_check_interval=cls.HEALTH_CHECK_INTERVAL
+                )
+                cls._client = redis.Redis(connection_pool=pool)
+                cls._pid = getpid()
+            return cls._client
+
+    @classmethod
+    def reset(cls) -> None:
+        """
+        Forget the client of this process; the next use builds a fresh one.
+        """
+        ## (prithoo): Sockets inherited from a parent are only dropped, closing them would hang up on the parent.
+        with cls._lock:
+            cls._client = None
+            cls._pid = None
+
+
+class LazyRedisConnection:
+    """
+    `settings.REDIS_CONN`: behaves like a `redis.Redis` client, resolved through `RedisPool` on every use.
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(RedisPool.get_connection(), name)
+
+    def __repr__(self) -> str:
+        return f"<LazyRedisConnection {settings.REDIS_URL}>"
@@ -1,11 +1,11 @@
 from datetime import timedelta
 from pathlib import Path
-import redis
 from os import path, makedirs, environ
 
 from core.apps import DEFAULT_APPS, THIRD_PARTY_APPS, CUSTOM_APPS
-from core.cron_classes import JOB_HANDLER_APP_CRON, MIDDLEWARE_APP_CRON, USER_APP_CRON
+from core.cron_classes import CLASSIFIEDS_APP_CRON, JOB_HANDLER_APP_CRON, MIDDLEWARE_APP_CRON, USER_APP_CRON
 from core.middleware import DEFAULT_MIDDLEWARE, THIRD_PARTY_MIDDLEWARE, CUSTOM_MIDDLEWARE
+from core.redis_pool import LazyRedisConnection
 from core.rq_constants import JobQ
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -76,6 +76,8 @@ MONGO_HOST = environ.get("MONGO_HOST")
 MONGO_PORT = int(environ.get("MONGO_PORT", 27017))
 MONGO_USER = environ.get("MONGO_USER", None)
 MONGO_PASSWORD = environ.get("MONGO_PASSWORD", None)
+## Per-collection overrides of `database.retention.MongoRetention.POLICIES`, e.g. {"requestLogs": {"days": 7}}.
+MONGO_RETENTION = {}
 
 USE_REDIS = eval(environ.get("USE_REDIS", "True"))
 if USE_REDIS:
@@ -85,7 +87,8 @@ if USE_REDIS:
     REDIS_PASSWORD = None
 
     REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}"
-    REDIS_CONN = redis.Redis.from_url(REDIS_URL)
+    ## Connects on first use, one pool per process, see `core.redis_pool.RedisPool`.
+    REDIS_CONN = LazyRedisConnection()
 
     RQ_QUEUES = {
         q: {'HOST': REDIS_HOST,'PORT': REDIS_PORT,'DB': REDIS_DB,'PASSWORD': REDIS_PASSWORD,'DEFAULT_TIMEOUT': 480} for q in JobQ.ALL_QS
@@ -93,7 +96,18 @@ if USE_REDIS:
 
 CRON_ENABLED = eval(environ.get("CRON_ENABLED", "True"))
 if CRON_ENABLED:
-    CRON_CLASSES = JOB_HANDLER_APP_CRON + MIDDLEWARE_APP_CRON + USER_APP_CRON
+    CRON_CLASSES = CLASSIFIEDS_APP_CRON + JOB_HANDLER_APP_CRON + MIDDLEWARE_APP_CRON + USER_APP_CRON
+if USE_REDIS:
+    ## Atomic, heartbeat-extended locks: `runcrons` can run on every node.
+    DJANGO_CRON_LOCK_BACKEND = 'django_cron.backends.lock.redis_lock.RedisLock'
+    DJANGO_CRON_REDIS_LOCK_TTL = 60
+## Rows per batch and seconds per cron run for the chunked deletes of `utils.db_utils.ChunkedDeletion`.
+CHUNKED_DELETION_BATCH_SIZE = int(environ.get("CHUNKED_DELETION_BATCH_SIZE", 500))
+CHUNKED_DELETION_TIME_BUDGET = float(environ.get("CHUNKED_DELETION_TIME_BUDGET", 120))
+## Bytes of JSON kept per `EnqueuedJob` to summarize the arguments of the job.
+JOB_ARGUMENTS_SUMMARY_BYTES = int(environ.get("JOB_ARGUMENTS_SUMMARY_BYTES", 1024))
+## Where `DeleteOldJobRecords` writes the gzipped JSONL archive of the job records it deletes.
+JOB_ARCHIVE_DIR = environ.get("JOB_ARCHIVE_DIR", path.join(BASE_DIR.parent, 'archives/jobs/'))
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -113,7 +127,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'auth.authentication.CachedJWTAuthentication',
     )
 }
 
@@ -0,0 +1,126 @@
+from typing import Dict, List
+
+from pymongo import ASCENDING, IndexModel, TEXT
+from pymongo.errors import OperationFailure
+
+from database.collections import DatabaseCollections
+from database.methods import SynchronousMethods
+from database.retention import MongoRetention
+
+from database import logger
+
+
+class DatabaseIndexes:
+    """
+    Declarative registry of the indexes every collection in `DatabaseCollections` needs.
+
+    `ensure()` is idempotent: existing indexes with the same name and options are left alone, a changed
+    TTL is applied in place with `collMod`, and any other conflicting definition is reported (or rebuilt
+    with `rebuild=True`) rather than silently replaced.
+
+    Retention indexes are derived from `MongoRetention`: a TTL index for "ttl" mode collections (MongoDB
+    expires the documents for free), a plain one for "batch" mode collections so the purge can seek.
+    """
+
+    REGISTRY: Dict[str, List[IndexModel]] = {
+        DatabaseCollections.request_logs: [
+            IndexModel([("method", ASCENDING), ("path", ASCENDING)], name="method_path"),
+            ## Required by `RequestLogUtils.find_by_text`.
+            IndexModel(
+                [("path", TEXT), ("user.username", TEXT), ("user.email", TEXT)], name="request_logs_text"),
+        ],
+        DatabaseCollections.user_ips: [
+            IndexModel([("user", ASCENDING), ("ip", ASCENDING)], name="user_ip"),
+        ],
+        DatabaseCollections.user_mac_addresses: [
+            IndexModel([("user", ASCENDING), ("mac", ASCENDING)], name="user_mac"),
+        ],
+        DatabaseCollections.user_white_listed_ips: [
+            IndexModel([("user", ASCENDING), ("ip", ASCENDING)], name="user_ip"),
+        ],
+    }
+
+    @classmethod
+    def get_registry(cls) -> Dict[str, List[IndexModel]]:
+        registry = {collection: list(models) for collection, models in cls.REGISTRY.items()}
+        for collection, policy in MongoRetention.get_policies().items():
+            if policy["mode"] == MongoRetention.MODE_TTL:
+                model = IndexModel(
+                    [(policy["field"], ASCENDING)], name=f"{policy['field']}_ttl",
+                    expireAfterSeconds=policy["days"] * 24 * 60 * 60)
+            else:
+                model = IndexModel([(policy["field"], ASCENDING)], name=f"{policy['field']}_retention")
+            registry.setdefault(collection, []).append(model)
+
+        return registry
+
+    ## Options that do not change what an index is, only metadata MongoDB reports back.
+    IGNORED_OPTIONS = ("v", "ns", "background", "textIndexVersion", "language_override", "default_language", "weights")
+
+    @classmethod
+    def _options(cls, spec: dict = None) -> dict:
+        return {key: value for key, value in spec.items() if key not in cls.IGNORED_OPTIONS + ("key", "name")}
+
+    @classmethod
+    def ensure(cls, collection: str = None, rebuild: bool = False, dry_run: bool = False) -> Dict[str, str]:
+        """
+        Make sure the registered indexes of `collection` exist; returns `{index name: action taken}`.
+        """
+        db_collection = SynchronousMethods.db[collection]
+        existing = db_collection.index_information()
+        models = cls.get_registry().get(collection, [])
+        actions = {}
+
+        ## A TTL index left behind after switching a collection to "batch" retention would keep expiring documents.
+        wanted_names = {model.document["name"] for model in models}
+        for name, current in existing.items():
+            if "expireAfterSeconds" in current and name not in wanted_names:
+                actions[name] = "stale ttl dropped" if rebuild else "stale ttl"
+                if rebuild and not dry_run:
+                    db_collection.drop_index(name)
+                elif not rebuild:
+                    logger.warning(f"TTL index '{name}' on '{collection}' is not in the registry.")
+
+        for model in models:
+            wanted = dict(model.document)
+            name = wanted["name"]
+            current = existing.get(name)
+
+            if current is None:
+                action = "created"
+                if not dry_run:
+                    db_collection.create_indexes([model])
+            elif cls._options(current) == cls._options(wanted) and (
+                    "text" in dict(wanted["key"]).values() or list(current["key"]) == list(wanted["key"].items())):
+                action = "unchanged"
+            elif set(cls._options(current)) | set(cls._options(wanted)) == {"expireAfterSeconds"} \
+                    and list(current["key"]) == list(wanted["key"].items()):
+                action = "ttl updated"
+                if not dry_run:
+                    SynchronousMethods.db.command(
+                        "collMod", collection,
+                        index={"name": name, "expireAfterSeconds": wanted["expireAfterSeconds"]})
+            elif rebuild:
+                action = "rebuilt"
+                if not dry_run:
+                    db_collection.drop_index(name)
+                    db_collection.create_indexes([model])
+            else:
+                action = "conflict"
+                logger.warning(f"Index '{name}' on '{collection}' differs from the registry: {current} != {wanted}")
+
+            actions[name] = action
+
+        return actions
+
+    @classmethod
+    def ensure_all(cls, rebuild: bool = False, dry_run: bool = False) -> Dict[str, Dict[str, str]]:
+        results = {}
+        for collection in cls.get_registry():
+            try:
+                results[collection] = cls.ensure(collection=collection, rebuild=rebuild, dry_run=dry_run)
+            except OperationFailure as ex:
+                logger.exception(f"Unable to ensure indexes on '{collection}': {ex}")
+                results[collection] = {"*": f"failed: {ex}"}
+
+        return results
@@ -1,4 +1,6 @@
 import pymongo
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from typing import Dict, List
 from uuid import uuid4
 
 from core.settings import MAX_ITEMS_PER_PAGE
@@ -8,6 +10,58 @@ from database.synchronous import s_db
 from database import logger
 
 
+def _with_ids(data: List[dict] = None) -> List[dict]:
+    for document in data or []:
+        if not document.get("_id"):
+            document["_id"] = f"{uuid4()}".replace("-", "").upper()
+    return data or []
+
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _inserted_ids(data: List[dict] = None, error: BulkWriteError = None, ordered: bool = False) -> List[str]:
+    """
+    Work out which documents of an `insert_many` made it in, all of them if there was no `error`.
+
+    Only duplicate key errors are skipped; any other write error is logged and `error` is re-raised.
+    """
+    if not error:
+        return [document["_id"] for document in data]
+
+    write_errors = error.details.get("writeErrors", [])
+    others = [write_error for write_error in write_errors if write_error.get("code") != DUPLICATE_KEY_ERROR]
+    if others or error.details.get("writeConcernErrors"):
+        logger.error(f"{len(others)} of {len(data)} document(s) not inserted: {others[:1]}")
+        raise error
+
+    failed = {write_error["index"] for write_error in write_errors}
+    logger.warning(f"{len(failed)} of {len(data)} document(s) already exist: {write_errors[:1]}")
+    if ordered:
+        ## An ordered insert stops at the first failure.
+        return [document["_id"] for document in data[:min(failed, default=len(data))]]
+    return [document["_id"] for index, document in enumerate(data) if index not in failed]
+
+
+def _exists_in_any_pipeline(filters: Dict[str, dict] = None) -> tuple:
+    filters = {collection: filter_dict for collection, filter_dict in (filters or {}).items() if filter_dict}
+    if not filters:
+        return None
+
+    (collection, filter_dict), *others = filters.items()
+    pipeline = [{"$match": filter_dict}, {"$limit": 1}, {"$project": {"_id": 1}}]
+    for other_collection, other_filter in others:
+        pipeline.append({
+            "$unionWith": {
+                "coll": other_collection,
+                "pipeline": [{"$match": other_filter}, {"$limit": 1}, {"$project": {"_id": 1}}]
+            }
+        })
+    pipeline.append({"$limit": 1})
+
+    return collection, pipeline
+
+
 class AsynchronousMethods:
     """
     Methods to query the declared MongoDB cluster asynchronously.
@@ -15,49 +69,135 @@ class AsynchronousMethods:
     db = as_db
 
     @classmethod
-    async def insert_one(cls, data: dict = None, collection: str = None) -> dict:
+    async def insert_one(cls, data: dict = None, collection: str = None, read_back: bool = False) -> dict:
+        """
+        Insert `data` and return it, `{}` if a document with the same `_id` already exists.
+
+        Duplicates are caught through the `_id` unique index instead of being looked up first; pass
+        `read_back=True` to return the document as stored by MongoDB (one more round-trip).
+        """
         if not data.get("_id"):
             data["_id"] = f"{uuid4()}".replace("-", "").upper()
 
-        if await cls.find(filter_dict={"_id": data.get("_id")}, collection=collection):
+        try:
+            inserted = await cls.db[collection].insert_one(data)
+        except DuplicateKeyError:
             logger.warning(f"_id already exits.")
             return {}
 
-        inserted = await cls.db[collection].insert_one(data)
-        new = await cls.db[collection].find_one(
+        if not read_back:
+            return data
+
+        return await cls.db[collection].find_one(
             {
                 "_id": inserted.inserted_id
             }
         )
 
-        return new
+    @classmethod
+    async def insert_many(cls, data: List[dict] = None, collection: str = None, ordered: bool = False) -> List[str]:
+        """
+        Insert `data` in bulk and return the `_id`s that were inserted; duplicates are skipped, not fatal.
+
+        Any other write error raises `BulkWriteError`.
+        """
+        data, error = _with_ids(data), None
+        if not data:
+            return []
+
+        try:
+            await cls.db[collection].insert_many(data, ordered=ordered)
+        except BulkWriteError as ex:
+            error = ex
+
+        return _inserted_ids(data=data, error=error, ordered=ordered)
 
     @classmethod
-    async def find(cls, filter_dict: dict = None, collection: str = None, page: int = 1) -> list:
-        if not filter_dict:
-            results = await cls.db[collection].find().skip((page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
-        else:
-            results = await cls.db[collection].find(filter_dict).skip((page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
+    async def bulk_write(cls, operations: list = None, collection: str = None, ordered: bool = False) -> bool:
+        """
+        Run a list of `pymongo` write operations (`InsertOne`, `UpdateOne`, `DeleteMany`...) in one round-trip.
+        """
+        if not operations:
+            return True
 
-        return list(results)
+        try:
+            _ = await cls.db[collection].bulk_write(operations, ordered=ordered)
+        except BulkWriteError as ex:
+            logger.warning(f"Bulk write to '{collection}' partially failed: {ex.details.get('writeErrors', [])[:1]}")
+            return False
+
+        return True
+
+    @classmethod
+    async def find_one(cls, _id: str = None, collection: str = None, projection: dict = None):
+        return await cls.db[collection].find_one({"_id": _id}, projection)
+
+    @classmethod
+    async def update_one(cls, _id: str = None, data: dict = None, collection: str = None) -> bool:
+        if "_id" in data.keys():
+            del data["_id"]
+
+        try:
+            _ = await cls.db[collection].update_one(
+                {"_id": _id},
+                {"$set": data}
+            )
+        except Exception as ex:
+            logger.warning(f"{ex}")
+            return False
+
+        return True
 
     @classmethod
-    async def find_distinct(cls, filter_dict: dict = None, collection: str = None, page: int = 1) -> list:
-        results = await cls.db[collection].distinct(filter=filter_dict).skip(
-                (page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
-        return results
+    async def find(cls, filter_dict: dict = None, collection: str = None, page: int = 1, projection: dict = None) -> list:
+        cursor = cls.db[collection].find(filter_dict or {}, projection).skip(
+            (page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
+
+        return await cursor.to_list(length=MAX_ITEMS_PER_PAGE)
+
+    @classmethod
+    async def find_and_order(cls, filter_dict: dict = None, collection: str = None, sort_field: str = None, page: int = 1, projection: dict = None) -> list:
+        """
+        Find via a query and order by a given field name.
+        Useful when implementing a search.
+        """
+        cursor = cls.db[collection].find(filter_dict or {}, projection).sort(sort_field, pymongo.DESCENDING).skip(
+            (page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
+
+        return await cursor.to_list(length=MAX_ITEMS_PER_PAGE)
+
+    @classmethod
+    async def find_distinct(cls, key: str = None, filter_dict: dict = None, collection: str = None, page: int = 1) -> list:
+        ## (prithoo): `distinct` returns a plain list, so it is paginated in memory.
+        results = await cls.db[collection].distinct(key, filter=filter_dict)
+        return results[(page-1)*MAX_ITEMS_PER_PAGE:page*MAX_ITEMS_PER_PAGE]
+
+    @classmethod
+    async def count_documents(cls, filter_dict: dict = None, collection: str = None) -> int:
+        return await cls.db[collection].count_documents(filter=filter_dict or {})
 
     @classmethod
     async def exists(cls, filter_dict: dict = None, collection: str = None) -> bool:
         if not filter_dict:
             return False
         
-        results = await cls.db[collection].count_documents(filter=filter_dict)
-        if results > 0:
+        if await cls.db[collection].find_one(filter_dict, projection={"_id": 1}) is not None:
             logger.info("Record(s) exist(s).")
             return True
         
         return False
+
+    @classmethod
+    async def exists_in_any(cls, filters: Dict[str, dict] = None) -> bool:
+        """
+        Async counterpart of `SynchronousMethods.exists_in_any`.
+        """
+        pipeline = _exists_in_any_pipeline(filters=filters)
+        if not pipeline:
+            return False
+
+        collection, pipeline = pipeline
+        return bool(await cls.db[collection].aggregate(pipeline).to_list(length=1))
     
     @classmethod
     async def delete(cls, filter_dict:dict=None, collection:str=None) -> bool:
@@ -77,22 +217,49 @@ class SynchronousMethods:
     db = s_db
 
     @classmethod
-    def insert_one(cls, data: dict = None, collection: str = None) -> dict:
+    def insert_one(cls, data: dict = None, collection: str = None, read_back: bool = False) -> dict:
+        """
+        Insert `data` and return it, `{}` if a document with the same `_id` already exists.
+
+        Duplicates are caught through the `_id` unique index instead of being looked up first; pass
+        `read_back=True` to return the document as stored by MongoDB (one more round-trip).
+        """
         if not data.get("_id"):
             data["_id"] = f"{uuid4()}".replace("-", "").upper()
 
-        if cls.find(filter_dict={"_id": data.get("_id")}, collection=collection):
+        try:
+            inserted = cls.db[collection].insert_one(data)
+        except DuplicateKeyError:
             logger.warning(f"_id already exits.")
             return {}
 
-        inserted = cls.db[collection].insert_one(data)
-        new = cls.db[collection].find_one(
+        if not read_back:
+            return data
+
+        return cls.db[collection].find_one(
             {
                 "_id": inserted.inserted_id
             }
         )
 
-        return new
+    @classmethod
+    def insert_many(cls, data: List[dict] = None, collection: str = None, ordered: bool = False) -> List[str]:
+        """
+        Insert `data` in bulk and return the `_id`s that were inserted; duplicates are skipped, not fatal.
+
+        With `ordered=False` (the default) MongoDB keeps inserting past a failed document. Any other write
+        error raises `BulkWriteError`.
+        """
+        data, error = _with_ids(data), None
+        if not data:
+            return []
+
+        try:
+            cls.db[collection].insert_many(data, ordered=ordered)
+        except BulkWriteError as ex:
+            error = ex
+
+        return _inserted_ids(data=data, error=error, ordered=ordered)
     
     @classmethod
     def find_one(cls, _id:str=None, collection:str=None):
@@ -118,31 +285,27 @@ class SynchronousMethods:
         return True
 
     @classmethod
-    def find(cls, filter_dict: dict = None, collection: str = None, page: int = 1) -> list:
-        if not filter_dict:
-            results = cls.db[collection].find().skip(
-                (page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
-        else:
-            results = cls.db[collection].find(filter_dict).skip(
-                (page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
+    def find(cls, filter_dict: dict = None, collection: str = None, page: int = 1, projection: dict = None) -> list:
+        results = cls.db[collection].find(filter_dict or {}, projection).skip(
+            (page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
 
         return list(results)
     
     @classmethod
-    def find_and_order(cls, filter_dict:dict=None, collection:str=None, sort_field:str=None, page:int=1) -> list:
+    def find_and_order(cls, filter_dict:dict=None, collection:str=None, sort_field:str=None, page:int=1, projection:dict=None) -> list:
         """
         Find via a query and order by a given field name.
         Useful when implementing a search.
         """
-        results = cls.db[collection].find(filter_dict).sort(sort_field, pymongo.DESCENDING).skip((page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
+        results = cls.db[collection].find(filter_dict, projection).sort(sort_field, pymongo.DESCENDING).skip((page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
         return list(results)
 
 
     @classmethod
-    def find_distinct(cls, filter_dict: dict = None, collection: str = None, page: int = 1) -> list:
-        results = cls.db[collection].distinct(filter=filter_dict).skip(
-                (page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
-        return results
+    def find_distinct(cls, key: str = None, filter_dict: dict = None, collection: str = None, page: int = 1) -> list:
+        ## (prithoo): `distinct` returns a plain list, so it is paginated in memory.
+        results = cls.db[collection].distinct(key, filter=filter_dict)
+        return results[(page-1)*MAX_ITEMS_PER_PAGE:page*MAX_ITEMS_PER_PAGE]
     
     @classmethod
     def count_documents(cls, filter_dict: dict = {}, collection: str = None)->int:
@@ -153,11 +316,27 @@ class SynchronousMethods:
         if not filter_dict:
             return False
         
-        if cls.db[collection].count_documents(filter=filter_dict) > 0:
+        ## (prithoo): `find_one` stops at the first match, `count_documents` would scan every match.
+        if cls.db[collection].find_one(filter_dict, projection={"_id": 1}) is not None:
             logger.info("Record(s) exist(s).")
             return True
         
         return False
+
+    @classmethod
+    def exists_in_any(cls, filters: Dict[str, dict] = None) -> bool:
+        """
+        Check whether any of `{collection: filter_dict}` matches a document, in a single round-trip.
+
+        The first collection is queried directly and the others are chained with `$unionWith`;
+        every branch is capped at one document.
+        """
+        pipeline = _exists_in_any_pipeline(filters=filters)
+        if not pipeline:
+            return False
+
+        collection, pipeline = pipeline
+        return bool(list(cls.db[collection].aggregate(pipeline)))
     
     @classmethod
     def delete(cls, filter_dict:dict=None, collection:str=None) -> bool:
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+from time import monotonic
+from typing import Dict
+
+from django.conf import settings
+
+from database.collections import DatabaseCollections
+from database.methods import SynchronousMethods
+
+from database import logger
+
+
+class MongoRetention:
+    """
+    Per-collection retention for the MongoDB collections.
+
+    Each policy names the timestamp `field`, how many `days` documents are kept, and a `mode`:
+        "batch": `purge()` deletes expired documents with `delete_many` in bounded batches (run by cron).
+        "ttl": MongoDB expires them through a TTL index, see `database.indexes.DatabaseIndexes`.
+    Fields stored as strings need a `format` (the `strftime` they were written with) and only
+    support "batch" mode. Policies can be overridden per collection with `settings.MONGO_RETENTION`.
+    """
+
+    MODE_BATCH: str = "batch"
+    MODE_TTL: str = "ttl"
+
+    BATCH_SIZE: int = 1000
+    MAX_BATCHES: int = 100
+
+    POLICIES: Dict[str, dict] = {
+        DatabaseCollections.request_logs: {"field": "timestampUtc", "days": 30, "mode": MODE_BATCH},
+        DatabaseCollections.user_ips: {"field": "timestampUtc", "days": 90, "mode": MODE_BATCH},
+        DatabaseCollections.user_mac_addresses: {"field": "timestampUtc", "days": 90, "mode": MODE_BATCH},
+        DatabaseCollections.deleted_users: {
+            "field": "timestamp", "days": 365, "mode": MODE_BATCH, "format": "%Y-%m-%dT%H:%M:%S.%f%z"},
+    }
+
+    @classmethod
+    def get_policies(cls) -> Dict[str, dict]:
+        overrides = getattr(settings, "MONGO_RETENTION", None) or {}
+        policies = {
+            collection: {**policy, **overrides.get(collection, {})} for collection, policy in cls.POLICIES.items()
+        }
+
+        for collection, policy in policies.items():
+            if policy["mode"] == cls.MODE_TTL and policy.get("format"):
+                logger.warning(f"'{collection}' stores '{policy['field']}' as a string, TTL mode is not possible.")
+                policy["mode"] = cls.MODE_BATCH
+
+        return policies
+
+    @classmethod
+    def cutoff(cls, policy: dict = None):
+        ## (prithoo): Documents are written with naive `datetime.utcnow()`, compare like with like.
+        cutoff = datetime.now(timezone.utc) - timedelta(days=policy["days"])
+        if policy.get("format"):
+            return cutoff.strftime(policy["format"])
+        return cutoff.replace(tzinfo=None)
+
+    @classmethod
+    def purge(cls, collection: str = None, batch_size: int = None, max_batches: int = None) -> dict:
+        """
+        Delete the expired documents of a "batch" mode collection, `batch_size` documents per `delete_many`.
+
+        Stops after `max_batches` batches so that a large backlog is worked off over several runs
+        instead of holding the cron lock for too long. Returns the counts and timings of the run.
+        """
+        policy = cls.get_policies()[collection]
+        report = {"collection": collection, "mode": policy["mode"], "deleted": 0, "batches": 0, "seconds": 0.0}
+        if policy["mode"] != cls.MODE_BATCH:
+            return report
+
+        batch_size = batch_size or cls.BATCH_SIZE
+        max_batches = max_batches or cls.MAX_BATCHES
+        db_collection = SynchronousMethods.db[collection]
+        filter_dict = {policy["field"]: {"$lt": cls.cutoff(policy=policy)}}
+
+        started = monotonic()
+        while report["batches"] < max_batches:
+            ids = [
+                document["_id"] for document in db_collection.find(filter_dict, projection={"_id": 1}).limit(batch_size)
+            ]
+            if not ids:
+                break
+
+            report["deleted"] += db_collection.delete_many({"_id": {"$in": ids}}).deleted_count
+            report["batches"] += 1
+            if len(ids) < batch_size:
+                break
+
+        report["seconds"] = round(monotonic() - started, 3)
+        logger.info(f"Retention run: {report}")
+        return report
+
+    @classmethod
+    def purge_all(cls, batch_size: int = None, max_batches: int = None) -> Dict[str, dict]:
+        reports = {}
+        for collection, policy in cls.get_policies().items():
+            if policy["mode"] != cls.MODE_BATCH:
+                continue
+            try:
+                reports[collection] = cls.purge(collection=collection, batch_size=batch_size, max_batches=max_batches)
+            except Exception as ex:
+                logger.exception(f"Retention run for '{collection}' failed: {ex}")
+
+        return reports
@@ -0,0 +1,123 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+from django_cron.backends.lock.base import DjangoCronJobLock
+
+logger = logging.getLogger('django_cron')
+
+
+class RedisLock(DjangoCronJobLock):
+    """
+    Lock backend built on a single Redis key per job.
+
+    The lock is taken with an atomic ``SET key token NX PX ttl``, so two nodes can never both
+    acquire it, and released with a Lua script that only deletes the key if it still holds our
+    token. The TTL is short and a heartbeat thread keeps extending it while the job runs, so the
+    lock of a crashed process is reclaimed after at most ``DJANGO_CRON_REDIS_LOCK_TTL`` seconds.
+    """
+
+    DEFAULT_LOCK_TTL = 60  # seconds
+    KEY_PREFIX = 'django_cron:lock:'
+
+    RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+    EXTEND_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('pexpire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+
+    def __init__(self, cron_class, *args, **kwargs):
+        super().__init__(cron_class, *args, **kwargs)
+
+        self.connection = self.get_connection()
+        self.lock_name = self.get_lock_name()
+        self.ttl_ms = int(
+            getattr(cron_class, 'DJANGO_CRON_REDIS_LOCK_TTL',
+                    getattr(settings, 'DJANGO_CRON_REDIS_LOCK_TTL', self.DEFAULT_LOCK_TTL)) * 1000
+        )
+        self.token = None
+        self._release = self.connection.register_script(self.RELEASE_SCRIPT)
+        self._extend = self.connection.register_script(self.EXTEND_SCRIPT)
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat = None
+
+    def get_connection(self):
+        url = getattr(settings, 'DJANGO_CRON_REDIS_URL', None)
+        if url:
+            return redis.Redis.from_url(url)
+        return settings.REDIS_CONN
+
+    def get_lock_name(self):
+        return self.KEY_PREFIX + self.job_name
+
+    def lock(self):
+        """
+        Atomically take the lock; False if another process holds it.
+        """
+        token = '%s|%s|%s|%s' % (uuid.uuid4().hex, socket.gethostname(), os.getpid(), timezone.now().isoformat())
+        if not self.connection.set(self.lock_name, token, nx=True, px=self.ttl_ms):
+            return False
+
+        self.token = token
+        self._stop_heartbeat.clear()
+        self._heartbeat = threading.Thread(
+            target=self.heartbeat, name='django-cron-lock-%s' % self.job_code, daemon=True
+        )
+        self._heartbeat.start()
+        return True
+
+    def heartbeat(self):
+        """
+        Extend the TTL every third of it while the job runs; stops if the lock was lost.
+        """
+        interval = self.ttl_ms / 3000.0
+        while not self._stop_heartbeat.wait(interval):
+            try:
+                extended = self._extend(keys=[self.lock_name], args=[self.token, self.ttl_ms])
+            except redis.RedisError as ex:
+                logger.warning('%s: could not extend lock: %s' % (self.job_name, ex))
+                continue
+            if not extended:
+                logger.error('%s: lock was lost while the job is still running.' % self.job_name)
+                return
+
+    def release(self):
+        self._stop_heartbeat.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+
+        if self.token is None:
+            return
+        try:
+            self._release(keys=[self.lock_name], args=[self.token])
+        except redis.RedisError as ex:
+            # The key expires on its own once the heartbeat has stopped.
+            logger.warning('%s: could not release lock: %s' % (self.job_name, ex))
+        self.token = None
+
+    def lock_failed_message(self):
+        holder = self.connection.get(self.lock_name)
+        if not holder:
+            return "%s: lock has been found. Will try later." % self.job_name
+
+        _, host, pid, started = holder.decode('utf-8').split('|', 3)
+        return [
+            "%s: lock has been found. Other cron started at %s on %s (pid %s)"
+            % (self.job_name, started, host, pid),
+            "Current lock TTL for job %s is %s seconds (redis key name is '%s')."
+            % (self.job_name, self.ttl_ms / 1000.0, self.lock_name),
+        ]
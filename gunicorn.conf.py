@@ -6,4 +6,16 @@ read_dotenv()
 bind: str = "0.0.0.0:8000"
 workers: int = int(multiprocessing.cpu_count())
 accesslog: str = "-"  # Use stdout for access logs
-errorlog: str = "-"  # Use stdout for error logs
\ No newline at end of file
+errorlog: str = "-"  # Use stdout for error logs
+
+def post_fork(server, worker):
+    ## Never reuse Redis sockets inherited from the master.
+    from core.redis_pool import RedisPool
+    RedisPool.reset()
+
+def worker_exit(server, worker):
+    ## Flush request logs and token usages still queued in this worker before it goes away.
+    from middleware_app.utils import RequestLogShipper
+    from user_app.utils import UserTokenUsageRecorder
+    RequestLogShipper.stop()
+    UserTokenUsageRecorder.stop()
@@ -1,5 +1,8 @@
 from django.contrib import admin
 
+from rq.job import Job
+
+from core.redis_pool import RedisPool
 from job_handler_app.models import EnqueuedJob
 
 @admin.register(EnqueuedJob)
@@ -13,4 +16,15 @@ class EnqueuedJobAdmin(admin.ModelAdmin):
         "origin",
     )
     ordering = ("-created",)
-    list_filter = ("_status", "origin")
\ No newline at end of file
+    list_filter = ("_status", "origin")
+    readonly_fields = ("payload",)
+
+    @admin.display(description="Payload")
+    def payload(self, obj: EnqueuedJob) -> str:
+        """
+        The full call of the job, unpickled from Redis only when a single job is opened.
+        """
+        try:
+            return Job.fetch(obj.job_id, connection=RedisPool.get_connection()).get_call_string()
+        except Exception as ex:
+            return f"Not available: {ex}"
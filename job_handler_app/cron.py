@@ -1,3 +1,5 @@
+from typing import Dict, List
+
 from django_cron import CronJobBase, Schedule
 
 from django.db.models import Q
@@ -5,15 +7,19 @@ from django.utils import timezone
 
 from job_handler_app.models import EnqueuedJob
 from job_handler_app.model_choices import EnquedJobChoice
-from job_handler_app.utils import get_job
+from job_handler_app.utils import JobRecordArchive, JobStatusEvents, fetch_job_statuses
+from utils.db_utils import ChunkedDeletion
 
-from job_handler_app import logger
+from job_handler_app import logger, redis_logger
 
 class MonitorEnqueuedJob(CronJobBase):
     """
-    Monitor enqueued jobs and update their status.
+    Reconcile the status of enqueued jobs with RQ.
+
+    Statuses are pushed as they change by `JobStatusEvents`; this sweep only catches what was missed
+    (a job finishing before its row was written, a worker killed mid-job, Redis hiccups).
     """
-    RUN_EVERY_MINS = 1 # every 1 minute
+    RUN_EVERY_MINS = 15 # every 15 minutes
 
     schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
     code = 'monitor_enqued_jobs'    # a unique code
@@ -21,27 +27,44 @@ class MonitorEnqueuedJob(CronJobBase):
     def do(self):
         """
         Check for enqueued jobs that are not finished and update their status.
+
+        Statuses are read with one pipelined Redis round-trip per queue and written back with one `bulk_update`.
         """
+        try:
+            JobStatusEvents.flush()
+        except Exception as ex:
+            redis_logger.exception(f"Failed to write job status events: {ex}")
+
         jobs = EnqueuedJob.objects.filter(
-            ~Q(
-                Q(_status=EnquedJobChoice.finished)
-                | Q(_status=EnquedJobChoice.failed)
-                | Q(_status=EnquedJobChoice.completed)
-            )
-        )
+            ~Q(_status__in=EnquedJobChoice.TERMINAL_STATUSES)
+        ).only("id", "job_id", "origin", "_status")
 
+        by_queue: Dict[str, List[EnqueuedJob]] = {}
         for job in jobs:
-            current_details = get_job(job_id=job.job_id, job_q=job.origin)
-            if not current_details:
+            by_queue.setdefault(job.origin, []).append(job)
+
+        NOW = timezone.now()
+        changed: List[EnqueuedJob] = []
+        for origin, queued_jobs in by_queue.items():
+            try:
+                statuses = fetch_job_statuses(job_ids=[job.job_id for job in queued_jobs])
+            except Exception as ex:
+                redis_logger.exception(f"Failed to fetch job statuses from {origin} queue: {ex}")
                 continue
-            
-            if job._status != current_details._status:
-                job._status = current_details._status
-                job.save()
 
-                if job._status == EnquedJobChoice.failed:
+            for job in queued_jobs:
+                status = EnquedJobChoice.RQ_STATUS_MAP.get(statuses.get(job.job_id), job._status)
+                if job._status == status:
+                    continue
+
+                job._status = status
+                job.updated = NOW
+                changed.append(job)
+                if status == EnquedJobChoice.failed:
                     logger.warning(f"Job {job.job_id} failed")
 
+        EnqueuedJob.objects.bulk_update(changed, fields=["_status", "updated"], batch_size=500)
+        return f"{len(changed)} of {sum(len(queued_jobs) for queued_jobs in by_queue.values())} job(s) changed status."
 
 class DeleteOldJobRecords(CronJobBase):
     """
@@ -53,6 +76,11 @@ class DeleteOldJobRecords(CronJobBase):
 
     def do(self):
         six_months_ago = timezone.now() - timezone.timedelta(days=180)
-        jobs = EnqueuedJob.objects.filter(created__lte=six_months_ago)
-        for job in jobs:
-            job.delete()
\ No newline at end of file
+        archive = JobRecordArchive()
+        report = ChunkedDeletion.run(
+            queryset=EnqueuedJob.objects.filter(created__lte=six_months_ago),
+            archive=archive,
+            label=self.code,
+            order_by="created"
+        )
+        return f"{ChunkedDeletion.to_text(report)}, archived to {archive.path}"
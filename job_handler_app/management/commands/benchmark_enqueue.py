@@ -0,0 +1,54 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from rq.job import Job
+
+from core.rq_constants import JobQ
+from job_handler_app.models import EnqueuedJob
+from job_handler_app.utils import QueueRegistry, enqueue_job, enqueue_many, noop
+
+
+class Command(BaseCommand):
+    help = "Compare `count` single `enqueue_job` calls against one `enqueue_many` call of the same size."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count', type=int, default=10_000, help='Jobs to enqueue in each run (default: 10000)'
+        )
+        parser.add_argument(
+            '--queue', default=JobQ.DEFAULT_Q, choices=JobQ.ALL_QS, help='Queue to enqueue to'
+        )
+        parser.add_argument(
+            '--keep', action='store_true', help='Keep the benchmark jobs in Redis and the DB'
+        )
+
+    def handle(self, *args, **options):
+        count, queue = options['count'], options['queue']
+        if count < 1:
+            raise CommandError("--count must be at least 1.")
+
+        started = perf_counter()
+        single = [enqueue_job(noop, queue, True, index) for index in range(count)]
+        single_seconds = perf_counter() - started
+
+        started = perf_counter()
+        batched = enqueue_many(calls=[{"func": noop, "args": (index,)} for index in range(count)], job_q=queue)
+        batched_seconds = perf_counter() - started
+
+        job_ids = [job.id for job in single + (batched or []) if job]
+        self.stdout.write(f"enqueue_job  x{count}: {single_seconds:.3f}s ({single_seconds / count * 1e6:.0f} us/job)")
+        self.stdout.write(f"enqueue_many x{count}: {batched_seconds:.3f}s ({batched_seconds / count * 1e6:.0f} us/job)")
+        self.stdout.write(self.style.SUCCESS(f"Speed-up: {single_seconds / max(batched_seconds, 1e-9):.1f}x"))
+
+        if options['keep']:
+            return
+        queue_key = QueueRegistry.get(name=queue).key
+        pipe = settings.REDIS_CONN.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.delete(Job.key_for(job_id))
+            pipe.lrem(queue_key, 0, job_id)
+        pipe.execute()
+        deleted, _ = EnqueuedJob.objects.filter(job_id__in=job_ids).delete()
+        self.stdout.write(f"Removed {len(job_ids)} benchmark job(s) from Redis and {deleted} row(s) from the DB.")
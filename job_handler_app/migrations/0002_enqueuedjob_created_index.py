@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('job_handler_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enqueuedjob',
+            index=models.Index(fields=['created'], name='job_handler_created_0b0d62_idx'),
+        ),
+    ]
@@ -14,4 +14,22 @@ class EnquedJobChoice:
         (completed, completed),
         (started, started),
         (finished, finished),
-    )
\ No newline at end of file
+    )
+
+    ## Statuses a job never leaves; the monitor stops polling those.
+    TERMINAL_STATUSES = (failed, completed, finished)
+
+    ## RQ job statuses mapped onto ours. A job missing from Redis has outlived its result TTL and is
+    ## recorded as `completed` (done, outcome no longer known).
+    RQ_STATUS_MAP = {
+        'created': queued,
+        'queued': queued,
+        'deferred': queued,
+        'scheduled': queued,
+        'started': started,
+        'finished': finished,
+        'failed': failed,
+        'stopped': failed,
+        'canceled': failed,
+        None: completed,
+    }
@@ -28,4 +28,5 @@ class EnqueuedJob(TemplateModel):
         ordering = ('-created',)
         indexes = (
             models.Index(fields=['job_id', 'origin']),
+            models.Index(fields=['created']),
         )
\ No newline at end of file
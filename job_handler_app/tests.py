@@ -1,3 +1,277 @@
-from django.test import TestCase
+import gzip
+from json import dumps, loads
+from tempfile import TemporaryDirectory
+from threading import Event
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from core.rq_constants import JobQ
+from django_cron.backends.lock.redis_lock import RedisLock
+from job_handler_app.cron import MonitorEnqueuedJob
+from job_handler_app.model_choices import EnquedJobChoice
+from job_handler_app.models import EnqueuedJob
+from job_handler_app.utils import (
+    JobRecordArchive, JobStatusEvents, QueueRegistry, enqueue_many, noop, summarize_arguments
+)
+from utils.db_utils import ChunkedDeletion
+
+
+class FakeRedisList:
+    """
+    Just enough of a Redis connection for one list.
+    """
+
+    def __init__(self, *items):
+        self.items = [f"{item}".encode("utf-8") for item in items]
+
+    def lpop(self, key: str = None, count: int = 1):
+        popped, self.items = self.items[:count], self.items[count:]
+        return popped or None
+
+    def rpush(self, key: str = None, *values):
+        self.items += [f"{value}".encode("utf-8") for value in values]
+
+
+class JobStatusEventsTestCase(SimpleTestCase):
+
+    def flush(self, connection: FakeRedisList = None, registered: tuple = ()):
+        updates = {}
+
+        def filter_(job_id__in=None, **kwargs):
+            matched = [job_id for job_id in job_id__in if job_id in registered]
+            jobs = MagicMock()
+            jobs.filter.return_value = jobs
+            jobs.values_list.return_value = matched
+            jobs.update.side_effect = lambda _status=None, **kwargs: updates.update(
+                dict.fromkeys(matched, _status)) or len(matched)
+            return jobs
+
+        with patch.object(EnqueuedJob.objects, "filter", side_effect=filter_):
+            updated = JobStatusEvents.flush(connection=connection)
+        return updated, updates
+
+    def test_event_for_unregistered_job_is_kept(self):
+        connection = FakeRedisList("a|started", "b|started")
+
+        updated, updates = self.flush(connection=connection, registered=("a",))
+
+        self.assertEqual(updated, 1)
+        self.assertEqual(updates, {"a": EnquedJobChoice.started})
+        self.assertEqual(connection.items, [b"b|started|1"])
+
+        updated, updates = self.flush(connection=connection, registered=("a", "b"))
+        self.assertEqual(updates, {"b": EnquedJobChoice.started})
+        self.assertEqual(connection.items, [])
+
+    def test_event_is_dropped_after_max_attempts(self):
+        connection = FakeRedisList(f"b|started|{JobStatusEvents.MAX_ATTEMPTS - 1}")
+
+        self.assertEqual(self.flush(connection=connection), (0, {}))
+        self.assertEqual(connection.items, [])
+
+    def test_retried_start_does_not_undo_final_status(self):
+        connection = FakeRedisList("b|finished", "b|started|1")
+
+        _, updates = self.flush(connection=connection, registered=("b",))
+
+        self.assertEqual(updates, {"b": EnquedJobChoice.finished})
+
+
+class JobRecordArchiveTestCase(SimpleTestCase):
+
+    def archive(self, archive: JobRecordArchive = None, ids: list = None) -> int:
+        with patch.object(EnqueuedJob.objects, "filter") as filter_:
+            filter_.return_value.values.return_value = [{"id": pk, "job_id": f"job-{pk}"} for pk in ids]
+            return archive(ids)
+
+    def read(self, archive: JobRecordArchive = None) -> list:
+        with gzip.open(archive.path, "rt", encoding="utf-8") as lines:
+            return [loads(line)["id"] for line in lines]
+
+    def test_undo_drops_only_the_last_batch(self):
+        with TemporaryDirectory() as directory:
+            archive = JobRecordArchive(directory=directory)
+            self.archive(archive=archive, ids=[1, 2])
+            self.archive(archive=archive, ids=[3, 4])
+
+            archive.undo()
+
+            self.assertEqual(archive.archived, 2)
+            self.assertEqual(self.read(archive=archive), [1, 2])
+
+    def test_failed_delete_is_not_archived_twice(self):
+        queryset = MagicMock(model=EnqueuedJob)
+        queryset.order_by.return_value.values_list.return_value.__getitem__.side_effect = [[1, 2], [1, 2], []]
+
+        with TemporaryDirectory() as directory:
+            archive = JobRecordArchive(directory=directory)
+            with patch("utils.db_utils.transaction.atomic"), \
+                    patch.object(EnqueuedJob.objects, "filter") as filter_:
+                filter_.return_value.values.return_value = [{"id": 1}, {"id": 2}]
+                filter_.return_value.delete.side_effect = Exception("lock timeout")
+                report = ChunkedDeletion.run(queryset=queryset, batch_size=2, archive=archive)
+                self.assertFalse(report["finished"])
+
+                filter_.return_value.delete.side_effect = lambda: (2, {EnqueuedJob._meta.label: 2})
+                report = ChunkedDeletion.run(queryset=queryset, batch_size=2, archive=archive)
+                self.assertTrue(report["finished"])
+
+            self.assertEqual(self.read(archive=archive), [1, 2])
+
+
+class MonitorEnqueuedJobTestCase(SimpleTestCase):
+
+    def test_only_changed_statuses_are_written(self):
+        jobs = [
+            EnqueuedJob(job_id="a", origin=JobQ.DEFAULT_Q, _status=EnquedJobChoice.queued),
+            EnqueuedJob(job_id="b", origin=JobQ.DEFAULT_Q, _status=EnquedJobChoice.started),
+        ]
+        with patch.object(JobStatusEvents, "flush"), \
+                patch.object(EnqueuedJob.objects, "filter") as filter_, \
+                patch.object(EnqueuedJob.objects, "bulk_update") as bulk_update, \
+                patch("job_handler_app.cron.fetch_job_statuses", return_value={"a": "finished", "b": "started"}):
+            filter_.return_value.only.return_value = jobs
+            message = MonitorEnqueuedJob().do()
+
+        self.assertEqual(bulk_update.call_args.args[0], [jobs[0]])
+        self.assertEqual(jobs[0]._status, EnquedJobChoice.finished)
+        self.assertEqual(message, "1 of 2 job(s) changed status.")
+
+
+class QueueRegistryTestCase(SimpleTestCase):
+
+    def test_queues_are_reused_until_the_connection_changes(self):
+        first, second = MagicMock(), MagicMock()
+        with patch.object(QueueRegistry, "_queues", {}), patch.object(QueueRegistry, "_connection", None), \
+                patch("job_handler_app.utils.RedisPool.get_connection", return_value=first) as get_connection:
+            queue = QueueRegistry.get(name=JobQ.EMAIL_Q)
+            self.assertIs(QueueRegistry.get(name=JobQ.EMAIL_Q), queue)
+            self.assertIsNot(QueueRegistry.get(name=JobQ.EMAIL_Q, is_async=False), queue)
+            self.assertIs(queue.connection, first)
+
+            get_connection.return_value = second
+            self.assertIs(QueueRegistry.get(name=JobQ.EMAIL_Q).connection, second)
+
+
+class EnqueueManyTestCase(SimpleTestCase):
+
+    def test_enqueues_with_callbacks_and_registers(self):
+        jobs = [MagicMock(), MagicMock()]
+        with patch("job_handler_app.utils.QueueRegistry.get") as get, \
+                patch("job_handler_app.utils.register_jobs_in_db") as register_jobs_in_db:
+            get.return_value.enqueue_many.return_value = jobs
+            result = enqueue_many(calls=[{"func": noop, "args": (index,)} for index in range(2)], job_q=JobQ.DEFAULT_Q)
+
+        self.assertEqual(result, jobs)
+        register_jobs_in_db.assert_called_once_with(jobs=jobs)
+        prepared = get.return_value.enqueue_many.call_args.args[0]
+        self.assertEqual([data.args for data in prepared], [(0,), (1,)])
+        self.assertTrue(all(data.on_success for data in prepared))
+
+    def test_unknown_queue(self):
+        with patch("job_handler_app.utils.QueueRegistry.get") as get:
+            self.assertIsNone(enqueue_many(calls=[{"func": noop}], job_q="nope"))
+        get.assert_not_called()
+
+
+class SummarizeArgumentsTestCase(SimpleTestCase):
+
+    def summarize(self, *args, budget: int = 256, **kwargs) -> dict:
+        return summarize_arguments(job=SimpleNamespace(args=args, kwargs=kwargs), budget=budget)
+
+    def test_small_arguments_are_kept(self):
+        self.assertEqual(
+            self.summarize(1, "two", None, flag=True),
+            {"args": [1, "two", None], "kwargs": {"flag": True}, "truncated": False}
+        )
+
+    def test_values_are_never_repr_ed(self):
+        summary = self.summarize(b"secret", object(), "x" * 500, budget=512)
+
+        self.assertEqual(summary["args"][:2], ["<bytes>", "<object>"])
+        self.assertEqual(summary["args"][2], f"{'x' * 128}...")
+
+    def test_summary_fits_the_budget(self):
+        summary = self.summarize(*["y" * 20 for _ in range(50)], budget=256)
+
+        self.assertTrue(summary["truncated"])
+        self.assertLess(len(summary["args"]), 50)
+        self.assertLessEqual(len(dumps(summary)), 256)
+
+
+class FakeRedisLockConnection:
+    """
+    Just enough of Redis for `RedisLock`: `SET NX PX`, `GET` and its two Lua scripts.
+    """
+
+    def __init__(self):
+        self.store = {}
+        self.extended = Event()
+
+    def set(self, key: str = None, value: str = None, nx: bool = False, px: int = None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value.encode("utf-8")
+        return True
+
+    def get(self, key: str = None):
+        return self.store.get(key)
+
+    def register_script(self, script: str = None):
+        def run(keys: list = None, args: list = None):
+            if self.store.get(keys[0]) != args[0].encode("utf-8"):
+                return 0
+            if script == RedisLock.RELEASE_SCRIPT:
+                del self.store[keys[0]]
+            else:
+                self.extended.set()
+            return 1
+        return run
+
+
+class RedisLockTestCase(SimpleTestCase):
+
+    class Cron:
+        code = "redis_lock_test"
+        DJANGO_CRON_REDIS_LOCK_TTL = 0.03
+
+    def setUp(self):
+        self.connection = FakeRedisLockConnection()
+        patcher = patch.object(RedisLock, "get_connection", return_value=self.connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_lock(self) -> RedisLock:
+        lock = RedisLock(self.Cron, True)
+        self.addCleanup(lock.release)
+        return lock
+
+    def test_only_one_holder(self):
+        first, second = self.get_lock(), self.get_lock()
+
+        self.assertTrue(first.lock())
+        self.assertFalse(second.lock())
+        self.assertIn("lock has been found", second.lock_failed_message()[0])
+
+        first.release()
+        self.assertTrue(second.lock())
+
+    def test_heartbeat_extends_the_lock(self):
+        lock = self.get_lock()
+        self.assertEqual(lock.ttl_ms, 30)
+
+        self.assertTrue(lock.lock())
+        self.assertTrue(self.connection.extended.wait(timeout=1))
+
+    def test_release_only_by_the_owner(self):
+        first, second = self.get_lock(), self.get_lock()
+        self.assertTrue(first.lock())
+
+        ## The lock expired and someone else took it.
+        self.connection.store[first.lock_name] = b"other|host|1|now"
+        first.release()
+
+        self.assertEqual(self.connection.store[first.lock_name], b"other|host|1|now")
+        self.assertFalse(second.lock())
@@ -1,17 +1,49 @@
-import pickle
+import gzip
+from hashlib import sha256
+from json import dumps
+from os import makedirs, path
 import pytz
 import rq
-from rq.job import Job
-from typing import Callable
+from rq.job import Callback, Job
+from typing import Any, Callable, Dict, List
 
 from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
 
+from core.redis_pool import RedisPool
 from core.rq_constants import JobQ
+from job_handler_app.model_choices import EnquedJobChoice
 from job_handler_app.models import EnqueuedJob
 from job_handler_app.serializers import EnqueuedJobSerializer
 from job_handler_app import logger, redis_logger
 
 
+class QueueRegistry:
+    """
+    One `rq.Queue` per `JobQ` name (and sync/async mode), built on first use and reused by every call.
+
+    Queues are bound to the Redis client of `RedisPool`; when that client is replaced (after a fork
+    or a `reset`) the registry starts over.
+    """
+
+    _queues: Dict[tuple, rq.Queue] = {}
+    _connection = None
+
+    @classmethod
+    def get(cls, name: str = JobQ.DEFAULT_Q, is_async: bool = True) -> rq.Queue:
+        connection = RedisPool.get_connection()
+        if connection is not cls._connection:
+            cls._queues = {}
+            cls._connection = connection
+
+        queue = cls._queues.get((name, is_async))
+        if queue is None:
+            queue = rq.Queue(name=name, connection=connection, is_async=is_async)
+            cls._queues[(name, is_async)] = queue
+        return queue
+
+
 def enqueue_job(func: Callable, job_q: str = JobQ.DEFAULT_Q, is_async: bool = True, *args, **kwargs) -> Job:
     """
     Enqueue a job to Redis queue.
@@ -20,8 +52,7 @@ def enqueue_job(func: Callable, job_q: str = JobQ.DEFAULT_Q, is_async: bool = Tr
         logger.warning(f"job_q must be one of {JobQ.ALL_QS}")
         return None
     try:
-        job = rq.Queue(name=job_q, connection=settings.REDIS_CONN,
-                       is_async=is_async).enqueue(func, *args, **kwargs)
+        job = QueueRegistry.get(name=job_q, is_async=is_async).enqueue(func, *args, **JobStatusEvents.callbacks(), **kwargs)
         register_job_in_db(job=job)
     except Exception as ex:
         redis_logger.exception(f"Failed to enqueue job to {job_q} queue: {ex}")
@@ -29,6 +60,31 @@ def enqueue_job(func: Callable, job_q: str = JobQ.DEFAULT_Q, is_async: bool = Tr
     return job
 
 
+def enqueue_many(calls: List[Dict[str, Any]] = None, job_q: str = JobQ.DEFAULT_Q, is_async: bool = True) -> List[Job]:
+    """
+    Enqueue many jobs to Redis queue in one pipelined write and register them with one `bulk_create`.
+
+    Each entry of `calls` is `{"func": ..., "args": (...), "kwargs": {...}}`, plus any other option
+    accepted by `rq.Queue.prepare_data` (`job_id`, `description`, `timeout`...).
+    """
+    if job_q not in JobQ.ALL_QS:
+        logger.warning(f"job_q must be one of {JobQ.ALL_QS}")
+        return None
+    if not calls:
+        return []
+    try:
+        queue = QueueRegistry.get(name=job_q, is_async=is_async)
+        jobs = queue.enqueue_many([
+            rq.Queue.prepare_data(**JobStatusEvents.callbacks(), **call) for call in calls
+        ])
+    except Exception as ex:
+        redis_logger.exception(f"Failed to enqueue {len(calls)} job(s) to {job_q} queue: {ex}")
+        return None
+
+    register_jobs_in_db(jobs=jobs)
+    return jobs
+
+
 def get_job(job_id: str = None, job_q: str = None) -> Job:
     """
     Get details of a job.
@@ -40,8 +96,7 @@ def get_job(job_id: str = None, job_q: str = None) -> Job:
         logger.warning("job_id must be provided")
         return None
     try:
-        job = rq.Queue(
-            name=job_q, connection=settings.REDIS_CONN).fetch_job(job_id)
+        job = QueueRegistry.get(name=job_q).fetch_job(job_id)
     except Exception as ex:
         redis_logger.exception(f"Failed to fetch job {job_id} from {job_q} queue: {ex}")
         return None
@@ -56,20 +111,231 @@ def get_job(job_id: str = None, job_q: str = None) -> Job:
     return job
 
 
+class JobStatusEvents:
+    """
+    Pushes job status transitions from RQ into `EnqueuedJob` as they happen.
+
+    The RQ callbacks (and `StatusTrackingWorker` for "started") only `RPUSH` a `job_id|status` event
+    onto a Redis list, which costs the job one Redis command and survives the work horse exiting.
+    `flush` drains up to `BATCH_SIZE` events at a time and writes them with one `UPDATE` per status.
+    An event can arrive before `register_job_in_db` has created the job's row; it is pushed back for a
+    later flush, at most `MAX_ATTEMPTS` times. `MonitorEnqueuedJob` remains as a reconciliation sweep
+    for anything missed.
+    """
+
+    KEY: str = "job_handler:status-events"
+    BATCH_SIZE: int = 500
+    MAX_ATTEMPTS: int = 10
+
+    @classmethod
+    def callbacks(cls) -> Dict[str, Callback]:
+        return {
+            "on_success": Callback(on_job_success),
+            "on_failure": Callback(on_job_failure),
+            "on_stopped": Callback(on_job_stopped),
+        }
+
+    @classmethod
+    def push(cls, job_id: str = None, status: str = None, connection = None) -> None:
+        try:
+            (connection or settings.REDIS_CONN).rpush(cls.KEY, f"{job_id}|{status}")
+        except Exception as ex:
+            redis_logger.warning(f"Unable to record status '{status}' of job {job_id}: {ex}")
+
+    @classmethod
+    def flush(cls, connection = None) -> int:
+        """
+        Write pending status events to the DB; returns the number of jobs updated.
+        """
+        connection = connection or settings.REDIS_CONN
+        updated, deferred = 0, []
+        while True:
+            events = connection.lpop(cls.KEY, cls.BATCH_SIZE) or []
+
+            ## (prithoo): Events are in order, the last one of a job wins unless it would undo a final status.
+            latest: Dict[str, tuple] = {}
+            for event in events:
+                job_id, _, rest = event.decode("utf-8").partition("|")
+                status, _, attempts = rest.partition("|")
+                status = EnquedJobChoice.RQ_STATUS_MAP.get(status, status)
+                previous = latest.get(job_id)
+                if previous and previous[0] in EnquedJobChoice.TERMINAL_STATUSES \
+                        and status not in EnquedJobChoice.TERMINAL_STATUSES:
+                    continue
+                latest[job_id] = (status, int(attempts or 0))
+
+            by_status: Dict[str, List[str]] = {}
+            for job_id, (status, _) in latest.items():
+                by_status.setdefault(status, []).append(job_id)
+
+            NOW = timezone.now()
+            for status, job_ids in by_status.items():
+                jobs = EnqueuedJob.objects.filter(job_id__in=job_ids)
+                if status not in EnquedJobChoice.TERMINAL_STATUSES:
+                    ## (prithoo): A late "started" must never overwrite a final status.
+                    jobs = jobs.filter(~Q(_status__in=EnquedJobChoice.TERMINAL_STATUSES))
+                matched = jobs.update(_status=status, updated=NOW)
+                updated += matched
+                if status == EnquedJobChoice.failed:
+                    logger.warning(f"Job(s) {', '.join(job_ids)} failed")
+                if matched < len(job_ids):
+                    deferred += cls.unregistered(job_ids=job_ids, status=status, latest=latest)
+
+            if len(events) < cls.BATCH_SIZE:
+                break
+
+        if deferred:
+            connection.rpush(cls.KEY, *deferred)
+        return updated
+
+    @classmethod
+    def unregistered(cls, job_ids: List[str] = None, status: str = None, latest: Dict[str, tuple] = None) -> List[str]:
+        """
+        The events of `job_ids` that have no row yet, to be retried; rows that exist but were skipped
+        already have a final status.
+        """
+        registered = set(EnqueuedJob.objects.filter(job_id__in=job_ids).values_list("job_id", flat=True))
+        retries = []
+        for job_id in job_ids:
+            if job_id in registered:
+                continue
+            attempts = latest[job_id][1] + 1
+            if attempts >= cls.MAX_ATTEMPTS:
+                logger.warning(f"Dropping status '{status}' of job {job_id}, it was never registered.")
+                continue
+            retries.append(f"{job_id}|{status}|{attempts}")
+
+        return retries
+
+
+def on_job_success(job: Job, connection, result, *args, **kwargs) -> None:
+    JobStatusEvents.push(job_id=job.id, status=EnquedJobChoice.finished, connection=connection)
+
+
+def on_job_failure(job: Job, connection, exc_type, exc_value, traceback) -> None:
+    JobStatusEvents.push(job_id=job.id, status=EnquedJobChoice.failed, connection=connection)
+
+
+def on_job_stopped(job: Job, connection) -> None:
+    JobStatusEvents.push(job_id=job.id, status=EnquedJobChoice.failed, connection=connection)
+
+
+class StatusTrackingWorker(rq.Worker):
+    """
+    RQ worker that records when a job starts and writes pending status events between jobs.
+
+    Used by `scripts/start_queues.sh` through `rqworker --worker-class`.
+    """
+
+    def execute_job(self, job: Job, queue: rq.Queue):
+        JobStatusEvents.push(job_id=job.id, status=EnquedJobChoice.started, connection=self.connection)
+        self.flush_status_events()
+        try:
+            return super().execute_job(job, queue)
+        finally:
+            self.flush_status_events()
+
+    def flush_status_events(self) -> None:
+        try:
+            JobStatusEvents.flush(connection=self.connection)
+        except Exception as ex:
+            logger.warning(f"Unable to write job status events: {ex}")
+
+
+def fetch_job_statuses(job_ids: List[str] = None, chunk_size: int = 5000) -> Dict[str, str]:
+    """
+    Read the RQ status of many jobs with pipelined `HGET`s, without loading (and unpickling) the jobs.
+
+    Jobs no longer in Redis map to `None`.
+    """
+    statuses: Dict[str, str] = {}
+    job_ids = list(job_ids or [])
+    for start in range(0, len(job_ids), chunk_size):
+        chunk = job_ids[start:start + chunk_size]
+        pipe = settings.REDIS_CONN.pipeline(transaction=False)
+        for job_id in chunk:
+            pipe.hget(Job.key_for(job_id), "status")
+        for job_id, status in zip(chunk, pipe.execute()):
+            statuses[job_id] = status.decode("utf-8") if status else None
+
+    return statuses
+
+
+def summarize_value(value: Any = None, budget: int = None) -> Any:
+    """
+    A JSON-native stand-in for one job argument: scalars as they are, strings cut to `budget`
+    characters, anything else only by its type name (never its `repr`).
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= budget else f"{value[:budget]}..."
+    return f"<{type(value).__name__}>"
+
+
+def summarize_arguments(job: Job = None, budget: int = None) -> Dict[str, Any]:
+    """
+    A summary of the arguments of `job` that fits in `budget` bytes of JSON (`settings.JOB_ARGUMENTS_SUMMARY_BYTES`).
+
+    Arguments past the budget are left out and `truncated` is set. A freshly enqueued job still
+    holds its arguments in memory, nothing is unpickled here.
+    """
+    budget = budget or settings.JOB_ARGUMENTS_SUMMARY_BYTES
+    summary = {"args": [], "kwargs": {}, "truncated": False}
+    used = len(dumps(summary))
+
+    items = [(None, value) for value in job.args] + list(job.kwargs.items())
+    for key, value in items:
+        value = summarize_value(value=value, budget=budget // 4)
+        size = len(dumps(value)) + (len(dumps(key)) + 2 if key is not None else 2)
+        if used + size > budget:
+            summary["truncated"] = True
+            break
+
+        used += size
+        if key is None:
+            summary["args"].append(value)
+        else:
+            summary["kwargs"][key] = value
+
+    return summary
+
+
+def get_job_record(job: Job = None) -> Dict[str, Any]:
+    """
+    The `EnqueuedJob` fields of an RQ job.
+
+    Only a compact, JSON-native record is kept: function, queue, an argument summary and a hash of the
+    pickled payload. The payload itself stays in Redis, the admin renders it on demand.
+    """
+    payload: bytes = job.data
+    arguments = summarize_arguments(job=job)
+    return {
+        "job_id": f"{job.id}",
+        "_func_name": f"{job.func_name}",
+        "origin": f"{job.origin}",
+        ## (prithoo): A synchronous job has already run, and its callbacks fired before this row existed.
+        "_status": EnquedJobChoice.RQ_STATUS_MAP.get(job.get_status(refresh=False), EnquedJobChoice.queued),
+        "enqueued_at": job.enqueued_at.replace(tzinfo=pytz.timezone(settings.TIME_ZONE)),
+        "data": {
+            "func": job.func_name,
+            "queue": job.origin,
+            "args": arguments["args"],
+            "truncated": arguments["truncated"],
+            "payload_sha256": sha256(payload).hexdigest(),
+            "payload_bytes": len(payload),
+        },
+        "_kwargs": arguments["kwargs"],
+        "description": f"{job.description}"[:settings.JOB_ARGUMENTS_SUMMARY_BYTES]
+    }
+
+
 def register_job_in_db(job: Job = None):
     """
     Register a job in DB.
     """
     try:
-        data = {
-            "job_id": f"{job.id}",
-            "_func_name": f"{job.func_name}",
-            "origin": f"{job.origin}",
-            "enqueued_at": job.enqueued_at.replace(tzinfo=pytz.timezone(settings.TIME_ZONE)),
-            "data": f"{pickle.loads(job.data)}" if job.data else None,
-            "_kwargs": f"{job.kwargs}",
-            "description": f"{job.description}"
-        }
+        data = get_job_record(job=job)
 
         deserialized = EnqueuedJobSerializer(data=data)
         if not deserialized.is_valid():
@@ -83,6 +349,66 @@ def register_job_in_db(job: Job = None):
     return None
 
 
+def register_jobs_in_db(jobs: List[Job] = None) -> int:
+    """
+    Register many jobs in DB with one `bulk_create`; returns the number of jobs submitted, `0` on failure.
+
+    Jobs that are already registered are skipped by `ignore_conflicts`, which does not report which rows
+    were actually inserted, so the count includes them.
+    """
+    try:
+        _ = EnqueuedJob.objects.bulk_create(
+            [EnqueuedJob(**get_job_record(job=job)) for job in jobs],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+    except Exception as ex:
+        logger.warning(f"Failed to register {len(jobs)} job(s) in DB: {ex}")
+        return 0
+
+    return len(jobs)
+
+
+class JobRecordArchive:
+    """
+    Appends `EnqueuedJob` rows to a gzipped JSONL file before they are deleted.
+
+    Each batch is written (and closed) as its own gzip member of the file of the run, so the file is
+    complete up to the last batch that was deleted even if the run is interrupted. `undo` truncates
+    the last member away when its rows end up not being deleted, see `utils.db_utils.ChunkedDeletion`.
+    """
+
+    def __init__(self, directory: str = None) -> None:
+        directory = directory or settings.JOB_ARCHIVE_DIR
+        makedirs(directory, exist_ok=True)
+        self.path = path.join(directory, f"enqueued_jobs_{timezone.now():%Y%m%dT%H%M%S}.jsonl.gz")
+        self.archived = 0
+        self.offset, self.last = 0, 0
+
+    def __call__(self, ids: List[str] = None) -> int:
+        rows = EnqueuedJob.objects.filter(pk__in=ids).values()
+        self.offset = path.getsize(self.path) if path.exists(self.path) else 0
+        self.last, written = 0, 0
+        with gzip.open(self.path, "at", encoding="utf-8") as archive:
+            for row in rows:
+                archive.write(dumps(row, default=str))
+                archive.write("\n")
+                written += 1
+        self.archived += written
+        self.last = written
+        return self.archived
+
+    def undo(self) -> None:
+        """
+        Take the last batch back out of the file.
+        """
+        if path.exists(self.path):
+            with open(self.path, "r+b") as archive:
+                archive.truncate(self.offset)
+        self.archived -= self.last
+        self.last = 0
+
+
 def find_prime_numbers(lower_bound: int, upper_bound: int) -> None:
     """
     Simple function to find prime numbers between a range; used to test the job queue implementation(s).
@@ -96,3 +422,10 @@ def find_prime_numbers(lower_bound: int, upper_bound: int) -> None:
                     break
             else:
                 redis_logger.info(f"Prime Number Found: {number}")
+
+
+def noop(*args, **kwargs) -> None:
+    """
+    Does nothing; used to benchmark the job queue implementation(s).
+    """
+    return None
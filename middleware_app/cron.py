@@ -1,67 +1,37 @@
-from datetime import datetime, timedelta
-import pytz
-
 from django_cron import CronJobBase, Schedule
 
-from django.conf import settings
-
-from database.collections import DatabaseCollections
-from database.methods import SynchronousMethods
+from database.indexes import DatabaseIndexes
+from database.retention import MongoRetention
 
 from middleware_app import logger
 
 
-class DeleteOldUserIPAddresses(CronJobBase):
-    """
-    Delete IP addresses older than 90 days.
+class EnforceMongoRetention(CronJobBase):
     """
-    RUN_EVERY_MINS = 120  # every 2 hours
-    
-    schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
-    code = 'delete_old_user_ip_addresses'  # a unique code
-    
-    def do(self):
-        """
-        Delete IP addresses older than 90 days or approximately, 3 months.
-        """
-        NINETY_DAYS_AGO = datetime.now(pytz.timezone(settings.TIME_ZONE)) - timedelta(days=90)
-        logger.info("Deleting old IP addresses.")
-        try:
-            SynchronousMethods.delete(
-                filter_dict={
-                    "timestampUtc": {
-                        "$lt": NINETY_DAYS_AGO
-                    }
-                },
-                collection=DatabaseCollections.user_ips
-            )
-        except Exception as ex:
-            logger.warning(f"{ex}")
-
+    Delete expired documents from every MongoDB collection with "batch" retention.
 
-class DeleteOldUserMACAdresses(CronJobBase):
-    """
-    Delete MAC addresses older than 90 days.
+    Collections in "ttl" mode are expired by MongoDB itself, see `database.retention.MongoRetention`; their
+    TTL index is ensured on every run, so that switching a collection to "ttl" does not depend on
+    `ensure_mongo_indexes` having been run by hand.
     """
     RUN_EVERY_MINS = 120  # every 2 hours
-    
+
     schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
-    code = 'delete_old_user_mac_addresses'  # a unique code
-    
+    code = 'enforce_mongo_retention'  # a unique code
+
     def do(self):
-        """
-        Delete MAC addresses older than 30 days.
-        """
-        NINETY_DAYS_AGO = datetime.now(pytz.timezone(settings.TIME_ZONE)) - timedelta(days=90)
-        logger.info("Deleting old MAC addresses.")
-        try:
-            SynchronousMethods.delete(
-                filter_dict={
-                    "timestampUtc": {
-                        "$lt": NINETY_DAYS_AGO
-                    }
-                },
-                collection=DatabaseCollections.user_mac_addresses
-            )
-        except Exception as ex:
-            logger.warning(f"{ex}")
\ No newline at end of file
+        logger.info("Enforcing MongoDB retention.")
+        for collection, policy in MongoRetention.get_policies().items():
+            if policy["mode"] != MongoRetention.MODE_TTL:
+                continue
+            try:
+                DatabaseIndexes.ensure(collection=collection)
+            except Exception as ex:
+                logger.exception(f"Unable to ensure the TTL index on '{collection}': {ex}")
+
+        reports = MongoRetention.purge_all()
+
+        return "; ".join(
+            f"{collection}: {report['deleted']} deleted in {report['batches']} batch(es), {report['seconds']}s"
+            for collection, report in reports.items()
+        )
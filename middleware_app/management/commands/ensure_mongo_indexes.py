@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from database.indexes import DatabaseIndexes
+
+
+class Command(BaseCommand):
+    help = "Create (or update) the MongoDB indexes declared in `database.indexes.DatabaseIndexes`."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true', help='Drop and recreate indexes whose definition changed'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Only report what would be done'
+        )
+
+    def handle(self, *args, **options):
+        results = DatabaseIndexes.ensure_all(rebuild=options['rebuild'], dry_run=options['dry_run'])
+
+        conflicts = 0
+        for collection, actions in results.items():
+            for name, action in actions.items():
+                conflicts += action in ("conflict", "stale ttl") or action.startswith("failed")
+                self.stdout.write(f"{collection}.{name}: {action}")
+
+        if conflicts:
+            self.stdout.write(self.style.WARNING(f"{conflicts} index(es) need attention, see above (or use --rebuild)."))
+        else:
+            self.stdout.write(self.style.SUCCESS("MongoDB indexes are up to date."))
@@ -1,13 +1,13 @@
-from os import environ
-from jose import jwt
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 
 from database.collections import DatabaseCollections
-from database.methods import SynchronousMethods
+from database.methods import AsynchronousMethods, SynchronousMethods
 from django.http import HttpRequest, HttpResponseForbidden
 
-from core.settings import SECRET_KEY, IP_HEADER, MAC_HEADER
+from auth.identity import ResolvedIdentity
+from core.settings import IP_HEADER, MAC_HEADER
+from middleware_app.utils import IpCheckDecisionCache
 from user_app.models import User
-from user_app.utils import UserTokenUtils
 
 from middleware_app import logger
 
@@ -16,7 +16,12 @@ class IpAddressChecker(object):
     """
     Middleware to check if the user is accessing from an IP address they have previously logged-in from.
     This is to prevent session-token theft from being viable.
+
+    Runs natively under ASGI: the MongoDB check goes through Motor and the user lookup is the only
+    part handed to a thread.
     """
+    sync_capable: bool = True
+    async_capable: bool = True
 
     MAC_ADDRESS_HEADER_NAME: str = MAC_HEADER
     IP_HEADER: str = IP_HEADER
@@ -27,41 +32,38 @@ class IpAddressChecker(object):
 
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         resp = self.process_request(request=request)
         if resp:
             return resp
         return self.get_response(request)
 
+    async def __acall__(self, request):
+        resp = await self.aprocess_request(request=request)
+        if resp:
+            return resp
+        return await self.get_response(request)
+
     def get_jwt_user(
         self,
-        headers: dict = None,
-        token_prefix: str = "Bearer"
+        request: HttpRequest = None
     ):
         """
         Method to get the user from the header of the request, if authentication is handled
         by a JWT.
 
-        Change `token_prefix` to whatever prefix your system uses.
+        The token is decoded once per request and shared with the authentication classes, see `auth.identity`.
         """
-
-        if not headers.get("Authorization"):
-            logger.warning("No authorization header.")
-            return None
-
-        try:
-            if headers.get("Authorization").split(" ")[0] != token_prefix:
-                logger.warning("Inavlid token prefix.")
-                return None
-
-            token = headers.get("Authorization").split(" ")[1]
-            validated = jwt.decode(token=token, key=SECRET_KEY, algorithms=[
-                                   environ.get('JWT_ALGORITHM'),])
-            return User.objects.filter(pk=validated.get("user_id")).first()
-        except Exception as ex:
-            logger.info(f"{ex}")
-            return None
+        identity = ResolvedIdentity.for_request(request)
+        if identity.error:
+            logger.info(f"{identity.error}")
+        return identity.user
 
     def get_client_ip(self, request: HttpRequest):
         try:
@@ -78,6 +80,45 @@ class IpAddressChecker(object):
             logger.warning(f"{ex}")
             return None
 
+    def is_known_address(self, user_id: str = None, ip: str = None, mac: str = None) -> bool:
+        """
+        Whether the user has logged in from (or whitelisted) this IP, or logged in from this MAC.
+
+        Decisions are cached per `(user_id, ip, mac)`, see `IpCheckDecisionCache`; on a miss all three
+        collections are checked in a single MongoDB query.
+        """
+        allowed = IpCheckDecisionCache.get(user_id=user_id, ip=ip, mac=mac)
+        if allowed is not None:
+            return allowed
+
+        allowed = SynchronousMethods.exists_in_any(filters=self.get_address_filters(user_id=user_id, ip=ip, mac=mac))
+
+        IpCheckDecisionCache.set(user_id=user_id, ip=ip, mac=mac, allowed=allowed)
+        return allowed
+
+    async def ais_known_address(self, user_id: str = None, ip: str = None, mac: str = None) -> bool:
+        """
+        Async counterpart of `is_known_address`; the Redis cache is synchronous, so it is read and
+        written from a worker thread instead of blocking the event loop.
+        """
+        allowed = await sync_to_async(IpCheckDecisionCache.get, thread_sensitive=False)(user_id=user_id, ip=ip, mac=mac)
+        if allowed is not None:
+            return allowed
+
+        allowed = await AsynchronousMethods.exists_in_any(filters=self.get_address_filters(user_id=user_id, ip=ip, mac=mac))
+
+        await sync_to_async(IpCheckDecisionCache.set, thread_sensitive=False)(user_id=user_id, ip=ip, mac=mac, allowed=allowed)
+        return allowed
+
+    def get_address_filters(self, user_id: str = None, ip: str = None, mac: str = None) -> dict:
+        filters = {
+            DatabaseCollections.user_ips: {"user": user_id, "ip": ip},
+            DatabaseCollections.user_white_listed_ips: {"user": user_id, "ip": ip},
+        }
+        if mac:
+            filters[DatabaseCollections.user_mac_addresses] = {"user": user_id, "mac": mac}
+        return filters
+
     def check_previous_ip(self, user_id: str = None, ip: str = None):
         filter_dict = {
             "$and": [
@@ -102,15 +143,33 @@ class IpAddressChecker(object):
         if (not user or not type(user) == User):
             ## We don't need to check the IP if the user is using a permanent Token, as that would overcomplicate things on the user's end.
             if headers.get(self.AUTHORIZATION_KEY, "").split(" ")[0] == self.JWT_HEADER: 
-                user = self.get_jwt_user(headers=headers)
+                user = self.get_jwt_user(request=request)
             else:
                 user = None
 
 
         if user \
             and not (user.is_superuser or user.is_staff) \
-            and not (self.check_previous_ip(user_id=f"{user.id}", ip=ip)
-                     or self.check_previous_mac(user_id=f"{user.id}", mac=mac)):
+            and not self.is_known_address(user_id=f"{user.id}", ip=ip, mac=mac):
+            return HttpResponseForbidden(
+                content="Your IP/MAC address has changed to one from where you have never logged in before, please re-login."
+            )
+
+    async def aprocess_request(self, request: HttpRequest):
+        headers = request.headers
+        user = await request.auser()
+        ip = self.get_client_ip(request=request)
+        mac = self.get_client_mac_address(headers=headers)
+
+        if (not user or not type(user) == User):
+            if headers.get(self.AUTHORIZATION_KEY, "").split(" ")[0] == self.JWT_HEADER:
+                user = await sync_to_async(self.get_jwt_user)(request=request)
+            else:
+                user = None
+
+        if user \
+            and not (user.is_superuser or user.is_staff) \
+            and not await self.ais_known_address(user_id=f"{user.id}", ip=ip, mac=mac):
             return HttpResponseForbidden(
                 content="Your IP/MAC address has changed to one from where you have never logged in before, please re-login."
             )
@@ -1,16 +1,17 @@
 from datetime import datetime
 from json import loads
-from os import environ
 from uuid import uuid4
 
-from core.settings import DEBUG, SECRET_KEY
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from auth.identity import ResolvedIdentity, UserSnapshotCache
+from core.settings import DEBUG
 from database.collections import DatabaseCollections
-from database.methods import SynchronousMethods
 from django.http import HttpRequest
-from jose import jwt
 from middleware_app import logger
 from middleware_app.models import RequestLog
-from user_app.models import User
+from middleware_app.utils import RequestLogShipper
+from user_app.models import User, UserToken
 from user_app.serializers import ShowUserSerializer
 from user_app.utils import UserTokenUtils
 
@@ -18,45 +19,46 @@ from user_app.utils import UserTokenUtils
 class RequestLogger(object):
     """
     Middleware to log requests recieved by the system.
+
+    Runs natively under ASGI; documents are shipped in the background either way.
     """
     JWT_HEADER: str = "Bearer"
     TOKEN_HEADER: str = "Token"
     AUTHORIZATION_KEY: str = "Authorization"
 
+    sync_capable: bool = True
+    async_capable: bool = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         self.process_request(request=request, record_sql=False)
         return self.get_response(request)
 
+    async def __acall__(self, request):
+        await self.aprocess_request(request=request, record_sql=False)
+        return await self.get_response(request)
+
     def get_jwt_user(
         self,
-        headers: dict = None,
-        token_prefix: str = "Bearer"
+        request: HttpRequest = None
     ):
         """
         Method to get the user from the header of the request, if authentication is handled
         by a JWT.
 
-        Change `token_prefix` to whatever prefix your system uses.
+        The token is decoded once per request and shared with the authentication classes, see `auth.identity`.
         """
-
-        if not headers.get("Authorization"):
-            logger.warning("No authorisation header.")
-            return None
-
-        try:
-            if headers.get("Authorization").split(" ")[0] != token_prefix:
-                logger.warning("Inavlid token prefix.")
-                return None
-
-            token = headers.get("Authorization").split(" ")[1]
-            validated = jwt.decode(token=token, key=SECRET_KEY, algorithms=[environ.get('JWT_ALGORITHM'),])
-            return User.objects.filter(pk=validated.get("user_id")).first()
-        except Exception as ex:
-            logger.info(f"{ex}")
-            return None
+        identity = ResolvedIdentity.for_request(request)
+        if identity.error:
+            logger.info(f"{identity.error}")
+        return identity.user
         
     def get_token_user(
         self,
@@ -75,10 +77,13 @@ class RequestLogger(object):
                 logger.warning("Inavlid token prefix.")
                 return None
             raw_token = headers.get("Authorization").split(" ")[1]
-            user_part, token_part = UserTokenUtils.split_parts(raw_token)
-            user_id = UserTokenUtils.get_user_id(user_part=user_part)
-            user = User.objects.filter(pk=user_id).first()
-            return user
+            if UserTokenUtils.is_selector_token(raw_token):
+                token_id, _ = UserTokenUtils.split_selector(raw_token)
+                user_id = UserToken.objects.filter(pk=token_id).values_list("user_id", flat=True).first() if token_id else None
+            else:
+                user_part, token_part = UserTokenUtils.split_parts(raw_token)
+                user_id = UserTokenUtils.get_user_id(user_part=user_part)
+            return UserSnapshotCache.get(user_id=user_id) if user_id else None
 
         except Exception as ex:
             logger.info(f"{ex}")
@@ -87,6 +92,8 @@ class RequestLogger(object):
     def record_in_nosql(self, method, path, cookies, body, headers, params, user, *args, **kwargs):
         """
         Record the request in the appropriate collection in the MongoDB cluster that was set up.
+
+        The insert happens in the background, see `middleware_app.utils.RequestLogShipper`.
         """
         
         try:
@@ -102,8 +109,8 @@ class RequestLogger(object):
                 "timestampUtc": datetime.utcnow()
             }
 
-            _ = SynchronousMethods.insert_one(
-                no_sql_data, DatabaseCollections.request_logs)
+            _ = RequestLogShipper.submit(
+                document=no_sql_data, collection=DatabaseCollections.request_logs)
         except Exception as ex:
             logger.warning(f"{ex}")
 
@@ -135,15 +142,7 @@ class RequestLogger(object):
             body = request.body
             headers = request.headers
             params = request.GET
-            user = request.user
-
-            if not user or not type(user) == User:
-                if headers.get(self.AUTHORIZATION_KEY, "").split(" ")[0] == self.JWT_HEADER:
-                    user = self.get_jwt_user(headers=headers)
-                elif headers.get(self.AUTHORIZATION_KEY, "").split(" ")[0] == self.TOKEN_HEADER:
-                    user = self.get_token_user(headers=headers)
-                else:
-                    user = None
+            user = self.get_request_user(request=request, user=request.user)
 
             logger.info( f"INCOMING REQUEST: `USER: {user.email if user else None}\tPATH:{path}\tMETHOD: {method}`")
 
@@ -153,3 +152,39 @@ class RequestLogger(object):
             if record_sql:
                 self.record_in_sql(method, path, cookies,
                                    body, headers, params, user)
+
+    def get_request_user(self, request: HttpRequest = None, user: User = None):
+        """
+        The session user if there is one, otherwise the user behind the JWT or permanent token.
+        """
+        if user and type(user) == User:
+            return user
+
+        headers = request.headers
+        if headers.get(self.AUTHORIZATION_KEY, "").split(" ")[0] == self.JWT_HEADER:
+            return self.get_jwt_user(request=request)
+        elif headers.get(self.AUTHORIZATION_KEY, "").split(" ")[0] == self.TOKEN_HEADER:
+            return self.get_token_user(headers=headers)
+        return None
+
+    async def aprocess_request(self, request: HttpRequest = None, record_nosql:bool=True, record_sql: bool = False):
+        """
+        Async counterpart of `process_request`; only the user lookup and the SQL record run in a thread.
+        """
+        if DEBUG and not request.path.startswith("/admin"):
+            method = request.method
+            path = request.path
+            cookies = request.COOKIES
+            body = request.body
+            headers = request.headers
+            params = request.GET
+            user = await sync_to_async(self.get_request_user)(request=request, user=await request.auser())
+
+            logger.info( f"INCOMING REQUEST: `USER: {user.email if user else None}\tPATH:{path}\tMETHOD: {method}`")
+
+            if record_nosql:
+                self.record_in_nosql(method, path, cookies,
+                                 body, headers, params, user)
+            if record_sql:
+                await sync_to_async(self.record_in_sql)(method, path, cookies,
+                                                        body, headers, params, user)
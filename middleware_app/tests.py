@@ -0,0 +1,239 @@
+from queue import Queue
+from time import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from django.test import SimpleTestCase
+from pymongo.errors import BulkWriteError
+
+from database.collections import DatabaseCollections
+from database.indexes import DatabaseIndexes
+from database.methods import AsynchronousMethods, SynchronousMethods, _inserted_ids
+from database.retention import MongoRetention
+from middleware_app.cron import EnforceMongoRetention
+from middleware_app.middlewares.ip_checker import IpAddressChecker
+from middleware_app.utils import IpCheckDecisionCache, RequestLogShipper
+
+
+class FakeRedisHash:
+    """
+    Just enough of a Redis connection for `IpCheckDecisionCache`.
+    """
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hget(self, key: str = None, field: str = None):
+        return self.hashes.get(key, {}).get(field)
+
+    def hset(self, key: str = None, field: str = None, value: str = None):
+        self.hashes.setdefault(key, {})[field] = value.encode("utf-8")
+
+    def expire(self, key: str = None, seconds: int = None):
+        pass
+
+    def delete(self, key: str = None):
+        self.hashes.pop(key, None)
+
+    def pipeline(self, transaction: bool = True):
+        pipe = MagicMock()
+        pipe.hset.side_effect = self.hset
+        return pipe
+
+
+class IpCheckDecisionCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.connection = FakeRedisHash()
+        patcher = patch.object(IpCheckDecisionCache, "get_connection", return_value=self.connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_decisions_are_cached_per_address(self):
+        IpCheckDecisionCache.set(user_id="u", ip="1.1.1.1", mac=None, allowed=True)
+        IpCheckDecisionCache.set(user_id="u", ip="2.2.2.2", mac=None, allowed=False)
+
+        self.assertTrue(IpCheckDecisionCache.get(user_id="u", ip="1.1.1.1"))
+        self.assertFalse(IpCheckDecisionCache.get(user_id="u", ip="2.2.2.2"))
+        self.assertIsNone(IpCheckDecisionCache.get(user_id="u", ip="3.3.3.3"))
+
+        IpCheckDecisionCache.invalidate(user_id="u")
+        self.assertIsNone(IpCheckDecisionCache.get(user_id="u", ip="1.1.1.1"))
+
+    def test_expired_decision_is_ignored(self):
+        self.connection.hset(
+            IpCheckDecisionCache.key("u"), IpCheckDecisionCache.field("1.1.1.1", None), f"1:{time() - 1}")
+
+        self.assertIsNone(IpCheckDecisionCache.get(user_id="u", ip="1.1.1.1"))
+
+    def test_checker_only_asks_mongo_on_a_miss(self):
+        checker = IpAddressChecker(get_response=lambda request: None)
+        with patch.object(SynchronousMethods, "exists_in_any", return_value=True) as exists_in_any:
+            self.assertTrue(checker.is_known_address(user_id="u", ip="1.1.1.1"))
+            self.assertTrue(checker.is_known_address(user_id="u", ip="1.1.1.1"))
+
+        exists_in_any.assert_called_once()
+
+
+class RequestLogShipperTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.counters = dict(RequestLogShipper.counters)
+        self.addCleanup(RequestLogShipper.counters.update, self.counters)
+
+    def test_flush_groups_by_collection_and_counts(self):
+        batch = [("logs", {"_id": "a"}), ("other", {"_id": "b"}), ("logs", {"_id": "c"})]
+        inserted = {"logs": ["a"], "other": Exception("down")}
+
+        def insert_many(data: list = None, collection: str = None):
+            if isinstance(inserted[collection], Exception):
+                raise inserted[collection]
+            return inserted[collection]
+
+        with patch.object(SynchronousMethods, "insert_many", side_effect=insert_many) as insert_many_:
+            RequestLogShipper.flush(batch=batch)
+
+        self.assertEqual(insert_many_.call_count, 2)
+        self.assertEqual(RequestLogShipper.counters["shipped"] - self.counters["shipped"], 1)
+        self.assertEqual(RequestLogShipper.counters["failed"] - self.counters["failed"], 2)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        with patch.object(RequestLogShipper, "_ensure_worker"), \
+                patch.object(RequestLogShipper, "_queue", Queue(maxsize=1)):
+            self.assertTrue(RequestLogShipper.submit(document={}, collection="logs"))
+            self.assertFalse(RequestLogShipper.submit(document={}, collection="logs"))
+
+        self.assertEqual(RequestLogShipper.counters["dropped"] - self.counters["dropped"], 1)
+
+    def test_stop_flushes_what_is_queued(self):
+        with patch.object(SynchronousMethods, "insert_many", side_effect=lambda data, collection: [d["_id"] for d in data]):
+            RequestLogShipper.submit(document={"_id": "a"}, collection="logs")
+            RequestLogShipper.stop()
+
+        self.assertEqual(RequestLogShipper.counters["shipped"] - self.counters["shipped"], 1)
+        self.assertEqual(RequestLogShipper.stats()["queued"], 0)
+
+
+class InsertedIdsTestCase(SimpleTestCase):
+
+    data = [{"_id": "a"}, {"_id": "b"}, {"_id": "c"}]
+
+    def error(self, *codes) -> BulkWriteError:
+        return BulkWriteError({"writeErrors": [{"index": index, "code": code} for index, code in codes]})
+
+    def test_duplicates_are_skipped(self):
+        self.assertEqual(_inserted_ids(data=self.data, error=self.error((1, 11000))), ["a", "c"])
+
+    def test_ordered_insert_stops_at_the_first_duplicate(self):
+        self.assertEqual(_inserted_ids(data=self.data, error=self.error((1, 11000)), ordered=True), ["a"])
+
+    def test_other_errors_are_raised(self):
+        with self.assertRaises(BulkWriteError):
+            _inserted_ids(data=self.data, error=self.error((0, 11000), (1, 121)))
+
+    def test_no_error_means_everything_was_inserted(self):
+        self.assertEqual(_inserted_ids(data=self.data), ["a", "b", "c"])
+
+
+class AsyncDataLayerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.connection = FakeRedisHash()
+        patcher = patch.object(IpCheckDecisionCache, "get_connection", return_value=self.connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_async_checker_shares_the_cache(self):
+        checker = IpAddressChecker(get_response=lambda request: None)
+        with patch.object(AsynchronousMethods, "exists_in_any", new_callable=AsyncMock, return_value=False) as exists_in_any:
+            self.assertFalse(await checker.ais_known_address(user_id="u", ip="1.1.1.1", mac="aa"))
+            self.assertFalse(await checker.ais_known_address(user_id="u", ip="1.1.1.1", mac="aa"))
+
+        exists_in_any.assert_awaited_once()
+        self.assertIn(DatabaseCollections.user_mac_addresses, exists_in_any.call_args.kwargs["filters"])
+
+    async def test_async_insert_many_skips_duplicates(self):
+        collection = MagicMock()
+        collection.insert_many = AsyncMock(side_effect=BulkWriteError({"writeErrors": [{"index": 0, "code": 11000}]}))
+        with patch.object(AsynchronousMethods, "db", {"logs": collection}):
+            inserted = await AsynchronousMethods.insert_many(data=[{"_id": "a"}, {}], collection="logs")
+
+        self.assertEqual(len(inserted), 1)
+        self.assertNotEqual(inserted[0], "a")
+
+
+class DatabaseIndexesTestCase(SimpleTestCase):
+
+    def ensure(self, existing: dict = None, **kwargs):
+        collection = MagicMock()
+        collection.index_information.return_value = existing or {}
+        db = MagicMock()
+        db.__getitem__.return_value = collection
+        with patch.object(SynchronousMethods, "db", db):
+            actions = DatabaseIndexes.ensure(collection=DatabaseCollections.user_ips, **kwargs)
+        return actions, collection, db
+
+    def test_missing_indexes_are_created(self):
+        actions, collection, _ = self.ensure()
+
+        self.assertEqual(set(actions.values()), {"created"})
+        self.assertEqual(collection.create_indexes.call_count, len(actions))
+
+    def test_existing_indexes_are_left_alone(self):
+        existing = {
+            model.document["name"]: {"key": list(model.document["key"].items()), "v": 2}
+            for model in DatabaseIndexes.get_registry()[DatabaseCollections.user_ips]
+        }
+        actions, collection, _ = self.ensure(existing=existing)
+
+        self.assertEqual(set(actions.values()), {"unchanged"})
+        collection.create_indexes.assert_not_called()
+
+    def test_changed_ttl_is_updated_in_place(self):
+        with self.settings(MONGO_RETENTION={DatabaseCollections.user_ips: {"mode": MongoRetention.MODE_TTL, "days": 7}}):
+            existing = {"timestampUtc_ttl": {"key": [("timestampUtc", 1)], "expireAfterSeconds": 90 * 24 * 60 * 60}}
+            actions, collection, db = self.ensure(existing=existing)
+
+        self.assertEqual(actions["timestampUtc_ttl"], "ttl updated")
+        db.command.assert_called_once_with(
+            "collMod", DatabaseCollections.user_ips,
+            index={"name": "timestampUtc_ttl", "expireAfterSeconds": 7 * 24 * 60 * 60})
+
+    def test_stale_ttl_is_reported(self):
+        actions, collection, _ = self.ensure(existing={"timestampUtc_ttl": {"key": [("timestampUtc", 1)], "expireAfterSeconds": 60}})
+
+        self.assertEqual(actions["timestampUtc_ttl"], "stale ttl")
+        collection.drop_index.assert_not_called()
+
+
+class MongoRetentionTestCase(SimpleTestCase):
+
+    def test_ip_and_mac_records_are_purged_by_default(self):
+        policies = MongoRetention.get_policies()
+
+        self.assertEqual(policies[DatabaseCollections.user_ips]["mode"], MongoRetention.MODE_BATCH)
+        self.assertEqual(policies[DatabaseCollections.user_mac_addresses]["mode"], MongoRetention.MODE_BATCH)
+
+    def test_string_timestamps_cannot_use_ttl(self):
+        with self.settings(MONGO_RETENTION={DatabaseCollections.deleted_users: {"mode": MongoRetention.MODE_TTL}}):
+            policies = MongoRetention.get_policies()
+
+        self.assertEqual(policies[DatabaseCollections.deleted_users]["mode"], MongoRetention.MODE_BATCH)
+
+    def test_purge_deletes_in_bounded_batches(self):
+        collection = MagicMock()
+        collection.find.return_value.limit.side_effect = lambda size: [{"_id": index} for index in range(size)]
+        collection.delete_many.return_value.deleted_count = 2
+        with patch.object(SynchronousMethods, "db", {DatabaseCollections.user_ips: collection}):
+            report = MongoRetention.purge(collection=DatabaseCollections.user_ips, batch_size=2, max_batches=3)
+
+        self.assertEqual(report["batches"], 3)
+        self.assertEqual(report["deleted"], 6)
+
+    def test_cron_ensures_ttl_indexes_before_skipping_them(self):
+        with self.settings(MONGO_RETENTION={DatabaseCollections.user_ips: {"mode": MongoRetention.MODE_TTL}}), \
+                patch.object(DatabaseIndexes, "ensure") as ensure, \
+                patch.object(MongoRetention, "purge", return_value={"deleted": 0, "batches": 0, "seconds": 0}) as purge:
+            EnforceMongoRetention().do()
+
+        ensure.assert_called_once_with(collection=DatabaseCollections.user_ips)
+        self.assertNotIn(DatabaseCollections.user_ips, [call.kwargs["collection"] for call in purge.call_args_list])
@@ -0,0 +1,126 @@
+from time import time
+from typing import Dict, List
+
+from django.conf import settings
+
+from core.boilerplate.batching_worker import BatchingWorker
+from database.methods import SynchronousMethods
+
+from middleware_app import logger
+
+
+class IpCheckDecisionCache:
+    """
+    Redis cache of `IpAddressChecker` decisions, keyed by `(user_id, ip, mac)`.
+
+    Decisions for a user live in a single hash so that every write to that user's IP/MAC collections
+    can drop them all with one `DEL`. Each entry carries its own expiry: allowed decisions are kept for
+    `TIMEOUT` seconds, denied ones only for `NEGATIVE_TIMEOUT` seconds.
+    Redis being unavailable is never fatal, the checker falls back to MongoDB.
+    """
+
+    PREFIX: str = "middleware:ip-check"
+    TIMEOUT: int = 5 * 60
+    NEGATIVE_TIMEOUT: int = 30
+
+    @classmethod
+    def get_connection(cls):
+        return getattr(settings, "REDIS_CONN", None)
+
+    @classmethod
+    def key(cls, user_id: str = None) -> str:
+        return f"{cls.PREFIX}:{user_id}"
+
+    @classmethod
+    def field(cls, ip: str = None, mac: str = None) -> str:
+        return f"{ip}|{mac}"
+
+    @classmethod
+    def get(cls, user_id: str = None, ip: str = None, mac: str = None) -> bool:
+        """
+        Return the cached decision, or `None` if there is none (or it has expired).
+        """
+        conn = cls.get_connection()
+        if not conn:
+            return None
+
+        try:
+            cached = conn.hget(cls.key(user_id), cls.field(ip, mac))
+        except Exception as ex:
+            logger.warning(f"IP check cache read failed: {ex}")
+            return None
+
+        if not cached:
+            return None
+
+        decision, expires_at = cached.decode("utf-8").split(":", 1)
+        if float(expires_at) < time():
+            return None
+
+        return decision == "1"
+
+    @classmethod
+    def set(cls, user_id: str = None, ip: str = None, mac: str = None, allowed: bool = False) -> None:
+        conn = cls.get_connection()
+        if not conn:
+            return
+
+        timeout = cls.TIMEOUT if allowed else cls.NEGATIVE_TIMEOUT
+        try:
+            pipe = conn.pipeline(transaction=False)
+            pipe.hset(cls.key(user_id), cls.field(ip, mac), f"{int(allowed)}:{time() + timeout}")
+            ## (prithoo): The hash outlives its longest entry; expired entries inside it are ignored by `get`.
+            pipe.expire(cls.key(user_id), cls.TIMEOUT)
+            pipe.execute()
+        except Exception as ex:
+            logger.warning(f"IP check cache write failed: {ex}")
+
+    @classmethod
+    def invalidate(cls, user_id: str = None) -> None:
+        conn = cls.get_connection()
+        if not conn:
+            return
+
+        try:
+            conn.delete(cls.key(user_id))
+        except Exception as ex:
+            logger.error(f"IP check cache invalidation failed: {ex}")
+
+
+class RequestLogShipper(BatchingWorker):
+    """
+    Ships request logs to MongoDB from a background thread, so requests never wait on MongoDB.
+
+    `submit` queues the document and returns immediately, the worker `insert_many`s them in batches,
+    see `core.boilerplate.batching_worker.BatchingWorker`.
+    """
+
+    NAME: str = "request-log-shipper"
+    LABEL: str = "Request log shipper"
+    COUNTERS = ("submitted", "dropped", "shipped", "failed")
+    ACCEPTED: str = "submitted"
+
+    BATCH_SIZE: int = 200
+    FLUSH_INTERVAL: float = 1.0
+
+    @classmethod
+    def submit(cls, document: dict = None, collection: str = None) -> bool:
+        """
+        Queue `document` for insertion into `collection`; returns `False` if it had to be dropped.
+        """
+        return cls.put((collection, document))
+
+    @classmethod
+    def flush(cls, batch: List[tuple] = None) -> None:
+        grouped: Dict[str, List[dict]] = {}
+        for collection, document in batch:
+            grouped.setdefault(collection, []).append(document)
+
+        for collection, documents in grouped.items():
+            try:
+                inserted = SynchronousMethods.insert_many(data=documents, collection=collection)
+                cls.count("shipped", len(inserted))
+                cls.count("failed", len(documents) - len(inserted))
+            except Exception as ex:
+                cls.count("failed", len(documents))
+                logger.warning(f"Unable to ship {len(documents)} request log(s) to '{collection}': {ex}")
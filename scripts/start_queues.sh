@@ -1,2 +1,2 @@
 #!/bin/bash
-python manage.py rqworker default web email sms notification
\ No newline at end of file
+python manage.py rqworker --worker-class job_handler_app.utils.StatusTrackingWorker default web email sms notification
\ No newline at end of file
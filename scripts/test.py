@@ -4,7 +4,7 @@ from user_app.utils import UserTokenUtils
 def main():
     user = User.objects.all()[1]
     print(f"User ID:{user.id}")
-    user_token = UserTokenUtils.create_permanent_token(user)
+    user_token = UserTokenUtils.create_legacy_permanent_token(user)
     print(f"Token: {user_token}")
     user_id = UserTokenUtils.get_user_id(token=user_token)
     print(f"UserID: {user_id}")
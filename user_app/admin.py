@@ -61,6 +61,7 @@ class UserTokenAdmin(admin.ModelAdmin):
 @admin.register(UserTokenUsage)
 class UserTokenUsageAdmin(admin.ModelAdmin):
     list_display = ("id", "token", "created")
+    list_select_related = ("token__user",)
     search_fields = (
         "id",
         "token__alias",
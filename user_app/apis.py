@@ -2,9 +2,8 @@ from rest_framework import status
 from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.request import Request
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from auth.authentication import TokenAuthentication
+from auth.authentication import CachedJWTAuthentication, TokenAuthentication
 from core.boilerplate.response_template import Resp
 from user_app.serializers import ShowUserSerializer
 from user_app.helpers import UserModelHelpers, UserProfileModelHelpers, UserTokenHelpers
@@ -13,7 +12,7 @@ from user_app import logger
 
 
 class AccessTestAPI(APIView):
-    authentication_classes = (JWTAuthentication, TokenAuthentication)
+    authentication_classes = (CachedJWTAuthentication, TokenAuthentication)
     permission_classes = (IsAuthenticated,)
 
     def get(self, request: Request, *args, **kwargs):
@@ -191,7 +190,7 @@ class WhiteListIpAddressAPI(APIView):
 
 class UserTokenAPI(APIView):
 
-    authentication_classes = (JWTAuthentication, TokenAuthentication)
+    authentication_classes = (CachedJWTAuthentication, TokenAuthentication)
     permission_classes = (IsAuthenticated,)
 
     def get(self, request: Request, *args, **kwargs):
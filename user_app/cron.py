@@ -6,7 +6,11 @@ from django.conf import settings
 from django.db.models import Q
 from django.utils import timezone
 
+from user_app.helpers import UserModelHelpers
 from user_app.models import User, UserLoginOTP, UserToken
+from user_app.signals import UserSignalReciever
+from utils.db_utils import ChunkedDeletion
+
 
 class DeleteInactiveUsers(CronJobBase):
     """
@@ -19,10 +23,17 @@ class DeleteInactiveUsers(CronJobBase):
 
     def do(self):
         SEVEN_DAYS_AGO: datetime = datetime.now(pytz.timezone(settings.TIME_ZONE)) - timedelta(days=7)
-        _ = User.objects.filter(
+        users = User.objects.filter(
             Q(is_active=False) 
             & Q(date_joined__lte=SEVEN_DAYS_AGO)
-        ).delete()
+        )
+        with UserSignalReciever.archived_in_bulk():
+            report = ChunkedDeletion.run(
+                queryset=users,
+                archive=lambda ids: UserModelHelpers.archive_deleted_users(ids=ids, reason="Account never activated."),
+                label=self.code
+            )
+        return ChunkedDeletion.to_text(report)
 
 
 class DeleteAbandonedUsers(CronJobBase):
@@ -36,10 +47,17 @@ class DeleteAbandonedUsers(CronJobBase):
 
     def do(self):
         ONE_YEAR_SIX_MONTHS_AGO: datetime = datetime.now(pytz.timezone(settings.TIME_ZONE)) - timedelta(days=548) ## (prithoo): 364.25 days times 1.5 is equal to 547.875 days
-        _ = User.objects.filter(
+        users = User.objects.filter(
             Q(is_active=True) 
             & Q(last_login__lte=ONE_YEAR_SIX_MONTHS_AGO)
-        ).delete()
+        )
+        with UserSignalReciever.archived_in_bulk():
+            report = ChunkedDeletion.run(
+                queryset=users,
+                archive=lambda ids: UserModelHelpers.archive_deleted_users(ids=ids, reason="Account abandoned."),
+                label=self.code
+            )
+        return ChunkedDeletion.to_text(report)
 
 
 class DeleteExpiredLoginOTPs(CronJobBase):
@@ -53,9 +71,11 @@ class DeleteExpiredLoginOTPs(CronJobBase):
 
     def do(self):
         NOW: datetime = timezone.now()
-        _ = UserLoginOTP.objects.filter(
-            otp_expires_at__lte=NOW
-        ).delete()
+        report = ChunkedDeletion.run(
+            queryset=UserLoginOTP.objects.filter(otp_expires_at__lte=NOW),
+            label=self.code
+        )
+        return ChunkedDeletion.to_text(report)
 
 
 class DeleteExpiredUserLoginTokens(CronJobBase):
@@ -70,6 +90,8 @@ class DeleteExpiredUserLoginTokens(CronJobBase):
 
     def do(self):
         NOW: datetime = timezone.now()
-        _ = UserToken.objects.filter(
-            expires_at__lte=NOW
-        ).delete()
\ No newline at end of file
+        report = ChunkedDeletion.run(
+            queryset=UserToken.objects.filter(expires_at__lte=NOW),
+            label=self.code
+        )
+        return ChunkedDeletion.to_text(report)
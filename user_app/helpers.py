@@ -17,12 +17,13 @@ from core.settings import MAC_HEADER
 from database.collections import DatabaseCollections
 from database.methods import SynchronousMethods
 from database.synchronous import s_db
+from middleware_app.utils import IpCheckDecisionCache
 from user_app.models import User, UserProfile, UserLoginOTP, UserPasswordResetToken, UserToken
 from user_app.model_choices import UserModelChoices
 from user_app.serializers import UserRegisterSerializer, ShowUserSerializer, UserProfileInputSerializer, UserProfileOutputSerializer,\
     UserLoginOTPInputSerializer, UserLoginOTPOutputSerializer, UserPasswordResetTokenInputSerializer, UserPasswordResetTokenOutputSerializer, \
     UserTokenInputSerializer, UserTokenOutputSerializer, UserTokenUsageInputSerializer, UserTokenUsageOutputSerializer
-from user_app.utils import JWTUtils, LoginOTPUtils, UserTokenUtils
+from user_app.utils import JWTUtils, LoginOTPUtils, UserTokenUtils, UserTokenUsageRecorder
 
 from user_app import logger
 
@@ -241,6 +242,7 @@ class UserModelHelpers:
 
                 _ = SynchronousMethods.insert_one(
                     data=data, collection=DatabaseCollections.user_ips)
+                IpCheckDecisionCache.invalidate(user_id=user)
             except Exception as ex:
                 logger.warning(f"{ex}")
 
@@ -454,6 +456,23 @@ class UserModelHelpers:
         logger.info(resp.message)
         return resp
 
+    @classmethod
+    def archive_deleted_users(cls, ids: List[str] = None, reason: str = "Some generic reason.") -> int:
+        """
+        Keep a record of a batch of users about to be deleted, with one `insert_many`.
+
+        Users archived by an earlier, interrupted run are skipped by MongoDB as duplicate keys.
+        """
+        timestamp = timezone.now().strftime('%Y-%m-%dT%H:%M:%S.%f%z')
+        documents = []
+        for data in ShowUserSerializer(instance=User.objects.filter(pk__in=ids), many=True).data:
+            data["_id"] = data.pop("id")
+            data["reason"] = reason
+            data["timestamp"] = timestamp
+            documents.append(data)
+
+        return len(SynchronousMethods.insert_many(data=documents, collection=DatabaseCollections.deleted_users))
+
     @classmethod
     def insert_deleted_user_into_mongo(
         cls,
@@ -576,6 +595,7 @@ class UserModelHelpers:
                 else:
                     _ = SynchronousMethods.insert_one(
                         data=data, collection=DatabaseCollections.user_white_listed_ips)
+                    IpCheckDecisionCache.invalidate(user_id=f"{user.id}")
             except Exception as ex:
                 resp.error = "Error in MongoDB Insertion"
                 resp.message = f"{ex}"
@@ -652,6 +672,7 @@ class UserModelHelpers:
 
         check = SynchronousMethods.delete(
             filter_dict=filter_dict, collection=DatabaseCollections.user_white_listed_ips)
+        IpCheckDecisionCache.invalidate(user_id=f"{user.id}")
         if not check:
             resp.error = "Internal Error"
             resp.message = f"Internal server error; check logs."
@@ -681,6 +702,7 @@ class UserModelHelpers:
                 }
                 _ = SynchronousMethods.insert_one(
                     data=data, collection=DatabaseCollections.user_mac_addresses)
+                IpCheckDecisionCache.invalidate(user_id=user)
             except Exception as ex:
                 logger.warning(f"{ex}")
 
@@ -804,7 +826,8 @@ class UserTokenHelpers:
             logger.warning(resp.to_text())
             return resp
 
-        token = UserTokenUtils.create_permanent_token(usr=user)
+        token_id = uuid4()
+        token = UserTokenUtils.create_permanent_token(usr=user, token_id=token_id)
         if not token:
             resp.error = "Internal Error"
             resp.message = "Internal server error; check logs."
@@ -813,11 +836,11 @@ class UserTokenHelpers:
 
             logger.warning(resp.to_text())
             return resp
-        user_part, token_part = UserTokenUtils.split_parts(token=token)
+        _, secret = UserTokenUtils.split_selector(token=token)
 
         data = {
             "user": f"{user.id}",
-            "token": make_password(token_part),
+            "token": make_password(secret),
             "alias": alias,
             "expires_at": expires_at
         }
@@ -832,7 +855,7 @@ class UserTokenHelpers:
             logger.warning(resp.to_text())
             return resp
 
-        deserialized.save()
+        deserialized.save(id=token_id)
 
         resp.message = "Please save the token as you will not be able to recover the token once this view ends."
         resp.data = {
@@ -917,4 +940,11 @@ class UserTokenUsageHelpers:
             raise Exception(_msg)
         
         deserialized.save()
-        return
\ No newline at end of file
+        return
+
+    @classmethod
+    def record(cls, token_id: str = None, created: datetime = None) -> bool:
+        """
+        Record a use of the token without writing on the request path, see `UserTokenUsageRecorder`.
+        """
+        return UserTokenUsageRecorder.record(token_id=f"{token_id}", created=created or timezone.now())
\ No newline at end of file
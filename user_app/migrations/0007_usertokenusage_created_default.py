@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0006_remove_usertoken_user_app_us_token_edeb74_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usertokenusage',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -218,7 +218,8 @@ class UserToken(TemplateModel):
 
 class UserTokenUsage(TemplateModel):
     token = models.ForeignKey(UserToken, on_delete=models.CASCADE)
-    created = models.DateTimeField(auto_now_add=True, editable=False)
+    ## (prithoo): Not `auto_now_add`, usages are written in batches and must keep the time of the request.
+    created = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return f"Token '{self.token.alias}' used by {self.token.user.email} at {self.created}"
@@ -1,6 +1,10 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
 
-from user_app.models import User, UserProfile, UserLoginOTP, UserToken, UserTokenUsage
+from auth.identity import UserSnapshotCache, VerifiedTokenCache
+from user_app.models import User, UserProfile, UserLoginOTP, UserToken
 from user_app.serializers import ShowUserSerializer
 from user_app.helpers import UserModelHelpers
 
@@ -10,6 +14,21 @@ from user_app import logger
 class UserSignalReciever:
     model = User
 
+    ## (prithoo): Set while deleting users that were already archived in bulk, see `archived_in_bulk`.
+    _archived_in_bulk: ContextVar = ContextVar("users_archived_in_bulk", default=False)
+
+    @classmethod
+    @contextmanager
+    def archived_in_bulk(cls):
+        """
+        Skip the per-user archive of `pre_delete` for deletes made inside this block.
+        """
+        token = cls._archived_in_bulk.set(True)
+        try:
+            yield
+        finally:
+            cls._archived_in_bulk.reset(token)
+
     @classmethod
     def created(cls, sender, instance: User, created, *args, **kwargs):
         if created:
@@ -23,9 +42,15 @@ class UserSignalReciever:
 
     @classmethod
     def pre_delete(cls, sender, instance, *args, **kwargs):
+        if cls._archived_in_bulk.get():
+            return
         _ = UserModelHelpers.insert_deleted_user_into_mongo(
             data=ShowUserSerializer(instance=instance).data)
 
+    @classmethod
+    def evict_snapshot(cls, sender, instance: User, *args, **kwargs):
+        UserSnapshotCache.evict(user_id=instance.pk)
+
 
 post_save.connect(receiver=UserSignalReciever.created,
                   sender=UserSignalReciever.model)
@@ -33,6 +58,10 @@ post_save.connect(receiver=UserSignalReciever.updated,
                   sender=UserSignalReciever.model)
 pre_delete.connect(receiver=UserSignalReciever.pre_delete,
                    sender=UserSignalReciever.model)
+post_save.connect(receiver=UserSignalReciever.evict_snapshot,
+                  sender=UserSignalReciever.model)
+post_delete.connect(receiver=UserSignalReciever.evict_snapshot,
+                    sender=UserSignalReciever.model)
 
 
 class UserProfileSignalReciever:
@@ -89,10 +118,12 @@ class UserTokenSignalReciever:
             logger.info(f"Token {instance.alias} for user: '{instance.user.email}' created.")
         
         else:
+            VerifiedTokenCache.invalidate(token_id=instance.pk)
             logger.info(f"Token {instance.alias} for user: '{instance.user.email}' updated.")
 
     @classmethod
     def post_delete(cls, sender, instance: UserToken, *args, **kwargs):
+        VerifiedTokenCache.invalidate(token_id=instance.pk)
         logger.info(f"Token {instance.alias} for user: '{instance.user.email}' deleted.")
 
 
@@ -101,15 +132,3 @@ post_save.connect(receiver=UserTokenSignalReciever.post_save,
 post_delete.connect(receiver=UserTokenSignalReciever.post_delete,
                     sender=UserTokenSignalReciever.model)
 
-
-class UserTokenUsageSignalReciever:
-
-    model = UserTokenUsage
-
-    @classmethod
-    def post_save(cls, sender, instance: UserTokenUsage, created, *args, **kwargs):
-        if created:
-            logger.info(f"Token '{instance.token.alias}' used by {instance.token.user.email} at {instance.created}")
-        
-post_save.connect(receiver=UserTokenUsageSignalReciever.post_save,
-                    sender=UserTokenUsageSignalReciever.model)
\ No newline at end of file
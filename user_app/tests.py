@@ -1,14 +1,22 @@
 from jose import jwt
 from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
 
 from django.conf import settings
 from django.contrib.auth.hashers import make_password, check_password
-from django.test import TestCase
+from django.test import RequestFactory, SimpleTestCase, TestCase
 from django.utils import timezone
 
-from user_app.models import User, UserLoginOTP
+from auth.authentication import CachedJWTAuthentication
+from auth.identity import ResolvedIdentity, UserSnapshotCache
+from classifieds_app.models import ClassifiedsAdvertisement, ClassifiedsCategory
+
+from user_app.cron import DeleteAbandonedUsers, DeleteInactiveUsers
+from user_app.models import User, UserLoginOTP, UserToken, UserTokenUsage
 from user_app.helpers import UserModelHelpers
-from user_app.utils import JWTUtils, LoginOTPUtils, UserTokenUtils
+from user_app.utils import JWTUtils, LoginOTPUtils, UserTokenUtils, UserTokenUsageRecorder
+from utils.db_utils import ChunkedDeletion
 
 from user_app import logger
 
@@ -151,16 +159,141 @@ class UserTokenUtilsTestCase(TestCase):
                          2 + len(str(self.user.id)) + UserTokenUtils.SALT_02_SIZE*2)
 
     def test_split_parts(self):
-        token = UserTokenUtils.create_permanent_token(self.user)
+        token = UserTokenUtils.create_legacy_permanent_token(self.user)
         user_part, token_part = UserTokenUtils.split_parts(token)
         self.assertIsNotNone(user_part)
         self.assertIsNotNone(token_part)
         self.assertEqual(user_part + token_part, token)
 
     def test_get_user_id(self):
-        token = UserTokenUtils.create_permanent_token(self.user)
+        token = UserTokenUtils.create_legacy_permanent_token(self.user)
         user_id = UserTokenUtils.get_user_id(token=token)
         self.assertEqual(user_id, str(self.user.id))
 
+    def test_split_selector(self):
+        token_id = uuid4()
+        token = UserTokenUtils.create_permanent_token(self.user, token_id=token_id)
+        self.assertTrue(UserTokenUtils.is_selector_token(token))
+        self.assertEqual(UserTokenUtils.split_selector(token), (str(token_id), token.rsplit(".", 1)[1]))
+        self.assertEqual(UserTokenUtils.split_selector(f"v2.not-a-uuid.{token_id.hex}"), (None, None))
+        self.assertFalse(UserTokenUtils.is_selector_token(UserTokenUtils.create_legacy_permanent_token(self.user)))
+
     def setDown(self) -> None:
         self.user.delete()
+
+
+class ResolvedIdentityTestCase(TestCase):
+
+    def setUp(self) -> None:
+        UserSnapshotCache.clear()
+        self.user = User.objects.create_user(
+            username="test.user.001", email="test.user.001@test.com", password="Te$tpassw0rd")
+        self.access_token = JWTUtils.get_tokens_for_user(self.user)['accessToken']
+
+    def build_request(self):
+        return RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+
+    def test_user_loaded_once_per_request(self):
+        request = self.build_request()
+        with self.assertNumQueries(1):
+            self.assertEqual(ResolvedIdentity.for_request(request).user, self.user)
+            user, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertEqual(user, self.user)
+        self.assertIs(ResolvedIdentity.for_request(request), ResolvedIdentity.for_request(request))
+
+    def test_snapshot_shared_across_requests_until_saved(self):
+        ResolvedIdentity.for_request(self.build_request()).user
+        with self.assertNumQueries(0):
+            user = ResolvedIdentity.for_request(self.build_request()).user
+        self.assertEqual(user, self.user)
+
+        self.user.first_name = "Renamed"
+        self.user.save()
+        with self.assertNumQueries(1):
+            user = ResolvedIdentity.for_request(self.build_request()).user
+        self.assertEqual(user.first_name, "Renamed")
+
+
+class UserTokenUsageRecorderTestCase(SimpleTestCase):
+
+    def test_write_keeps_request_time(self):
+        created = timezone.now() - timedelta(seconds=30)
+        batch = [(f"{uuid4()}", created) for _ in range(3)]
+
+        with patch("user_app.utils.close_old_connections"), \
+                patch.object(UserTokenUsage.objects, "bulk_create") as bulk_create:
+            UserTokenUsageRecorder.flush(batch=batch)
+
+        bulk_create.assert_called_once()
+        usages = bulk_create.call_args.args[0]
+        self.assertEqual([(f"{usage.token_id}", usage.created) for usage in usages], batch)
+
+
+class ChunkedDeletionTestCase(SimpleTestCase):
+
+    def get_queryset(self, *batches):
+        queryset = MagicMock(model=UserToken)
+        queryset.order_by.return_value.values_list.return_value.__getitem__.side_effect = list(batches)
+        return queryset
+
+    def test_deletes_in_batches(self):
+        queryset = self.get_queryset([1, 2], [3, 4], [5])
+        archived = []
+
+        with patch("utils.db_utils.transaction.atomic"), patch.object(UserToken.objects, "filter") as filter_:
+            filter_.return_value.delete.side_effect = lambda: (2, {"user_app.UserToken": 2, "user_app.UserTokenUsage": 3})
+            report = ChunkedDeletion.run(queryset=queryset, batch_size=2, archive=archived.append)
+
+        self.assertEqual(archived, [[1, 2], [3, 4], [5]])
+        self.assertEqual(report["batches"], 3)
+        self.assertEqual(report["deleted"], 6)
+        self.assertEqual(report["cascaded"], {"user_app.UserTokenUsage": 9})
+        self.assertTrue(report["finished"])
+
+    def test_failed_archive_keeps_the_batch(self):
+        queryset = self.get_queryset([1, 2])
+
+        with patch("utils.db_utils.transaction.atomic"), patch.object(UserToken.objects, "filter") as filter_:
+            report = ChunkedDeletion.run(queryset=queryset, batch_size=2, archive=MagicMock(side_effect=Exception("down")))
+
+        filter_.assert_not_called()
+        self.assertEqual(report["deleted"], 0)
+        self.assertFalse(report["finished"])
+
+
+class DeleteUsersCronTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.category = ClassifiedsCategory.objects.create(name="Test Category", description="Test category.")
+
+    def create_user_with_advertisement(self, username: str = None, **fields) -> User:
+        user = User.objects.create_user(username=username, email=f"{username}@email.com", password="R4nd0mPa$$word")
+        User.objects.filter(pk=user.pk).update(**fields)
+        ClassifiedsAdvertisement.objects.create(
+            title="Bike", description="Red", creator=user, price=1, category=self.category)
+        return user
+
+    def run_cron(self, cron_class=None) -> str:
+        with patch.object(UserModelHelpers, "archive_deleted_users", return_value=1) as archive:
+            message = cron_class().do()
+        archive.assert_called_once()
+        return message
+
+    def test_inactive_user_with_advertisements(self):
+        user = self.create_user_with_advertisement(
+            username="test.inactive.001", is_active=False, date_joined=timezone.now() - timedelta(days=8))
+
+        message = self.run_cron(cron_class=DeleteInactiveUsers)
+
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        self.assertFalse(ClassifiedsAdvertisement.objects.filter(creator_id=user.pk).exists())
+        self.assertNotIn("unfinished", message)
+
+    def test_abandoned_user_with_advertisements(self):
+        user = self.create_user_with_advertisement(
+            username="test.abandoned.001", is_active=True, last_login=timezone.now() - timedelta(days=600))
+
+        message = self.run_cron(cron_class=DeleteAbandonedUsers)
+
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        self.assertNotIn("unfinished", message)
@@ -1,14 +1,17 @@
 from datetime import datetime, timedelta
 from secrets import choice, token_hex
+from typing import List
 from pytz import timezone
-from uuid import uuid4
+from uuid import UUID, uuid4
 
 from django.conf import settings
 from django.contrib.auth.hashers import make_password, check_password
+from django.db import close_old_connections
 
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from user_app.models import User, UserLoginOTP
+from core.boilerplate.batching_worker import BatchingWorker
+from user_app.models import User, UserLoginOTP, UserTokenUsage
 from user_app.serializers import UserLoginOTPInputSerializer
 
 from user_app import logger
@@ -101,6 +104,10 @@ class LoginOTPUtils:
 class UserTokenUtils:
     """
     Utilities to create secure tokens for users.
+
+    Tokens are created in the selector format `v2.<token id>.<secret>`: the token id addresses the
+    `UserToken` row directly, so authentication costs one lookup and one hash check. Tokens issued
+    before that (salted user id followed by the secret) are still parsed by `split_parts`/`get_user_id`.
     """
     LETTERS = ("A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L",
                "M", "N", "O", "P", "Q", "R", "S", "T", "U", "V", "W", "X", "Y", "Z")
@@ -108,6 +115,8 @@ class UserTokenUtils:
 
     TOKEN_SIZE: int = 32
     UUID_LENGTH: int = 36 #(prithoo): The length of a typical UUIDv4 value.
+    SELECTOR_PREFIX: str = "v2"
+    SELECTOR_SEPARATOR: str = "."
     SALT_01_SIZE: int = settings.SALT_01_SIZE
     SALT_02_SIZE: int = settings.SALT_02_SIZE
 
@@ -128,8 +137,41 @@ class UserTokenUtils:
         return f"{token_hex(cls.SALT_01_SIZE)}{user.id}{token_hex(cls.SALT_02_SIZE)}"
     
     @classmethod
-    def create_permanent_token(cls, usr:User) -> str:
+    def create_permanent_token(cls, usr:User, token_id:str=None) -> str:
+        """
+        Create a selector-format token for the `UserToken` that will be saved with `token_id`.
+        """
+        if not usr or not isinstance(usr, User):
+            logger.warning(
+                f"Invalid argument(s) `user` passed.")
+            return None
+
+        token_id = token_id or uuid4()
+        return cls.SELECTOR_SEPARATOR.join((cls.SELECTOR_PREFIX, f"{token_id}", cls.generate_hex_token()))
+
+    @classmethod
+    def create_legacy_permanent_token(cls, usr:User) -> str:
         return f"{cls.process_user_salt(usr)}{cls.generate_hex_token()}"
+
+    @classmethod
+    def is_selector_token(cls, token:str) -> bool:
+        return bool(token) and token.startswith(f"{cls.SELECTOR_PREFIX}{cls.SELECTOR_SEPARATOR}")
+
+    @classmethod
+    def split_selector(cls, token:str):
+        """
+        Split a selector-format token into the `UserToken` id and the secret; `(None, None)` if malformed.
+        """
+        if not cls.is_selector_token(token):
+            return None, None
+
+        parts = token.split(cls.SELECTOR_SEPARATOR)
+        if len(parts) != 3 or not parts[2]:
+            return None, None
+        try:
+            return f"{UUID(parts[1])}", parts[2]
+        except ValueError:
+            return None, None
     
     @classmethod
     def split_parts(cls, token:str):
@@ -149,3 +191,49 @@ class UserTokenUtils:
         salt_02 = user_part[0-cls.SALT_02_SIZE*2-1:]
 
         return user_part.replace(salt_01, "").replace(salt_02, "")
+
+
+class UserTokenUsageRecorder(BatchingWorker):
+    """
+    Records `UserTokenUsage` rows off the request path.
+
+    `record` queues `(token_id, created)` and returns immediately, the worker `bulk_create`s them in
+    batches (see `core.boilerplate.batching_worker.BatchingWorker`), so the rows end up exactly as the
+    old per-request inserts left them.
+    """
+
+    NAME: str = "token-usage-recorder"
+    LABEL: str = "Token usage recorder"
+    COUNTERS = ("recorded", "dropped", "written", "failed")
+    ACCEPTED: str = "recorded"
+
+    BATCH_SIZE: int = 500
+    FLUSH_INTERVAL: float = 2.0
+
+    @classmethod
+    def record(cls, token_id: str = None, created: datetime = None) -> bool:
+        """
+        Queue one use of the token `token_id`; returns `False` if the event had to be dropped.
+        """
+        return cls.put((token_id, created))
+
+    @classmethod
+    def flush(cls, batch: List[tuple] = None) -> None:
+        ## (prithoo): The worker outlives requests, so it has to retire stale connections itself.
+        close_old_connections()
+        try:
+            UserTokenUsage.objects.bulk_create(
+                [UserTokenUsage(token_id=token_id, created=created) for token_id, created in batch],
+                batch_size=cls.BATCH_SIZE
+            )
+            cls.count("written", len(batch))
+            logger.info(f"Recorded {len(batch)} token usage(s).")
+        except Exception as ex:
+            ## (prithoo): One deleted token fails the whole batch; retry row by row so the others survive.
+            logger.warning(f"Unable to record {len(batch)} token usage(s) in bulk: {ex}")
+            for token_id, created in batch:
+                try:
+                    UserTokenUsage.objects.create(token_id=token_id, created=created)
+                    cls.count("written")
+                except Exception:
+                    cls.count("failed")
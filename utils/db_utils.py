@@ -0,0 +1,82 @@
+from time import monotonic
+from typing import Callable, List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+
+from utils import logger
+
+
+class ChunkedDeletion:
+    """
+    Deletes the rows of a queryset in ordered batches (primary key by default) instead of one unbounded `DELETE`.
+
+    Every batch is its own transaction, so locks are held briefly, and the run stops once
+    `time_budget` seconds are used up; the rest is picked up by the next run. An optional `archive`
+    callable receives the ids of a batch in the same transaction, before they are deleted. If either
+    fails the run stops, the batch is kept and, if the archive has an `undo()`, taken back out of it,
+    so a retried batch is never archived twice.
+    """
+
+    @classmethod
+    def run(
+        cls,
+        queryset: QuerySet = None,
+        batch_size: int = None,
+        time_budget: float = None,
+        archive: Callable[[List[str]], None] = None,
+        label: str = None,
+        order_by: str = "pk"
+    ) -> dict:
+        """
+        Delete everything `queryset` matches, within the budget. Returns the counts and timings of the run.
+        """
+        batch_size = batch_size or settings.CHUNKED_DELETION_BATCH_SIZE
+        time_budget = time_budget or settings.CHUNKED_DELETION_TIME_BUDGET
+        label = label or queryset.model._meta.label
+        report = {"label": label, "deleted": 0, "batches": 0, "cascaded": {}, "seconds": 0.0, "finished": False}
+
+        started = monotonic()
+        while True:
+            ids = list(queryset.order_by(order_by).values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                report["finished"] = True
+                break
+
+            try:
+                with transaction.atomic():
+                    if archive:
+                        archive(ids)
+                    _, per_model = queryset.model.objects.filter(pk__in=ids).delete()
+            except Exception as ex:
+                logger.error(f"{label}: archiving or deleting a batch of {len(ids)} failed, stopping: {ex}")
+                if hasattr(archive, "undo"):
+                    archive.undo()
+                break
+
+            report["deleted"] += per_model.get(queryset.model._meta.label, 0)
+            report["batches"] += 1
+            for model, count in per_model.items():
+                if model != queryset.model._meta.label:
+                    report["cascaded"][model] = report["cascaded"].get(model, 0) + count
+
+            elapsed = monotonic() - started
+            logger.info(f"{label}: batch {report['batches']} deleted {len(ids)}, {report['deleted']} so far in {elapsed:.2f}s.")
+            if len(ids) < batch_size:
+                report["finished"] = True
+                break
+            if elapsed >= time_budget:
+                logger.warning(f"{label}: time budget of {time_budget}s used up, the rest is left for the next run.")
+                break
+
+        report["seconds"] = round(monotonic() - started, 3)
+        logger.info(f"Chunked deletion: {report}")
+        return report
+
+    @classmethod
+    def to_text(cls, report: dict = None) -> str:
+        return (
+            f"{report['label']}: {report['deleted']} deleted in {report['batches']} batch(es), "
+            f"{report['seconds']}s{'' if report['finished'] else ', unfinished'}"
+        )